@@ -0,0 +1,373 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Benchmarks of the hot paths of the component architecture.
+
+Run with ``python benchmarks/bench_component.py -o results.json`` and
+compare two runs with ``python -m pyperf compare_to old.json new.json``.
+See ``benchmarks/README.rst`` for details.
+"""
+import functools
+import time
+
+import pyperf
+from zope.interface import alsoProvides
+from zope.interface.interface import InterfaceClass
+from zope.interface.registry import Components
+
+from zope.component import _api
+from zope.component import hooks
+from zope.component.factory import Factory
+from zope.component.interfaces import IFactory
+
+
+DEFAULT_SIZES = '10,1000,100000'
+DEFAULT_DEPTHS = '1,4'
+
+#: The largest number of registrations for the ZCML and persistent
+#: registry benchmarks. Setting these up for larger sizes takes minutes
+#: for every worker process, so larger sizes are skipped.
+MAX_SLOW_SIZE = 10000
+
+
+def _intList(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def _interface(name):
+    # Interfaces are pickled by reference, so the persistent registry
+    # needs to find them as module globals.
+    iface = globals().get(name)
+    if iface is None:
+        iface = globals()[name] = InterfaceClass(name, (), {}, __name__)
+    return iface
+
+
+class Site:
+    """A minimal possible site."""
+
+    def __init__(self, sitemanager):
+        self._sm = sitemanager
+
+    def getSiteManager(self):
+        return self._sm
+
+
+class Context:
+    """The objects we look up adapters and handlers for."""
+
+
+def factory(context):
+    return context
+
+
+def handler(*objects):
+    pass
+
+
+class Fixture:
+    """A chain of *depth* registries holding *size* registrations.
+
+    The registrations are made in the root registry; the other
+    registries are (empty) local site managers each based on the one
+    before, the last of them being the current site. Registrations are
+    spread over ``size // 10`` required interfaces, like the many views
+    registered for the same content interface.
+
+    The root registry is *root*, or a new
+    `~zope.interface.registry.Components`.
+    """
+
+    def __init__(self, size, depth, root=None):
+        self.size = size
+        self.depth = depth
+        self.provided = _interface('IProvided')
+        count = max(size // 10, 1)
+        self.required = [_interface('IRequired%d' % i) for i in range(count)]
+        self.root = Components('root') if root is None else root
+        for i in range(size):
+            required = self.required[i % count]
+            name = '' if i < count else 'n%d' % i
+            self.root.registerAdapter(factory, (required,), self.provided,
+                                      name, event=False)
+            self.root.registerUtility(factory, required, name, event=False)
+            self.root.registerHandler(handler, (required,), event=False)
+        # One factory per required interface.
+        for i, required in enumerate(self.required):
+            self.root.registerUtility(
+                Factory(Context, interfaces=(required,)), IFactory,
+                'f%d' % i, event=False)
+        sm = self.root
+        for level in range(1, depth):
+            sm = Components('level%d' % level, (sm,))
+        self.leaf = sm
+        self.site = Site(sm)
+        # An object the registrations in the middle apply to, and a
+        # name registered for it (when there are names).
+        self.interface = self.required[count // 2]
+        self.context = Context()
+        alsoProvides(self.context, self.interface)
+        self.name = 'n%d' % (count + count // 2) if size > count else ''
+        self.unregistered = Context()
+
+    def enter(self):
+        hooks.setHooks()
+        hooks.setSite(self.site)
+
+
+@functools.lru_cache(maxsize=None)
+def fixture(size, depth):
+    return Fixture(size, depth)
+
+
+def _timeit(loops, func, *args):
+    range_it = range(loops)
+    t0 = time.perf_counter()
+    for _ in range_it:
+        func(*args)
+    return time.perf_counter() - t0
+
+
+def bench_queryAdapter(loops, size, depth):
+    f = fixture(size, depth)
+    f.enter()
+    return _timeit(loops, _api.queryAdapter, f.context, f.provided)
+
+
+def bench_queryAdapter_named(loops, size, depth):
+    f = fixture(size, depth)
+    f.enter()
+    return _timeit(loops, _api.queryAdapter, f.context, f.provided, f.name)
+
+
+def bench_queryAdapter_miss(loops, size, depth):
+    f = fixture(size, depth)
+    f.enter()
+    return _timeit(loops, _api.queryAdapter, f.unregistered, f.provided)
+
+
+def bench_adapter_hook(loops, size, depth):
+    # Calling the interface goes through hooks.adapter_hook.
+    f = fixture(size, depth)
+    f.enter()
+    return _timeit(loops, f.provided, f.context)
+
+
+def bench_getSiteManager(loops, size, depth):
+    f = fixture(size, depth)
+    f.enter()
+    return _timeit(loops, _api.getSiteManager)
+
+
+def bench_getUtility(loops, size, depth):
+    f = fixture(size, depth)
+    f.enter()
+    return _timeit(loops, _api.getUtility, f.interface, f.name)
+
+
+def bench_getUtility_cached(loops, size, depth):
+    f = fixture(size, depth)
+    f.enter()
+    _api.enableUtilityCache()
+    try:
+        _api.getUtility(f.interface, f.name)
+        return _timeit(loops, _api.getUtility, f.interface, f.name)
+    finally:
+        _api.disableUtilityCache()
+
+
+def bench_queryNextUtility(loops, size, depth):
+    # The next utility for the current site manager, i.e. the one
+    # registered in the root registry.
+    f = fixture(size, depth)
+    f.enter()
+    return _timeit(loops, _api.queryNextUtility, f.leaf, f.interface, f.name)
+
+
+def bench_queryNextUtility_cached(loops, size, depth):
+    f = fixture(size, depth)
+    f.enter()
+    _api.enableUtilityCache()
+    try:
+        _api.queryNextUtility(f.leaf, f.interface, f.name)
+        return _timeit(loops, _api.queryNextUtility,
+                       f.leaf, f.interface, f.name)
+    finally:
+        _api.disableUtilityCache()
+
+
+def bench_getFactoriesFor(loops, size, depth):
+    f = fixture(size, depth)
+    f.enter()
+    range_it = range(loops)
+    t0 = time.perf_counter()
+    for _ in range_it:
+        list(_api.getFactoriesFor(f.interface))
+    return time.perf_counter() - t0
+
+
+def bench_dispatch(loops, size, depth):
+    from zope.event import notify
+
+    import zope.component.event  # noqa: F401 registers dispatch
+    f = fixture(size, depth)
+    f.enter()
+    return _timeit(loops, notify, f.context)
+
+
+def _zcml(size):
+    lines = ['<configure xmlns="http://namespaces.zope.org/zope">']
+    for i in range(size):
+        lines.append(
+            '<utility component="zope.component.tests.examples.comp"'
+            ' provides="zope.component.tests.examples.I2"'
+            ' name="n%d" />' % i)
+        lines.append(
+            '<adapter factory="zope.component.tests.examples.Comp"'
+            ' for="zope.component.tests.examples.I1"'
+            ' provides="zope.component.tests.examples.I2"'
+            ' name="n%d" />' % i)
+    lines.append('</configure>')
+    return '\n'.join(lines)
+
+
+def bench_zcml(loops, size):
+    from zope.configuration import xmlconfig
+
+    import zope.component
+    from zope.component.testing import setUp
+    from zope.component.testing import tearDown
+    zcml = _zcml(size)
+    total = 0.0
+    for _ in range(loops):
+        setUp()
+        context = xmlconfig.file('meta.zcml', zope.component)
+        t0 = time.perf_counter()
+        xmlconfig.string(zcml, context)
+        total += time.perf_counter() - t0
+        tearDown()
+    return total
+
+
+@functools.lru_cache(maxsize=None)
+def persistent_fixture(size):
+    import transaction
+    from ZODB import DB
+
+    from zope.component.persistentregistry import PersistentComponents
+    f = Fixture(size, 1, PersistentComponents('persistent'))
+    db = DB(None)
+    conn = db.open()
+    conn.root()['components'] = f.root
+    transaction.commit()
+    conn.close()
+    return f, db
+
+
+def bench_persistent_load(loops, size):
+    # Opening the registry in a connection with an empty cache and
+    # looking up a utility.
+    f, db = persistent_fixture(size)
+    total = 0.0
+    for _ in range(loops):
+        conn = db.open()
+        conn.cacheMinimize()
+        t0 = time.perf_counter()
+        components = conn.root()['components']
+        components.queryUtility(f.interface, f.name)
+        total += time.perf_counter() - t0
+        conn.close()
+    return total
+
+
+def bench_persistent_lookup(loops, size):
+    f, db = persistent_fixture(size)
+    conn = db.open()
+    components = conn.root()['components']
+    components.queryUtility(f.interface, f.name)
+    components.queryAdapter(f.context, f.provided)
+    t0 = time.perf_counter()
+    for _ in range(loops):
+        components.queryUtility(f.interface, f.name)
+        components.queryAdapter(f.context, f.provided)
+    total = time.perf_counter() - t0
+    conn.close()
+    return total
+
+
+LOOKUP_BENCHMARKS = [
+    ('queryAdapter', bench_queryAdapter),
+    ('queryAdapter-named', bench_queryAdapter_named),
+    ('queryAdapter-miss', bench_queryAdapter_miss),
+    ('adapter_hook', bench_adapter_hook),
+    ('getSiteManager', bench_getSiteManager),
+    ('getUtility', bench_getUtility),
+    ('getUtility-cached', bench_getUtility_cached),
+    ('queryNextUtility', bench_queryNextUtility),
+    ('queryNextUtility-cached', bench_queryNextUtility_cached),
+    ('getFactoriesFor', bench_getFactoriesFor),
+    ('dispatch', bench_dispatch),
+]
+
+SIZE_BENCHMARKS = [
+    ('zcml', bench_zcml),
+    ('persistent-load', bench_persistent_load),
+    ('persistent-lookup', bench_persistent_lookup),
+]
+
+
+def add_cmdline_args(cmd, args):
+    cmd.extend(('--sizes', args.sizes, '--depths', args.depths))
+    if args.select:
+        cmd.extend(('--select', args.select))
+
+
+def main():
+    runner = pyperf.Runner(add_cmdline_args=add_cmdline_args)
+    runner.metadata['description'] = (
+        'Benchmarks of the zope.component hot paths')
+    parser = runner.argparser
+    parser.add_argument(
+        '--sizes', default=DEFAULT_SIZES,
+        help='Comma separated numbers of registrations'
+             ' (default: %s)' % DEFAULT_SIZES)
+    parser.add_argument(
+        '--depths', default=DEFAULT_DEPTHS,
+        help='Comma separated numbers of site levels'
+             ' (default: %s)' % DEFAULT_DEPTHS)
+    parser.add_argument(
+        '--select', default='',
+        help='Only run the benchmarks whose name contains this string')
+    args = runner.parse_args()
+    sizes = _intList(args.sizes)
+    depths = _intList(args.depths)
+
+    benchmarks = []
+    for name, func in LOOKUP_BENCHMARKS:
+        for size in sizes:
+            for depth in depths:
+                benchmarks.append(
+                    ('%s-n%d-d%d' % (name, size, depth), func, size, depth))
+    for name, func in SIZE_BENCHMARKS:
+        for size in sizes:
+            if size > MAX_SLOW_SIZE:
+                continue
+            benchmarks.append(('%s-n%d' % (name, size), func, size))
+
+    for name, func, *func_args in benchmarks:
+        if args.select in name:
+            runner.bench_time_func(name, func, *func_args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Benchmarks of lookups from several threads at once.
+
+Every thread has its own current site and does the same number of
+lookups; the time reported is the wall clock time divided by the number
+of lookups of one thread. As long as the lookups scale with the number
+of threads, it stays the same for any number of threads. With the GIL,
+it grows linearly with the number of threads instead.
+
+Run with ``python benchmarks/bench_threads.py -o results.json``. See
+``benchmarks/README.rst`` for details.
+"""
+import sys
+import threading
+import time
+
+import pyperf
+from bench_component import Fixture
+from bench_component import Site
+from bench_component import _intList
+from zope.interface.registry import Components
+
+from zope.component import _api
+from zope.component import hooks
+
+
+DEFAULT_THREADS = '1,2,4,8'
+SIZE = 1000
+
+
+def _lookupUtility(f):
+    return _api.queryUtility(f.interface, f.name)
+
+
+def _lookupAdapter(f):
+    return _api.queryAdapter(f.context, f.provided)
+
+
+def _adapterHook(f):
+    return f.provided(f.context)
+
+
+BENCHMARKS = [
+    ('queryUtility', _lookupUtility),
+    ('queryAdapter', _lookupAdapter),
+    ('adapter_hook', _adapterHook),
+]
+
+_fixture = None
+
+
+def fixture():
+    global _fixture
+    if _fixture is None:
+        _fixture = Fixture(SIZE, 1)
+    return _fixture
+
+
+def _worker(f, site, lookup, loops, barrier):
+    hooks.setSite(site)
+    range_it = range(loops)
+    barrier.wait()
+    for _ in range_it:
+        lookup(f)
+
+
+def bench_threads(loops, lookup, count):
+    f = fixture()
+    hooks.setHooks()
+    barrier = threading.Barrier(count + 1)
+    threads = []
+    for i in range(count):
+        # Each thread has its own local site based on the registry
+        # holding the registrations.
+        site = Site(Components('thread%d' % i, (f.root,)))
+        threads.append(threading.Thread(
+            target=_worker, args=(f, site, lookup, loops, barrier)))
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - t0
+
+
+def add_cmdline_args(cmd, args):
+    cmd.extend(('--threads', args.threads))
+
+
+def main():
+    runner = pyperf.Runner(add_cmdline_args=add_cmdline_args)
+    runner.metadata['description'] = (
+        'Lookups of zope.component from several threads at once')
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)
+    runner.metadata['gil_enabled'] = str(is_gil_enabled())
+    runner.argparser.add_argument(
+        '--threads', default=DEFAULT_THREADS,
+        help='Comma separated numbers of threads'
+             ' (default: %s)' % DEFAULT_THREADS)
+    args = runner.parse_args()
+    for name, lookup in BENCHMARKS:
+        for count in _intList(args.threads):
+            runner.bench_time_func(
+                '%s-t%d' % (name, count), bench_threads, lookup, count)
+
+
+if __name__ == '__main__':
+    main()
@@ -32,6 +32,8 @@ from zope.interface.interfaces import IComponentLookup
 
 from zope.component._api import adapter_hook
 from zope.component._api import createObject
+from zope.component._api import disableUtilityCache
+from zope.component._api import enableUtilityCache
 from zope.component._api import getAdapter
 from zope.component._api import getAdapterInContext
 from zope.component._api import getAdapters
@@ -43,9 +45,11 @@ from zope.component._api import getNextUtility
 from zope.component._api import getSiteManager
 from zope.component._api import getUtilitiesFor
 from zope.component._api import getUtility
+from zope.component._api import getUtilityCacheStatistics
 from zope.component._api import handle
 from zope.component._api import queryAdapter
 from zope.component._api import queryAdapterInContext
+from zope.component._api import queryAdapterMany
 from zope.component._api import queryMultiAdapter
 from zope.component._api import queryNextUtility
 from zope.component._api import queryUtility
@@ -13,22 +13,40 @@
 ##############################################################################
 """Zope 3 Component Architecture
 """
-import sys
+import threading
+import weakref
+from inspect import isawaitable
 
 import zope.interface.interface
 from zope.hookable import hookable
 from zope.interface import Interface
+from zope.interface import providedBy
 from zope.interface.interfaces import ComponentLookupError
 from zope.interface.interfaces import IComponentLookup
+from zope.interface.registry import Components
 
+from zope.component.globalregistry import base
 from zope.component.interfaces import IFactory
 from zope.component.interfaces import inherits_arch_docs as inherits_docs
 
 
-# getSiteManager() returns a component registry.  Although the term
-# "site manager" is deprecated in favor of "component registry",
-# the old term is kept around to maintain a stable API.
-base = None
+# getSiteManager() returns a component registry, the global `base`
+# imported above.  Although the term "site manager" is deprecated in
+# favor of "component registry", the old term is kept around to
+# maintain a stable API.  The global registry is imported eagerly
+# rather than on the first call so that the hot path never rebinds a
+# module global, which threads would otherwise race for.
+
+# What `Components` does for `subscribers`, see `_handle`.
+_subscribers = Components.subscribers
+
+# The `zope.component.instrumentation.LookupRecorder` recording calls to
+# the lookup functions below, if instrumentation is enabled.
+_recorder = None
+
+# The `zope.component.instrumentation.HandlerProfiler` timing the handlers
+# called by `_handle`, if handler profiling is enabled.
+_profiler = None
 
 
 @hookable
@@ -36,10 +54,7 @@ base = None
 def getSiteManager(context=None):
     """ See IComponentArchitecture.
     """
-    global base
     if context is None:
-        if base is None:
-            from zope.component.globalregistry import base
         return base
     else:
         # Use the global site manager to adapt context to `IComponentLookup`
@@ -60,28 +75,37 @@ def getAdapterInContext(object, interface, context):
     return adapter
 
 
+def _getConform(object):
+    """Return the ``__conform__`` method of *object*, or None.
+
+    For a class, a ``__conform__`` defined in the class (or a base
+    class) as a function, or as any other non-data descriptor like the
+    methods of builtin types, is meant for its instances; calling it
+    unbound would fail, so we behave as though there is no
+    ``__conform__`` method. A ``__conform__`` that is a static or
+    class method, or defined by the metaclass, is used.
+    """
+    conform = getattr(object, '__conform__', None)
+    if conform is not None and isinstance(object, type):
+        for klass in object.__mro__:
+            if '__conform__' in klass.__dict__:
+                kind = type(klass.__dict__['__conform__'])
+                if (hasattr(kind, '__get__')
+                        and not hasattr(kind, '__set__')
+                        and not hasattr(kind, '__delete__')
+                        and not issubclass(kind, (staticmethod, classmethod))):
+                    return None
+                break
+    return conform
+
+
 @inherits_docs
 def queryAdapterInContext(object, interface, context, default=None):
-    conform = getattr(object, '__conform__', None)
+    conform = _getConform(object)
     if conform is not None:
-        try:
-            adapter = conform(interface)
-        except TypeError:
-            # We got a TypeError. It might be an error raised by
-            # the __conform__ implementation, or *we* may have
-            # made the TypeError by calling an unbound method
-            # (object is a class).  In the later case, we behave
-            # as though there is no __conform__ method. We can
-            # detect this case by checking whether there is more
-            # than one traceback object in the traceback chain:
-            if sys.exc_info()[2].tb_next is not None:
-                # There is more than one entry in the chain, so
-                # reraise the error:
-                raise
-            # This clever trick is from Phillip Eby
-        else:
-            if adapter is not None:
-                return adapter
+        adapter = conform(interface)
+        if adapter is not None:
+            return adapter
 
     if interface.providedBy(object):
         return object
@@ -100,12 +124,44 @@ def getAdapter(object, interface=Interface, name='', context=None):
 @inherits_docs
 def queryAdapter(object, interface=Interface, name='', default=None,
                  context=None):
+    recorder = _recorder
+    if recorder is not None and recorder.enter():
+        return recorder.record(queryAdapter, interface, name,
+                               (object, interface, name, default, context),
+                               default)
     if context is None:
         return adapter_hook(interface, object, name, default)
     return getSiteManager(context).queryAdapter(object, interface, name,
                                                 default)
 
 
+@inherits_docs
+def queryAdapterMany(objects, interface=Interface, name='', default=None,
+                     context=None):
+    sitemanager = getSiteManager(context)
+    try:
+        lookup = sitemanager.adapters.lookup
+    except AttributeError:
+        return [sitemanager.queryAdapter(object, interface, name, default)
+                for object in objects]
+
+    factories = {}
+    adapters = []
+    for object in objects:
+        spec = providedBy(object)
+        try:
+            factory = factories[spec]
+        except KeyError:
+            factory = factories[spec] = lookup((spec,), interface, name)
+        adapter = None
+        if factory is not None:
+            if isinstance(object, super):
+                object = object.__self__
+            adapter = factory(object)
+        adapters.append(default if adapter is None else adapter)
+    return adapters
+
+
 @inherits_docs
 def getMultiAdapter(objects, interface=Interface, name='', context=None):
     adapter = queryMultiAdapter(objects, interface, name, context=context)
@@ -117,6 +173,11 @@ def getMultiAdapter(objects, interface=Interface, name='', context=None):
 @inherits_docs
 def queryMultiAdapter(objects, interface=Interface, name='', default=None,
                       context=None):
+    recorder = _recorder
+    if recorder is not None and recorder.enter():
+        return recorder.record(queryMultiAdapter, interface, name,
+                               (objects, interface, name, default, context),
+                               default)
     try:
         sitemanager = getSiteManager(context)
     except ComponentLookupError:
@@ -138,17 +199,82 @@ def getAdapters(objects, provided, context=None):
 
 @inherits_docs
 def subscribers(objects, interface, context=None):
+    recorder = _recorder
+    if recorder is not None and recorder.enter():
+        if interface is None:
+            # Dispatching an event to handlers always returns nothing,
+            # which is no miss; see `handle`.
+            return recorder.record(subscribers, None, '',
+                                   (objects, interface, context))
+        return recorder.record(subscribers, interface, '',
+                               (objects, interface, context),
+                               recorder.EMPTY)
     try:
         sitemanager = getSiteManager(context)
     except ComponentLookupError:
         # Oh blast, no site manager. This should *never* happen!
         return []
+    if interface is None and type(sitemanager).subscribers is _subscribers:
+        # Dispatching an event to handlers, see `_handle`.
+        _handle(sitemanager, objects)
+        return ()
     return sitemanager.subscribers(objects, interface)
 
 
 @inherits_docs
 def handle(*objects):
-    getSiteManager(None).subscribers(objects, None)
+    recorder = _recorder
+    if recorder is not None and recorder.enter():
+        return recorder.record(handle, None, '', objects)
+    sitemanager = getSiteManager(None)
+    if type(sitemanager).subscribers is _subscribers:
+        _handle(sitemanager, objects)
+    else:
+        sitemanager.subscribers(objects, None)
+
+
+def _handle(sitemanager, objects):
+    # `Components.subscribers` hands over to the adapter registry, whose
+    # lookup keeps the handlers for each combination of interfaces
+    # provided by the objects until the registry or one of its bases
+    # changes. Take the handlers from there and call them right away,
+    # which spares dispatching an event two levels of method calls.
+    # Events are dispatched for one object (`zope.component.event.dispatch`)
+    # or two (`zope.component.event.objectEventNotify`) most of the time;
+    # calling handlers without unpacking the arguments is faster.
+    profiler = _profiler
+    if profiler is not None:
+        profiler.handle(sitemanager, objects)
+        return
+    # A handler that is a coroutine function returns an awaitable, which
+    # is handed to `zope.component.event`; any other handler returns
+    # None (or something to ignore).
+    if len(objects) == 1:
+        ob, = objects
+        for handler in sitemanager.adapters.subscriptions(
+                [providedBy(ob)], None):
+            result = handler(ob)
+            if result is not None:
+                _handlerResult(result)
+    elif len(objects) == 2:
+        ob, event = objects
+        for handler in sitemanager.adapters.subscriptions(
+                [providedBy(ob), providedBy(event)], None):
+            result = handler(ob, event)
+            if result is not None:
+                _handlerResult(result)
+    else:
+        for handler in sitemanager.adapters.subscriptions(
+                [providedBy(ob) for ob in objects], None):
+            result = handler(*objects)
+            if result is not None:
+                _handlerResult(result)
+
+
+def _handlerResult(result):
+    if isawaitable(result):
+        from zope.component.event import _schedule
+        _schedule(result)
 
 #############################################################################
 # Register the component architectures adapter hook, with the adapter hook
@@ -174,6 +300,10 @@ zope.interface.interface.adapter_hooks.append(adapter_hook)
 # Utility API
 @inherits_docs
 def getUtility(interface, name='', context=None):
+    recorder = _recorder
+    if recorder is not None and recorder.enter():
+        return recorder.record(getUtility, interface, name,
+                               (interface, name, context))
     utility = queryUtility(interface, name, context=context)
     if utility is not None:
         return utility
@@ -182,6 +312,15 @@ def getUtility(interface, name='', context=None):
 
 @inherits_docs
 def queryUtility(interface, name='', default=None, context=None):
+    recorder = _recorder
+    if recorder is not None and recorder.enter():
+        return recorder.record(queryUtility, interface, name,
+                               (interface, name, default, context),
+                               default)
+    cache = _utility_cache
+    if cache is not None:
+        return cache.queryUtility(getSiteManager(context),
+                                  interface, name, default)
     return getSiteManager(context).queryUtility(interface, name, default)
 
 
@@ -196,6 +335,227 @@ def getAllUtilitiesRegisteredFor(interface, context=None):
 
 
 _marker = object()
+_not_cached = object()
+
+
+class _UtilityTable:
+    # The cached utility lookups of one utility registry. It subscribes
+    # to every registry in the resolution order like a registry based
+    # on them would, and is emptied for good as soon as one of them is
+    # changed. Persistent registries also tell it when they are turned
+    # into ghosts, since they may be loaded with another state.
+    __slots__ = ('results', 'valid', '__weakref__')
+
+    def __init__(self, utilities):
+        self.results = {}
+        self.valid = True
+        for registry in utilities.ro:
+            registry._addSubregistry(self)
+
+    def changed(self, originally_changed):
+        # Invalidate before emptying; see `_UtilityCache._store`.
+        self.valid = False
+        self.results.clear()
+
+
+class _ThreadState:
+    # What `_UtilityCache` keeps for each thread: the (utilities,
+    # results, table) of the most recently used registry, and the
+    # numbers of hits and misses.
+    __slots__ = ('current', 'counts', '__weakref__')
+
+    def __init__(self):
+        self.current = None
+        self.counts = [0, 0]
+
+
+def _retireCounts(lock, retired, counts):
+    with lock:
+        retired[0] += counts[0]
+        retired[1] += counts[1]
+
+
+class _UtilityCache:
+    """Memoize utility lookups per component registry.
+
+    Results are kept in one table per utility registry, keyed by
+    ``(interface, name)``. A table is discarded as soon as any registry
+    in the resolution order of the utility registry is changed, i.e.
+    whenever a registration is added to or removed from the component
+    registry or one of its bases, or their bases change. It is
+    discarded as well when one of them is a persistent registry that
+    is invalidated or turned into a ghost. A lookup that hits the cache
+    therefore only looks the result up in the table of the current
+    registry of the thread.
+
+    Unsuccessful lookups are cached as well. So that looking up names
+    that are never registered can't make a table grow without bounds,
+    a table is emptied when it holds `maxsize` results.
+
+    Everything a lookup changes when it hits the cache is local to the
+    thread, so that threads don't contend for it.
+    """
+
+    maxsize = 10000
+
+    def __init__(self):
+        self._tables = weakref.WeakKeyDictionary()
+        self._local = threading.local()
+        # Protects _states and _retired.
+        self._lock = threading.Lock()
+        self._states = weakref.WeakSet()
+        # The hits and misses of threads that have ended.
+        self._retired = [0, 0]
+
+    def _getState(self):
+        try:
+            return self._local.state
+        except AttributeError:
+            state = self._local.state = _ThreadState()
+            with self._lock:
+                self._states.add(state)
+            weakref.finalize(state, _retireCounts,
+                             self._lock, self._retired, state.counts)
+            return state
+
+    def clear(self):
+        self._tables.clear()
+        with self._lock:
+            self._retired[:] = [0, 0]
+            for state in self._states:
+                state.current = None
+                state.counts[:] = [0, 0]
+
+    def siteChanged(self):
+        self._getState().current = None
+
+    def _setCurrent(self, state, utilities):
+        # The current table of the thread spares us the weak-key lookup
+        # while the same site is current.
+        table = self._tables.get(utilities)
+        if table is None or not table.valid:
+            table = self._tables[utilities] = _UtilityTable(utilities)
+        current = state.current = (utilities, table.results, table)
+        return current
+
+    def _store(self, table, key, utility):
+        results = table.results
+        if len(results) >= self.maxsize:
+            results.clear()
+        results[key] = utility
+        if not table.valid:
+            # Changed while we were looking the utility up; the result
+            # may be outdated.
+            results.clear()
+
+    def queryUtility(self, sm, interface, name, default):
+        try:
+            state = self._local.state
+        except AttributeError:
+            state = self._getState()
+        current = state.current
+        key = (interface, name)
+        try:
+            utilities = sm.utilities
+            if current is None or current[0] is not utilities:
+                current = self._setCurrent(state, utilities)
+        except AttributeError:
+            # Not a `Components` registry, nothing we can cache.
+            return sm.queryUtility(interface, name, default)
+        utility = current[1].get(key, _not_cached)
+        if utility is not _not_cached:
+            state.counts[0] += 1
+        else:
+            state.counts[1] += 1
+            table = current[2]
+            if not table.valid:
+                table = self._setCurrent(state, utilities)[2]
+            utility = sm.queryUtility(interface, name, _marker)
+            self._store(table, key, utility)
+        return default if utility is _marker else utility
+
+    def queryNextUtility(self, sm, interface, name, default):
+        # The resolution order of ``sm.utilities`` includes the utility
+        # registries of all the bases, so the table of *sm* is
+        # invalidated whenever the answer could change.
+        try:
+            state = self._local.state
+        except AttributeError:
+            state = self._getState()
+        current = state.current
+        key = ('next', interface, name)
+        try:
+            utilities = sm.utilities
+            if current is None or current[0] is not utilities:
+                current = self._setCurrent(state, utilities)
+        except AttributeError:
+            return _queryNextUtility(sm, interface, name, default)
+        utility = current[1].get(key, _not_cached)
+        if utility is not _not_cached:
+            state.counts[0] += 1
+        else:
+            state.counts[1] += 1
+            table = current[2]
+            if not table.valid:
+                table = self._setCurrent(state, utilities)[2]
+            utility = _queryNextUtility(sm, interface, name, _marker)
+            self._store(table, key, utility)
+        return default if utility is _marker else utility
+
+    def statistics(self):
+        with self._lock:
+            hits, misses = self._retired
+            for state in self._states:
+                hits += state.counts[0]
+                misses += state.counts[1]
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': float(hits) / lookups if lookups else 0.0,
+        }
+
+
+_utility_cache = None
+
+
+def enableUtilityCache():
+    """Memoize the results of `queryUtility` and `getUtility`.
+
+    Lookups are cached per component registry and the cache is
+    invalidated whenever that registry, or one of its bases, is
+    changed. Enabling the cache again has no effect.
+
+    At most ``_UtilityCache.maxsize`` results, including unsuccessful
+    lookups, are kept per registry; the results for a registry are
+    discarded when there are more.
+
+    `queryNextUtility` and `getNextUtility` are cached as well, so that
+    looking up the next utility costs a single table lookup no matter
+    how deeply local site managers are nested.
+    """
+    global _utility_cache
+    if _utility_cache is None:
+        _utility_cache = _UtilityCache()
+
+
+def disableUtilityCache():
+    """Stop memoizing utility lookups and discard the cache.
+    """
+    global _utility_cache
+    _utility_cache = None
+
+
+def getUtilityCacheStatistics():
+    """Return the number of cache hits and misses as a dictionary.
+
+    The dictionary has the keys ``hits``, ``misses`` and ``hit_rate``.
+    If the cache is not enabled, `None` is returned.
+    """
+    cache = _utility_cache
+    if cache is None:
+        return None
+    return cache.statistics()
 
 
 @inherits_docs
@@ -210,9 +570,15 @@ def queryNextUtility(context, interface, name='', default=None):
         sm = getSiteManager(context)
     except ComponentLookupError:
         return default
-    bases = sm.__bases__
-    for base in bases:
-        util = base.queryUtility(interface, name, _marker)
+    cache = _utility_cache
+    if cache is not None:
+        return cache.queryNextUtility(sm, interface, name, default)
+    return _queryNextUtility(sm, interface, name, default)
+
+
+def _queryNextUtility(sm, interface, name, default):
+    for next_sm in sm.__bases__:
+        util = next_sm.queryUtility(interface, name, _marker)
         if util is not _marker:
             return util
     return default
@@ -253,11 +619,74 @@ def getFactoryInterfaces(name, context=None):
     return getUtility(IFactory, name, context).getInterfaces()
 
 
+class _FactoryIndex:
+    """The factories registered in a component registry, by interface.
+
+    Maps every specification the objects created by a registered
+    factory provide (including all the interfaces these extend) to the
+    ``(name, factory)`` pairs of those factories, in the order of
+    ``getUtilitiesFor(IFactory)``.
+
+    Like the tables of `_UtilityCache`, the index subscribes to every
+    utility registry in the resolution order and is invalidated when
+    one of them changes. It also subscribes to the specifications
+    returned by the factories' ``getInterfaces()`` so that it is
+    invalidated when declarations change.
+    """
+
+    def __init__(self, sm):
+        self.valid = True
+        for registry in sm.utilities.ro:
+            registry._addSubregistry(self)
+        self.factories = index = {}
+        for name, factory in sm.getUtilitiesFor(IFactory):
+            interfaces = factory.getInterfaces()
+            try:
+                specs = interfaces.__sro__
+            except AttributeError:
+                interfaces = tuple(interfaces)
+                specs = []
+                for iface in interfaces:
+                    specs.extend(spec for spec in iface.__sro__
+                                 if spec not in specs)
+            else:
+                interfaces = (interfaces,)
+            for spec in interfaces:
+                spec.subscribe(self)
+            for spec in specs:
+                index.setdefault(spec, []).append((name, factory))
+
+    def changed(self, originally_changed):
+        # Called when a registry or specification we subscribed to
+        # changes.
+        self.valid = False
+
+
+# The `_FactoryIndex` of each utility registry.
+_factory_indexes = weakref.WeakKeyDictionary()
+
+
+def _getFactoryIndex(sm):
+    try:
+        utilities = sm.utilities
+        index = _factory_indexes.get(utilities)
+        if index is None or not index.valid:
+            index = _factory_indexes[utilities] = _FactoryIndex(sm)
+    except AttributeError:
+        # Not a `Components` registry.
+        return None
+    return index
+
+
 @inherits_docs
 def getFactoriesFor(interface, context=None):
     """Return info on all factories implementing the given interface.
     """
     utils = getSiteManager(context)
+    index = _getFactoryIndex(utils)
+    if index is not None:
+        yield from index.factories.get(interface, ())
+        return
     for (name, factory) in utils.getUtilitiesFor(IFactory):
         interfaces = factory.getInterfaces()
         try:
@@ -268,3 +697,13 @@ def getFactoriesFor(interface, context=None):
                 if iface.isOrExtends(interface):
                     yield name, factory
                     break
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ModuleNotFoundError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(disableUtilityCache)
+    addCleanUp(_factory_indexes.clear)
+    del addCleanUp
@@ -1,6 +1,6 @@
 ##############################################################################
 #
-# Copyright (c) 2004 Zope Foundation and Contributors.
+# Copyright (c) 2001, 2002 Zope Foundation and Contributors.
 # All Rights Reserved.
 #
 # This software is subject to the provisions of the Zope Public License,
@@ -15,16 +15,49 @@
 
 Based on subscription adapters / handlers.
 """
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
 
+from zope.event import notify
 from zope.event import subscribers as event_subscribers
+from zope.interface import providedBy
 from zope.interface.interfaces import IObjectEvent
 
+from zope.component._api import _handlerResult
+from zope.component._api import getSiteManager
 from zope.component._api import subscribers as component_subscribers
 from zope.component._declaration import adapter
+from zope.component.hooks import getSite
+from zope.component.hooks import site as _site
+
+
+logger = logging.getLogger(__name__)
+
+
+# The list of events queued by `batchedEvents`, if any, as tuples of the
+# site and site manager current when they were notified and the event.
+_batch = contextvars.ContextVar('zope.component.event.batch', default=None)
+
+# The list of awaitables returned by handlers for `anotify` to await.
+_pending = contextvars.ContextVar('zope.component.event.pending',
+                                  default=None)
+
+# The tasks of coroutine handlers notified outside of `anotify`, which
+# the event loop only keeps weak references to.
+_tasks = set()
 
 
 def dispatch(*event):
-    component_subscribers(event, None)
+    batch = _batch.get()
+    if batch is not None:
+        batch.append((getSite(), getSiteManager(), event))
+    else:
+        component_subscribers(event, None)
 
 
 event_subscribers.append(dispatch)
@@ -35,3 +68,296 @@ def objectEventNotify(event):
     """Dispatch ObjectEvents to interested adapters.
     """
     component_subscribers((event.object, event), None)
+
+
+def _objectEventsNotify(batch):
+    # Called by `_dispatchBatch` with the site of the events current.
+    site = getSite()
+    sm = getSiteManager()
+    _dispatchBatch([(site, sm, (event.object, event)) for (event,) in batch])
+
+
+objectEventNotify.__component_batched__ = _objectEventsNotify
+
+
+def batched(handle_batch):
+    """Make a handler from a function handling a batch of events.
+
+    *handle_batch* is called with a list of the argument tuples the
+    handler would have been called with one by one. Events delivered by
+    `batchedEvents` come in batches of events that provide the same
+    interfaces (and are for objects providing the same interfaces);
+    any other event comes in a batch of its own::
+
+        @adapter(IContent, IObjectModifiedEvent)
+        @batched
+        def reindex(batch):
+            catalog.reindexObjects([ob for ob, event in batch])
+
+    .. versionadded:: 7.2
+    """
+    @functools.wraps(handle_batch)
+    def handler(*objects):
+        handle_batch([objects])
+    handler.__component_batched__ = handle_batch
+    return handler
+
+
+@contextlib.contextmanager
+def batchedEvents():
+    """Context manager queueing the events notified in its ``with`` body.
+
+    The queued events are delivered when the ``with`` body is left,
+    grouped by the site manager current when they were notified and by
+    the interfaces provided by the events and, for object events, by
+    their objects. The handlers for a group are looked up once in that
+    site manager, with the site the events were notified in as the
+    current site, and each of them is called for all events of the
+    group before the next handler is called. Handlers made with
+    `batched` are called once per group with the whole group. Groups are
+    delivered in the order in which their first events were notified.
+
+    Only use this for events whose handlers don't need to run before
+    the code notifying them continues, for example during a bulk import.
+    Nested ``with`` bodies deliver their events with the outermost one.
+    If the ``with`` body raises an exception, the queued events are
+    discarded.
+
+    .. versionadded:: 7.2
+    """
+    if _batch.get() is not None:
+        yield
+        return
+    batch = []
+    token = _batch.set(batch)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+    _dispatchBatch(batch)
+
+
+def _dispatchBatch(batch):
+    # Dispatch the argument tuples in the (site, site manager, objects)
+    # tuples of *batch* to the handlers of the site manager, looking up
+    # the handlers once for all tuples of objects providing the same
+    # interfaces.
+    groups = {}
+    for site, sm, objects in batch:
+        key = (sm, tuple([providedBy(ob) for ob in objects]))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = (site, [])
+        group[1].append(objects)
+    for (sm, specs), (site, group) in groups.items():
+        with _site(site):
+            _dispatchGroup(sm, specs, group)
+
+
+def _dispatchGroup(sm, specs, group):
+    adapters = getattr(sm, 'adapters', None)
+    if adapters is None:
+        for objects in group:
+            sm.subscribers(objects, None)
+        return
+    for handler in adapters.subscriptions(specs, None):
+        handle_batch = getattr(handler, '__component_batched__', None)
+        if handle_batch is not None:
+            handle_batch(group)
+        else:
+            for objects in group:
+                result = handler(*objects)
+                if result is not None:
+                    _handlerResult(result)
+
+
+async def anotify(event, concurrency=None):
+    """Notify *event* like `zope.event.notify`, awaiting async handlers.
+
+    Handlers that are coroutine functions (``async def``) can be
+    registered like any other handler. Ordinary handlers are called
+    while *event* is notified; the coroutines of async handlers are then
+    run concurrently, at most *concurrency* of them at a time if it is
+    given, and awaited. If any of them raises an exception, the first
+    one is raised once all of them are done.
+
+    When an event is notified with `zope.event.notify` instead, the
+    coroutines of async handlers are scheduled as tasks of the running
+    event loop, or run to completion if there is none.
+
+    .. versionadded:: 7.2
+    """
+    pending = []
+    token = _pending.set(pending)
+    try:
+        notify(event)
+    finally:
+        _pending.reset(token)
+    if not pending:
+        return
+    if concurrency is not None:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _limited(awaitable):
+            async with semaphore:
+                return await awaitable
+        pending = [_limited(awaitable) for awaitable in pending]
+    for result in await asyncio.gather(*pending, return_exceptions=True):
+        if isinstance(result, BaseException):
+            raise result
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def _schedule(awaitable):
+    # Called by `zope.component._api` with the awaitable returned by a
+    # coroutine handler.
+    pending = _pending.get()
+    if pending is not None:
+        pending.append(awaitable)
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(_await(awaitable))
+    else:
+        task = loop.create_task(_await(awaitable))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+
+# The executor running deferred handlers, see `setDeferredExecutor`, and
+# whether it was created here.
+_executor = None
+_own_executor = False
+# Protects the following and is notified when a deferred call is done.
+_deferred = threading.Condition()
+_futures = set()
+_errors = []
+
+
+class DeferredHandler:
+    """A handler calling *handler* in the background.
+
+    Calling it submits a call of *handler* with the same arguments to the
+    executor set with `setDeferredExecutor` and returns right away. The
+    handler runs with the site that was current when it was called.
+    Exceptions it raises are logged, and returned by
+    `flushDeferredHandlers`.
+
+    A deferred handler is equal to the handler it calls, so unregistering
+    that handler unregisters the deferred handler, too.
+
+    .. versionadded:: 7.2
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        adapts = getattr(handler, '__component_adapts__', None)
+        if adapts is not None:
+            self.__component_adapts__ = adapts
+
+    def __call__(self, *objects):
+        executor = _getExecutor()
+        future = executor.submit(_runDeferred, getSite(), self.handler,
+                                 objects)
+        with _deferred:
+            _futures.add(future)
+        future.add_done_callback(_deferredDone)
+
+    def __eq__(self, other):
+        if isinstance(other, DeferredHandler):
+            other = other.handler
+        return self.handler == other
+
+    def __hash__(self):
+        return hash(self.handler)
+
+    def __repr__(self):
+        return '<{} {!r}>'.format(type(self).__name__, self.handler)
+
+
+def _runDeferred(site, handler, objects):
+    with _site(site):
+        handler(*objects)
+
+
+def _deferredDone(future):
+    error = None if future.cancelled() else future.exception()
+    if error is not None:
+        logger.error('Error in deferred event handler', exc_info=error)
+    with _deferred:
+        if error is not None:
+            _errors.append(error)
+        _futures.discard(future)
+        _deferred.notify_all()
+
+
+def _getExecutor():
+    global _executor, _own_executor
+    with _deferred:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                thread_name_prefix='zope.component.event')
+            _own_executor = True
+        return _executor
+
+
+def setDeferredExecutor(executor=None):
+    """Set the `concurrent.futures.Executor` running deferred handlers.
+
+    By default, or if *executor* is None, they run in a thread pool
+    created when they are first called. Calls already submitted still run
+    in the executor they were submitted to.
+
+    With a process pool, the handlers, the objects they are called for,
+    and the current site are pickled, and the worker processes need to
+    call `zope.component.hooks.setHooks` for the site to be effective.
+
+    .. versionadded:: 7.2
+    """
+    _setExecutor(executor, wait=False)
+
+
+def _setExecutor(executor, wait):
+    global _executor, _own_executor
+    with _deferred:
+        old, own = _executor, _own_executor
+        _executor, _own_executor = executor, False
+    if own:
+        old.shutdown(wait=wait)
+
+
+def flushDeferredHandlers(timeout=None):
+    """Wait until all deferred handlers called so far are done.
+
+    This includes the deferred handlers called by deferred handlers while
+    waiting. Return the list of exceptions raised by deferred handlers
+    since the last call. If they are not done within *timeout* seconds,
+    raise `TimeoutError`.
+
+    .. versionadded:: 7.2
+    """
+    with _deferred:
+        if not _deferred.wait_for(lambda: not _futures, timeout):
+            raise TimeoutError(
+                '%d deferred event handlers are not done' % len(_futures))
+        errors = _errors[:]
+        del _errors[:]
+    return errors
+
+
+def _clearDeferred():
+    flushDeferredHandlers()
+    _setExecutor(None, wait=True)
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ModuleNotFoundError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_clearDeferred)
+    del addCleanUp
@@ -26,8 +26,15 @@ class Factory:
 
     The purpose of this implementation is to provide a quick way of creating
     factories for classes, functions and other objects.
+
+    .. versionchanged:: 7.2
+       The specification of explicitly given *interfaces* is computed
+       once and cached. Added `providesInterface`.
     """
 
+    # (interfaces, spec) for the explicitly given interfaces. Not pickled.
+    _spec = None
+
     def __init__(self, callable, title='', description='', interfaces=None):
         self._callable = callable
         self.title = title
@@ -38,11 +45,29 @@ class Factory:
         return self._callable(*args, **kw)
 
     def getInterfaces(self):
-        if self._interfaces is not None:
-            spec = Implements(*self._interfaces)
+        interfaces = self._interfaces
+        if interfaces is not None:
+            cached = self._spec
+            if cached is not None and cached[0] is interfaces:
+                return cached[1]
+            spec = Implements(*interfaces)
             spec.__name__ = getattr(self._callable, '__name__', '[callable]')
+            self._spec = (interfaces, spec)
             return spec
         return implementedBy(self._callable)
 
+    def providesInterface(self, interface):
+        """Return whether objects created by this factory provide
+        *interface* (according to `getInterfaces`).
+
+        .. versionadded:: 7.2
+        """
+        return self.getInterfaces().isOrExtends(interface)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_spec', None)
+        return state
+
     def __repr__(self):  # pragma: no cover
         return f'<{self.__class__.__name__} for {self._callable!r}>'
@@ -13,6 +13,11 @@
 ##############################################################################
 """Global components support
 """
+import functools
+import gc
+import threading
+
+from zope.interface.adapter import AdapterLookupBase
 from zope.interface.adapter import AdapterRegistry
 from zope.interface.registry import Components
 
@@ -20,6 +25,103 @@ from zope.component.interfaces import inherits_arch_docs
 from zope.component.interfaces import inherits_reg_docs
 
 
+class FrozenRegistryError(TypeError):
+    """An attempt was made to change a frozen global registry.
+
+    .. seealso:: `BaseGlobalComponents.freeze`
+    """
+
+
+def _checkNotFrozen(registry):
+    if registry._frozen:
+        raise FrozenRegistryError(
+            "Cannot change the frozen registry %r" % (registry,))
+
+
+def _mutator(func):
+    # Wrap a method that changes registrations so that it refuses to
+    # work once the registry has been frozen, and so that, in
+    # concurrent mode, writers are serialized and changes are made by
+    # copying.
+    @functools.wraps(func)
+    def mutator(self, *args, **kwargs):
+        _checkNotFrozen(self)
+        lock = self._lock
+        if lock is None:
+            return func(self, *args, **kwargs)
+        with lock:
+            _checkNotFrozen(self)
+            return self._copyOnWrite(func, args, kwargs)
+    return mutator
+
+
+def _copyMapping(mapping, depth):
+    if depth == 1:
+        return dict(mapping)
+    return {k: _copyMapping(v, depth - 1) for k, v in mapping.items()}
+
+
+def _copyByOrder(byorder):
+    # Copy the nested mappings of ``_adapters`` or ``_subscribers``
+    # without copying the registered values. The mappings for *order*
+    # required specifications are nested ``order + 2`` levels deep:
+    # one level for each required specification, the provided
+    # interface and the name.
+    return [_copyMapping(components, order + 2)
+            for order, components in enumerate(byorder)]
+
+
+class _StagedLookup:
+    # Keeps track of the extendors of a `_StagedRegistry`.
+
+    add_extendor = AdapterLookupBase.add_extendor
+    remove_extendor = AdapterLookupBase.remove_extendor
+
+    def __init__(self, extendors):
+        # The lists are replaced, never changed in place.
+        self._extendors = dict(extendors)
+
+    def changed(self, originally_changed):
+        pass
+
+
+class _StagedRegistry(AdapterRegistry):
+    # A private copy of the registrations of a `GlobalAdapterRegistry`
+    # that changes are applied to before they are published.
+
+    def __init__(self, registry):
+        self._adapters = _copyByOrder(registry._adapters)
+        self._subscribers = _copyByOrder(registry._subscribers)
+        self._provided = dict(registry._provided)
+        self._generation = registry._generation
+        self._v_lookup = _StagedLookup(registry._v_lookup._extendors)
+
+    def changed(self, originally_changed):
+        self._generation += 1
+
+
+class _PublishedState:
+    # The registrations of a `GlobalAdapterRegistry` in concurrent mode,
+    # as of one change. The lookup of the registry reads them from here
+    # (the lookup only uses the attributes below), and they are never
+    # changed.
+
+    def __init__(self, registry, staged):
+        self._registry = registry
+        self._adapters = staged._adapters
+        self._subscribers = staged._subscribers
+        self._provided = staged._provided
+        self._extendors = staged._v_lookup._extendors
+
+    @property
+    def _v_lookup(self):
+        return self
+
+    @property
+    def ro(self):
+        return (self,) + tuple(self._registry.ro[1:])
+
+
 def GAR(components, registryName):
     return getattr(components, registryName)
 
@@ -30,6 +132,12 @@ class GlobalAdapterRegistry(AdapterRegistry):
     This adapter registry's main purpose is to be picklable in combination
     with a site manager."""
 
+    _frozen = False
+    _lock = None
+    # The private copy changes are applied to while the component
+    # registry is being changed in concurrent mode.
+    _staged = None
+
     def __init__(self, parent, name):
         self.__parent__ = parent
         self.__name__ = name
@@ -38,9 +146,86 @@ class GlobalAdapterRegistry(AdapterRegistry):
     def __reduce__(self):
         return GAR, (self.__parent__, self.__name__)
 
+    register = _mutator(AdapterRegistry.register)
+    unregister = _mutator(AdapterRegistry.unregister)
+    subscribe = _mutator(AdapterRegistry.subscribe)
+    unsubscribe = _mutator(AdapterRegistry.unsubscribe)
+
+    def _setBases(self, bases):
+        _checkNotFrozen(self)
+        super()._setBases(bases)
+
+    # In concurrent mode, caches of lookups in other threads subscribe
+    # at any time; don't change the subregistries while `_publish`
+    # notifies them.
+
+    def _addSubregistry(self, r):
+        lock = self._lock
+        if lock is None:
+            super()._addSubregistry(r)
+        else:
+            with lock:
+                super()._addSubregistry(r)
+
+    def _removeSubregistry(self, r):
+        lock = self._lock
+        if lock is None:
+            super()._removeSubregistry(r)
+        else:
+            with lock:
+                super()._removeSubregistry(r)
+
+    def _enableConcurrency(self, lock):
+        self._publish(_StagedRegistry(self))
+        self._lock = lock
+
+    def _copyOnWrite(self, func, args, kwargs):
+        staged = self._staged
+        if staged is not None:
+            # Part of a change of the component registry, which
+            # publishes it when it is complete.
+            return func(staged, *args, **kwargs)
+        staged = _StagedRegistry(self)
+        result = func(staged, *args, **kwargs)
+        if staged._generation != self._generation:
+            self._publish(staged)
+        return result
+
+    def _publish(self, staged):
+        lookup = self._v_lookup
+        # From here on, lookups in this registry see the new state...
+        lookup._registry = _PublishedState(self, staged)
+        # ...and so do registries based on this one.
+        self._adapters = staged._adapters
+        self._subscribers = staged._subscribers
+        self._provided = staged._provided
+        lookup._extendors = staged._v_lookup._extendors
+        if '_cache' in lookup.__dict__:  # pragma: no cover
+            # The Python implementation of the lookup; make sure that
+            # lookups still in progress can't store their results in
+            # the new caches.
+            lookup._cache = {}
+            lookup._mcache = {}
+            lookup._scache = {}
+        self._generation = staged._generation
+        lookup.changed(self)
+        for sub in self._v_subregistries.keys():
+            sub.changed(self)
+
 
 class BaseGlobalComponents(Components):
 
+    _frozen = False
+    _lock = None
+
+    def __init__(self, name='', bases=()):
+        # Re-initializing (as done by test clean up) thaws the registry
+        # and ends concurrent mode.
+        self.__dict__.pop('_frozen', None)
+        self.__dict__.pop('_lock', None)
+        self.__dict__.pop('queryUtility', None)
+        super().__init__(name, bases)
+
     def _init_registries(self):
         self.adapters = GlobalAdapterRegistry(self, 'adapters')
         self.utilities = GlobalAdapterRegistry(self, 'utilities')
@@ -49,6 +234,138 @@ class BaseGlobalComponents(Components):
         # Global site managers are pickled as global objects
         return self.__name__
 
+    def _setBases(self, bases):
+        # Changing the bases changes what lookups find as much as
+        # (un)registering does.
+        _checkNotFrozen(self)
+        super()._setBases(bases)
+
+    registerUtility = _mutator(Components.registerUtility)
+    unregisterUtility = _mutator(Components.unregisterUtility)
+    registerAdapter = _mutator(Components.registerAdapter)
+    unregisterAdapter = _mutator(Components.unregisterAdapter)
+    registerSubscriptionAdapter = _mutator(
+        Components.registerSubscriptionAdapter)
+    unregisterSubscriptionAdapter = _mutator(
+        Components.unregisterSubscriptionAdapter)
+    registerHandler = _mutator(Components.registerHandler)
+    unregisterHandler = _mutator(Components.unregisterHandler)
+
+    def freeze(self):
+        """Make this registry read-only.
+
+        This is meant to be called once configuration is complete, for
+        example after all ZCML has been loaded. Afterwards, all
+        attempts to register or unregister components, or to change
+        the ``__bases__`` of the registry or of its adapter
+        registries, raise `FrozenRegistryError`.
+
+        All utility lookups that can succeed, in this registry or its
+        bases, are computed up front and `queryUtility` is served from
+        a flat dictionary. That is only done when the bases are frozen
+        as well; otherwise registrations in the bases must still be
+        seen, and utility lookups keep using the lookup caches of the
+        utility registry. Adapter and subscriber lookups keep using the
+        lookup caches of the adapter registry, which are only
+        invalidated by changes to the bases.
+
+        Calling ``__init__`` again (as test clean up does) thaws the
+        registry.
+
+        .. versionadded:: 7.2
+        """
+        lock = self._lock
+        if lock is None:
+            self._freeze()
+        else:
+            with lock:
+                self._freeze()
+
+    def _freeze(self):
+        if self._frozen:
+            return
+        utilities = self.utilities
+        if all(getattr(r, '_frozen', False) for r in utilities.ro[1:]):
+            lookup = utilities.lookup
+            table = {}
+            for registry in utilities.ro:
+                for _, provided, name, _ in registry.allRegistrations():
+                    for iface in provided.__iro__:
+                        key = (iface, name)
+                        if key not in table:
+                            table[key] = lookup((), iface, name)
+            get = table.get
+
+            def queryUtility(provided, name='', default=None):
+                return get((provided, name), default)
+
+            self.queryUtility = queryUtility
+        self._frozen = self.adapters._frozen = utilities._frozen = True
+
+    def enableConcurrentRegistration(self):
+        """Allow registering and unregistering from several threads.
+
+        Afterwards, changes to the registrations are serialized by a
+        lock and made to private copies of the data structures of the
+        adapter registries, which are then published at once. Lookups
+        take no lock and see each change either completely or not at
+        all, even while another thread is changing registrations.
+
+        Each change copies the registrations, so its cost grows with
+        the size of the registry. This is meant for registries that
+        are mostly read, with the occasional registration at runtime;
+        call it after configuration is complete.
+
+        All changes made by one call, like registering a utility and
+        subscribing it, are published together when the call returns.
+        That includes registrations made by handlers of the events the
+        call sends, and lookups made by these handlers don't see the
+        changes yet.
+
+        Only lookups are isolated this way. Registrations in progress
+        may already be visible to the methods listing registrations,
+        like `registeredUtilities`.
+
+        Calling ``__init__`` again (as test clean up does) ends
+        concurrent mode.
+
+        .. versionadded:: 7.2
+        """
+        if self._lock is not None:
+            return
+        lock = threading.RLock()
+        with lock:
+            self.adapters._enableConcurrency(lock)
+            self.utilities._enableConcurrency(lock)
+            self._lock = lock
+
+    def _copyOnWrite(self, func, args, kwargs):
+        registries = (self.adapters, self.utilities)
+        if registries[0]._staged is not None:
+            # Made by a handler of an event sent by the change in
+            # progress, which publishes this one as well.
+            return func(self, *args, **kwargs)
+        # Iterations over the registrations already in progress keep
+        # using the old containers.
+        self._utility_registrations = dict(self._utility_registrations)
+        self._adapter_registrations = dict(self._adapter_registrations)
+        self._subscription_registrations = list(
+            self._subscription_registrations)
+        self._handler_registrations = list(self._handler_registrations)
+        # Registering a utility both registers and subscribes it; apply
+        # all changes to one copy of each adapter registry and publish
+        # it once, so that lookups never see only some of them.
+        for registry in registries:
+            registry._staged = _StagedRegistry(registry)
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            for registry in registries:
+                staged = registry._staged
+                del registry._staged
+                if staged._generation != registry._generation:
+                    registry._publish(staged)
+
 
 base = BaseGlobalComponents('base')
 
@@ -68,6 +385,68 @@ def getGlobalSiteManager():
     return globalSiteManager
 
 
+def warmLookupCaches(registry):
+    """Fill the lookup caches of the adapter registry *registry*.
+
+    Lookups, ``lookupAll`` and subscriptions are performed for every
+    registration, using the required specifications as registered and
+    every interface the registered provided interface extends. This
+    covers all utility lookups and those adapter lookups that are made
+    for the registered specifications.
+
+    .. versionadded:: 7.2
+    """
+    looked_up = set()
+    looked_up_all = set()
+    subscribed = set()
+    for required, provided, name, _ in registry.allRegistrations():
+        for iface in provided.__iro__:
+            if (required, iface, name) not in looked_up:
+                looked_up.add((required, iface, name))
+                registry.lookup(required, iface, name)
+            if (required, iface) not in looked_up_all:
+                looked_up_all.add((required, iface))
+                registry.lookupAll(required, iface)
+    for required, provided, _ in registry.allSubscriptions():
+        ifaces = (None,) if provided is None else provided.__iro__
+        for iface in ifaces:
+            if (required, iface) not in subscribed:
+                subscribed.add((required, iface))
+                registry.subscriptions(required, iface)
+
+
+def prepareForFork(registry=None, freeze=True):
+    """Prepare a configured global registry to be shared with forked workers.
+
+    Pre-forking servers load the configuration once and then fork
+    worker processes, which share the memory pages of the parent until
+    they write to them. Lazily populated lookup caches defeat this: each
+    worker fills them on its own and so ends up with private copies of
+    the pages holding the registry.
+
+    This function fills the lookup caches of both adapter registries of
+    *registry* (the global site manager by default), then, if *freeze*
+    is true, freezes it (see `BaseGlobalComponents.freeze`) so that
+    nothing on the lookup path changes anymore, and finally moves all
+    objects alive at that point to the permanent generation of the
+    garbage collector (`gc.freeze`), so that collections in the workers
+    do not touch them.
+
+    Call this in the parent process right before forking.
+
+    .. versionadded:: 7.2
+    """
+    if registry is None:
+        registry = base
+    warmLookupCaches(registry.utilities)
+    warmLookupCaches(registry.adapters)
+    if freeze:
+        registry.freeze()
+    gc.collect()
+    if hasattr(gc, 'freeze'):  # pragma: no branch PyPy lacks gc.freeze
+        gc.freeze()
+
+
 # The following APIs provide global registration support for Python code.
 # We eventually want to deprecate these in favor of using the global
 # component registry directly.
@@ -89,5 +468,8 @@ def provideSubscriptionAdapter(factory, adapts=None, provides=None):
 
 
 @inherits_reg_docs
-def provideHandler(factory, adapts=None):
+def provideHandler(factory, adapts=None, deferred=False):
+    if deferred:
+        from zope.component.event import DeferredHandler
+        factory = DeferredHandler(factory)
     base.registerHandler(factory, adapts, event=False)
@@ -16,6 +16,7 @@
 __docformat__ = 'restructuredtext'
 
 import contextlib
+import contextvars
 import threading
 
 from zope.component._compat import ZOPE_SECURITY_NOT_AVAILABLE_EX
@@ -32,6 +33,7 @@ except ZOPE_SECURITY_NOT_AVAILABLE_EX:  # pragma: no cover
 from zope.interface.interfaces import ComponentLookupError
 from zope.interface.interfaces import IComponentLookup
 
+from zope.component import _api
 from zope.component.globalregistry import getGlobalSiteManager
 
 
@@ -66,14 +68,99 @@ class SiteInfo(threading.local):
     site = None
     sm = getGlobalSiteManager()
 
+    # The cached adapter hook is stored in the thread's own instance
+    # dictionary, so looking up adapters never writes state shared with
+    # other threads, with or without the GIL.
     @read_property
     def adapter_hook(self):
         adapter_hook = self.sm.adapters.adapter_hook
         self.adapter_hook = adapter_hook
         return adapter_hook
 
+    def _getState(self):
+        # The current site, its site manager and the adapter hook if it
+        # has been computed already, else None.
+        return self.site, self.sm, self.__dict__.get('adapter_hook')
 
-siteinfo = SiteInfo()
+    def _setState(self, state):
+        self.site, self.sm, adapter_hook = state
+        if adapter_hook is None:
+            self.__dict__.pop('adapter_hook', None)
+        else:
+            self.adapter_hook = adapter_hook
+
+
+class ContextSiteInfo:
+    """Site information kept in a `contextvars.ContextVar`.
+
+    Each asyncio task runs in a copy of the context it was created in,
+    so concurrently running tasks can have different current sites
+    without having to call `setSite` around every ``await``. Threads
+    start with an empty context and thus with the global site manager.
+
+    .. versionadded:: 7.2
+    """
+
+    def __init__(self):
+        self._state = contextvars.ContextVar(
+            'zope.component.hooks.siteinfo',
+            default=(None, getGlobalSiteManager(), None))
+
+    @property
+    def site(self):
+        return self._state.get()[0]
+
+    @site.setter
+    def site(self, site):
+        _, sm, adapter_hook = self._state.get()
+        self._state.set((site, sm, adapter_hook))
+
+    @property
+    def sm(self):
+        return self._state.get()[1]
+
+    @sm.setter
+    def sm(self, sm):
+        site, _, adapter_hook = self._state.get()
+        self._state.set((site, sm, adapter_hook))
+
+    @property
+    def adapter_hook(self):
+        site, sm, adapter_hook = self._state.get()
+        if adapter_hook is None:
+            adapter_hook = sm.adapters.adapter_hook
+            self._state.set((site, sm, adapter_hook))
+        return adapter_hook
+
+    @adapter_hook.setter
+    def adapter_hook(self, adapter_hook):
+        site, sm, _ = self._state.get()
+        self._state.set((site, sm, adapter_hook))
+
+    @adapter_hook.deleter
+    def adapter_hook(self):
+        site, sm, adapter_hook = self._state.get()
+        if adapter_hook is None:
+            raise AttributeError('adapter_hook')
+        self._state.set((site, sm, None))
+
+    def _getState(self):
+        return self._state.get()
+
+    def _setState(self, state):
+        self._state.set(state)
+
+
+_thread_siteinfo = siteinfo = SiteInfo()
+_context_siteinfo = ContextSiteInfo()
+
+
+def _useSiteInfo(new_siteinfo):
+    global siteinfo
+    if new_siteinfo is not siteinfo:
+        # Carry the current site of the caller over to the new storage.
+        new_siteinfo._setState(siteinfo._getState())
+        siteinfo = new_siteinfo
 
 
 def setSite(site=None):
@@ -92,12 +179,31 @@ def setSite(site=None):
         # The getSiteManager method is defined by IPossibleSite.
         sm = site.getSiteManager()
 
-    siteinfo.site = site
-    siteinfo.sm = sm
-    try:
-        del siteinfo.adapter_hook
-    except AttributeError:
-        pass
+    info = siteinfo
+    old_site, old_sm, adapter_hook = info._getState()
+    if (site is old_site and sm is old_sm
+            and _hookIsCurrent(sm, adapter_hook)):
+        # Traversal sets the same site over and over again. Keep the
+        # adapter hook and the cached utility table derived from it.
+        return
+    info._setState((site, sm, None))
+    _siteChanged()
+
+
+def _hookIsCurrent(sm, adapter_hook):
+    # A persistent adapter registry gets a new lookup when it is
+    # reloaded, e.g. after a transaction abort; a hook bound to the old
+    # lookup would keep answering from the old registrations.
+    lookup = getattr(getattr(sm, 'adapters', None), '_v_lookup', None)
+    if adapter_hook is None or lookup is None:
+        return True
+    return getattr(adapter_hook, '__self__', lookup) is lookup
+
+
+def _siteChanged():
+    cache = _api._utility_cache
+    if cache is not None:
+        cache.siteChanged()
 
 
 def getSite():
@@ -111,13 +217,25 @@ def site(site):
 
     Context manager that sets *site* as the current site for the
     duration of the ``with`` body.
+
+    .. versionchanged:: 7.2
+       The previous site is restored together with its site manager and
+       adapter hook as they were when the ``with`` body was entered,
+       instead of being set again. An adapter hook bound to a lookup
+       that the site manager's adapter registry has since replaced is
+       not restored.
     """
-    old_site = getSite()
+    state = siteinfo._getState()
     setSite(site)
     try:
         yield
     finally:
-        setSite(old_site)
+        old_site, old_sm, adapter_hook = state
+        if not _hookIsCurrent(old_sm, adapter_hook):
+            state = (old_site, old_sm, None)
+        if siteinfo.site is not old_site or siteinfo.sm is not old_sm:
+            siteinfo._setState(state)
+            _siteChanged()
 
 
 def getSiteManager(context=None):
@@ -147,7 +265,7 @@ def adapter_hook(interface, object, name='', default=None):
         return default
 
 
-def setHooks():
+def setHooks(use_contextvars=None):
     """
     Make `zope.component.getSiteManager` and interface adaptation
     respect the current site.
@@ -156,9 +274,23 @@ def setHooks():
     startup sequence. Test code that uses these APIs should also arrange to
     call this.
 
+    By default, the current site is local to the thread. If
+    *use_contextvars* is true, the current site is instead stored in a
+    `contextvars.ContextVar` (see `ContextSiteInfo`), which gives each
+    asyncio task its own current site; if it is false, the thread-local
+    storage is used again. If it is None (the default), the storage in
+    use is kept, so that calling this again, as frameworks and test
+    layers do, doesn't undo the choice. The site that is current for
+    the caller is kept when switching between the two.
+
     .. seealso:: :mod:`zope.component.testlayer`
+
+    .. versionchanged:: 7.2
+       Add the *use_contextvars* argument.
     """
-    from zope.component import _api
+    if use_contextvars is not None:
+        _useSiteInfo(_context_siteinfo if use_contextvars
+                     else _thread_siteinfo)
     _api.adapter_hook.sethook(adapter_hook)
     _api.getSiteManager.sethook(getSiteManager)
 
@@ -176,9 +308,9 @@ def resetHooks():
     failures in adaptation and utility lookup.
     """
     # Reset hookable functions to original implementation.
-    from zope.component import _api
     _api.adapter_hook.reset()
     _api.getSiteManager.reset()
+    _useSiteInfo(_thread_siteinfo)
     # be sure the old adapter hook isn't cached, since
     # it is derived from the SiteManager
     try:
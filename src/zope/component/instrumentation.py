@@ -0,0 +1,425 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Instrumentation of the component lookup API.
+
+When enabled, calls to `zope.component.getUtility`,
+`~zope.component.queryUtility`, `~zope.component.queryAdapter`,
+`~zope.component.queryMultiAdapter`, `~zope.component.subscribers` and
+`~zope.component.handle` are counted and timed per function, interface
+and name. While disabled, the only cost to these functions is a check
+of a module global.
+
+Calls made from within other instrumented calls (for example the
+`~zope.component.queryUtility` call made by
+`~zope.component.getUtility`) are recorded as well, so the time of the
+outer call includes the time of the inner one.
+
+Handler profiling separately times the event handlers called by
+`~zope.component.handle` and by `~zope.component.subscribers` (and thus
+by `zope.component.event.dispatch`) per handler and registration.
+"""
+import threading
+import time
+import weakref
+
+from zope.interface import providedBy
+from zope.interface.interfaces import ComponentLookupError
+
+from zope.component import _api
+
+
+__all__ = [
+    'enableInstrumentation',
+    'disableInstrumentation',
+    'getInstrumentationReport',
+    'enableHandlerProfiling',
+    'disableHandlerProfiling',
+    'getHandlerProfileReport',
+    'getHandlerProfileStacks',
+]
+
+
+class LookupRecorder:
+    """Records calls to the lookup functions of `zope.component._api`.
+
+    Statistics are kept as ``[calls, misses, total time]`` per
+    ``(function name, interface, name)``.
+    """
+
+    #: Passed as the value returned when nothing was found by functions
+    #: returning a (possibly empty) sequence.
+    EMPTY = object()
+
+    _no_default = object()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {}
+
+    def enter(self):
+        """Return whether a call to an instrumented function is recorded.
+
+        `record` calls the instrumented function again to do the actual
+        work; that call must not be recorded a second time.
+        """
+        local = self._local
+        if getattr(local, 'bypass', False):
+            local.bypass = False
+            return False
+        return True
+
+    def record(self, func, interface, name, args, default=_no_default):
+        """Call *func* with *args* and record the call.
+
+        The call is a miss if it returns *default* (or an empty
+        sequence, if *default* is `EMPTY`), or if it raises a
+        `~zope.interface.interfaces.ComponentLookupError`.
+        """
+        missed = False
+        self._local.bypass = True
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except ComponentLookupError:
+            missed = True
+            raise
+        else:
+            if default is self.EMPTY:
+                missed = not result
+            else:
+                missed = result is default
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            # In case func failed before calling `enter`.
+            self._local.bypass = False
+            key = (func.__name__, interface, name)
+            with self._lock:
+                stats = self.stats.get(key)
+                if stats is None:
+                    stats = self.stats[key] = [0, 0, 0.0]
+                stats[0] += 1
+                stats[1] += missed
+                stats[2] += elapsed
+
+    def report(self):
+        """Return the statistics as a list of dictionaries.
+
+        The list is sorted by cumulative time, longest first.
+        """
+        with self._lock:
+            items = [(key, list(stats)) for key, stats in self.stats.items()]
+        report = []
+        for (function, interface, name), (calls, misses, total) in items:
+            report.append({
+                'function': function,
+                'interface': interface,
+                'name': name,
+                'calls': calls,
+                'misses': misses,
+                'miss_rate': float(misses) / calls,
+                'total_time': total,
+                'mean_time': total / calls,
+            })
+        report.sort(key=lambda entry: entry['total_time'], reverse=True)
+        return report
+
+
+def enableInstrumentation():
+    """Start recording calls to the lookup functions.
+
+    Statistics recorded so far are discarded.
+
+    .. versionadded:: 7.2
+    """
+    _api._recorder = LookupRecorder()
+
+
+def disableInstrumentation():
+    """Stop recording calls to the lookup functions.
+
+    The statistics recorded so far are returned by
+    `getInstrumentationReport` until instrumentation is enabled again.
+
+    .. versionadded:: 7.2
+    """
+    global _last_recorder
+    if _api._recorder is not None:
+        _last_recorder = _api._recorder
+    _api._recorder = None
+
+
+_last_recorder = None
+
+
+def getInstrumentationReport():
+    """Return the statistics recorded by the current or last instrumentation.
+
+    This is a list of dictionaries, one for each combination of
+    function, interface and name that was seen, sorted by cumulative
+    time (longest first). Each dictionary has the keys ``function``,
+    ``interface``, ``name``, ``calls``, ``misses``, ``miss_rate``,
+    ``total_time`` and ``mean_time``; times are in seconds.
+
+    .. versionadded:: 7.2
+    """
+    recorder = _api._recorder
+    if recorder is None:
+        recorder = _last_recorder
+    if recorder is None:
+        return []
+    return recorder.report()
+
+
+def _describeHandler(handler):
+    from zope.component.event import DeferredHandler
+    if isinstance(handler, DeferredHandler):
+        return _describeHandler(handler.handler) + ' (deferred)'
+    name = getattr(handler, '__qualname__', None)
+    if name is None:
+        return repr(handler)
+    module = getattr(handler, '__module__', None)
+    return name if module is None else '{}.{}'.format(module, name)
+
+
+def _describeInfo(info):
+    # The info of a registration made in ZCML tells the file and line of
+    # the directive (and the directive itself).
+    file = getattr(info, 'file', None)
+    if file is not None:
+        return '{}:{}'.format(file, getattr(info, 'line', '?'))
+    return str(info)
+
+
+def _componentsOf(sitemanager):
+    # The registry and its bases, each once.
+    result = []
+    seen = set()
+    todo = [sitemanager]
+    while todo:
+        registry = todo.pop(0)
+        if id(registry) not in seen:
+            seen.add(id(registry))
+            result.append(registry)
+            todo.extend(getattr(registry, '__bases__', ()))
+    return result
+
+
+class HandlerProfiler:
+    """Times the calls of event handlers.
+
+    Statistics are kept as ``[calls, errors, total time, own time]`` per
+    ``(handler, registration info)``, where the own time of a call
+    excludes the time spent in handlers called while it ran (for events
+    notified by the handler).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._keys = weakref.WeakKeyDictionary()
+        self.stats = {}
+        # The own time per stack of nested handler calls.
+        self.stacks = {}
+
+    def _getKeys(self, sitemanager):
+        # Map handlers to their statistics keys, valid as long as no
+        # registry the site manager is based on changes.
+        generations = [r._generation for r in sitemanager.adapters.ro]
+        with self._lock:
+            entry = self._keys.get(sitemanager)
+        if entry is not None and entry[0] == generations:
+            return entry[1]
+        keys = {}
+        for registry in _componentsOf(sitemanager):
+            for registration in registry.registeredHandlers():
+                handler = registration.handler
+                if handler not in keys:
+                    keys[handler] = (_describeHandler(handler),
+                                     _describeInfo(registration.info))
+        with self._lock:
+            self._keys[sitemanager] = (generations, keys)
+        return keys
+
+    def handle(self, sitemanager, objects):
+        """Call the handlers registered for *objects* and time them."""
+        keys = self._getKeys(sitemanager)
+        for handler in sitemanager.adapters.subscriptions(
+                [providedBy(ob) for ob in objects], None):
+            key = keys.get(handler)
+            if key is None:
+                key = (_describeHandler(handler), '')
+            result = self.call(handler, key, objects)
+            if result is not None:
+                _api._handlerResult(result)
+
+    def call(self, handler, key, objects):
+        """Call *handler* with *objects* and record the call under *key*.
+
+        *key* is a tuple of the descriptions of the handler and its
+        registration.
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        # The key and the time spent in the handlers called by this one.
+        frame = [key, 0.0]
+        stack.append(frame)
+        failed = True
+        start = time.perf_counter()
+        try:
+            result = handler(*objects)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            path = tuple([f[0] for f in stack])
+            stack.pop()
+            if stack:
+                stack[-1][1] += elapsed
+            own = elapsed - frame[1]
+            with self._lock:
+                stats = self.stats.get(key)
+                if stats is None:
+                    stats = self.stats[key] = [0, 0, 0.0, 0.0]
+                stats[0] += 1
+                stats[1] += failed
+                stats[2] += elapsed
+                stats[3] += own
+                self.stacks[path] = self.stacks.get(path, 0.0) + own
+
+    def report(self):
+        """Return the statistics as a list of dictionaries.
+
+        The list is sorted by cumulative time, longest first.
+        """
+        with self._lock:
+            items = [(key, list(stats)) for key, stats in self.stats.items()]
+        report = []
+        for (handler, info), (calls, errors, total, own) in items:
+            report.append({
+                'handler': handler,
+                'info': info,
+                'calls': calls,
+                'errors': errors,
+                'total_time': total,
+                'own_time': own,
+                'mean_time': total / calls,
+            })
+        report.sort(key=lambda entry: entry['total_time'], reverse=True)
+        return report
+
+    def foldedStacks(self):
+        """Return the own times per stack of handlers in folded format.
+
+        Each line has the handlers of a stack, outermost first, separated
+        by semicolons, followed by a space and the own time of the
+        innermost handler in microseconds.
+        """
+        with self._lock:
+            items = list(self.stacks.items())
+        lines = []
+        for path, own in items:
+            frames = ['{} ({})'.format(handler, info) if info else handler
+                      for handler, info in path]
+            lines.append('%s %d' % (
+                ';'.join(frame.replace(';', ',') for frame in frames),
+                round(own * 1e6)))
+        lines.sort()
+        return '\n'.join(lines)
+
+
+def enableHandlerProfiling():
+    """Start timing the event handlers.
+
+    Statistics recorded so far are discarded.
+
+    .. versionadded:: 7.2
+    """
+    _api._profiler = HandlerProfiler()
+
+
+def disableHandlerProfiling():
+    """Stop timing the event handlers.
+
+    The statistics recorded so far are returned by
+    `getHandlerProfileReport` and `getHandlerProfileStacks` until
+    handler profiling is enabled again.
+
+    .. versionadded:: 7.2
+    """
+    global _last_profiler
+    if _api._profiler is not None:
+        _last_profiler = _api._profiler
+    _api._profiler = None
+
+
+_last_profiler = None
+
+
+def _getProfiler():
+    profiler = _api._profiler
+    if profiler is None:
+        profiler = _last_profiler
+    return profiler
+
+
+def getHandlerProfileReport():
+    """Return the statistics recorded by the current or last handler profiling.
+
+    This is a list of dictionaries, one for each handler and
+    registration, sorted by cumulative time (longest first). Each
+    dictionary has the keys ``handler`` (the dotted name of the
+    handler), ``info`` (the file and line of the ZCML directive that
+    registered it, or the info given when registering it), ``calls``,
+    ``errors`` (the number of calls that raised an exception),
+    ``total_time``, ``own_time`` (not counting the handlers called for
+    events notified by the handler) and ``mean_time``; times are in
+    seconds.
+
+    .. versionadded:: 7.2
+    """
+    profiler = _getProfiler()
+    if profiler is None:
+        return []
+    return profiler.report()
+
+
+def getHandlerProfileStacks():
+    """Return the times recorded by handler profiling as folded stacks.
+
+    This is the input format of flame graph tools such as
+    ``flamegraph.pl`` or speedscope: one line per stack of nested handler
+    calls, with the own time of the innermost handler in microseconds.
+
+    .. versionadded:: 7.2
+    """
+    profiler = _getProfiler()
+    if profiler is None:
+        return ''
+    return profiler.foldedStacks()
+
+
+def _clear():
+    global _last_recorder, _last_profiler
+    _api._recorder = _last_recorder = None
+    _api._profiler = _last_profiler = None
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ModuleNotFoundError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_clear)
+    del addCleanUp
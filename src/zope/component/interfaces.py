@@ -151,6 +151,18 @@ class IComponentArchitecture(Interface):
         matching adapter cannot be found, returns the default.
         """
 
+    def queryAdapterMany(objects, interface=Interface, name='',
+                         default=None, context=None):
+        """Look for named adapters to an interface for many objects
+
+        Returns a list with one entry for each object in *objects*: an
+        adapter that adapts the object to *interface*, or *default* if
+        no matching adapter can be found. This is equivalent to calling
+        `queryAdapter` for each object, but the adapter factory is only
+        looked up once for all objects that provide the same
+        interfaces.
+        """
+
     def queryAdapterInContext(object, interface, context, default=None):
         """
         Look for a special adapter to an interface for an object
@@ -310,7 +322,7 @@ class IComponentRegistrationConvenience(Interface):
         adapts argument can be provided to override the declaration.)
         """
 
-    def provideHandler(handler, adapts=None):
+    def provideHandler(handler, adapts=None, deferred=False):
         """Register a handler
 
         Handlers are subscription adapter factories that don't produce
@@ -320,6 +332,12 @@ class IComponentRegistrationConvenience(Interface):
         If the handler has an adapts declaration, then the adapts
         argument can be omitted and the declaration will be used.  (An
         adapts argument can be provided to override the declaration.)
+
+        If deferred is true, the handler is run in the background, see
+        `zope.component.event.DeferredHandler`.
+
+        .. versionchanged:: 7.2
+           Add the *deferred* argument.
         """
 
 
@@ -13,13 +13,204 @@
 ##############################################################################
 """Persistent component managers.
 """
+import logging
+import os
+import time
+import weakref
+
 from persistent import Persistent
 from persistent.list import PersistentList
 from persistent.mapping import PersistentMapping
+from zope.interface import ro
 from zope.interface.adapter import VerifyingAdapterRegistry
 from zope.interface.registry import Components
 
 
+try:
+    from BTrees.OOBTree import OOBTree
+except ModuleNotFoundError:  # pragma: no cover
+    OOBTree = None
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _same(a, b):
+    # Persistent references in the states given to _p_resolveConflict
+    # raise ValueError instead of comparing unequal.
+    try:
+        return a == b
+    except ValueError:
+        return False
+
+
+def _conflict():
+    from ZODB.POSException import ConflictError
+    return ConflictError()
+
+
+def _resolveData(oldState, savedState, newState, resolve):
+    if not (oldState.keys() == savedState.keys() == newState.keys()
+            == {'data'}):
+        raise _conflict()
+    old = oldState['data']
+    saved = savedState['data']
+    new = newState['data']
+    resolved = resolve(old, saved, new)
+    if resolved and old and (not saved or not new):
+        # A registry removes emptied containers from their parents, so
+        # whatever the other transaction added would be lost. BTrees
+        # refuse to resolve emptied buckets for the same reason.
+        raise _conflict()
+    return {'data': resolved}
+
+
+def _resolveMapping(old, saved, new):
+    resolved = dict(saved)
+    for key in set(old).union(new):
+        value = new.get(key, _MISSING)
+        original = old.get(key, _MISSING)
+        if _same(value, original):
+            continue
+        current = saved.get(key, _MISSING)
+        if not _same(current, original) and not _same(current, value):
+            raise _conflict()
+        if value is _MISSING:
+            resolved.pop(key, None)
+        else:
+            resolved[key] = value
+    return resolved
+
+
+def _resolveCounts(old, saved, new):
+    resolved = dict(saved)
+    for key in set(old).union(new):
+        change = new.get(key, 0) - old.get(key, 0)
+        if change:
+            count = resolved.get(key, 0) + change
+            if count < 0:
+                raise _conflict()
+            if count:
+                resolved[key] = count
+            else:
+                del resolved[key]
+    return resolved
+
+
+def _listChanges(old, items):
+    # Return the indexes of the items of *old* removed from *items*
+    # and the items appended to them, as long as items were only
+    # removed or only appended.
+    if (len(items) >= len(old)
+            and all(_same(a, b) for a, b in zip(old, items))):
+        return (), items[len(old):]
+    removed = []
+    i = 0
+    for index, item in enumerate(old):
+        if i < len(items) and _same(items[i], item):
+            i += 1
+        else:
+            removed.append(index)
+    if i < len(items):
+        raise _conflict()
+    return removed, []
+
+
+def _resolveList(old, saved, new):
+    removed_saved, appended_saved = _listChanges(old, saved)
+    removed_new, appended_new = _listChanges(old, new)
+    removed = set(removed_saved).union(removed_new)
+    return ([item for index, item in enumerate(old) if index not in removed]
+            + list(appended_saved) + list(appended_new))
+
+
+class ConflictResolvingMapping(PersistentMapping):
+    """
+    A :class:`~persistent.mapping.PersistentMapping` that resolves
+    conflicts between transactions changing different keys.
+
+    .. versionadded:: 7.2
+    """
+
+    def _p_resolveConflict(self, oldState, savedState, newState):
+        return _resolveData(oldState, savedState, newState, _resolveMapping)
+
+
+class ConflictResolvingCounts(PersistentMapping):
+    """
+    A :class:`~persistent.mapping.PersistentMapping` of counts that
+    resolves conflicts by adding up the changes of the counts made by
+    each transaction.
+
+    .. versionadded:: 7.2
+    """
+
+    def _p_resolveConflict(self, oldState, savedState, newState):
+        return _resolveData(oldState, savedState, newState, _resolveCounts)
+
+
+class ConflictResolvingList(PersistentList):
+    """
+    A :class:`~persistent.list.PersistentList` that resolves conflicts
+    between transactions that only appended items or only removed
+    items.
+
+    Items appended by both transactions are kept, those of the
+    transaction committed first first.
+
+    .. versionadded:: 7.2
+    """
+
+    def _p_resolveConflict(self, oldState, savedState, newState):
+        return _resolveData(oldState, savedState, newState, _resolveList)
+
+
+def _changesAfter(changes, last):
+    # The (provided, name) pairs changed after the change with token
+    # *last*, or None if it's not in *changes* (any more).
+    for index in range(len(changes) - 1, -1, -1):
+        if changes[index][0] == last:
+            return [change[1:] for change in changes[index + 1:]]
+    return None
+
+
+def _forgetChanges(registry, lookup, changes):
+    # Make *lookup* forget what it knows about the registrations of the
+    # (provided, name) pairs in *changes*.
+    provided = {provided for provided, _ in changes} - {None}
+    extendors = lookup._extendors
+    for iface in provided:
+        registered = iface in registry._provided
+        if registered != (iface in extendors.get(iface, ())):
+            if registered:
+                lookup.add_extendor(iface)
+            else:
+                lookup.remove_extendor(iface)
+    try:
+        cache = lookup._cache
+    except AttributeError:
+        # The C implementation can only clear its caches.
+        lookup.changed(registry)
+        return
+    for changed, name in changes:
+        # Lookups of the interfaces extended by the one provided may
+        # find the changed registrations as well.
+        for iface in changed.__iro__ if changed is not None else (None,):
+            lookup._mcache.pop(iface, None)
+            lookup._scache.pop(iface, None)
+            by_name = cache.get(iface)
+            if not by_name:
+                continue
+            if name:
+                by_name.pop(name, None)
+            else:
+                for key in [key for key in by_name
+                            if not isinstance(key, str)]:
+                    del by_name[key]
+
+
 class PersistentAdapterRegistry(VerifyingAdapterRegistry, Persistent):
     """
     An adapter registry that is also a persistent object.
@@ -45,15 +236,51 @@ class PersistentAdapterRegistry(VerifyingAdapterRegistry, Persistent):
 
         To fix this, call :meth:`rebuild` and commit the transaction.
         This will rewrite the internal data structures to use the new
-        types.
+        types. For large registries, use `IncrementalRebuild` to do
+        this in many small transactions instead.
+
+    .. versionchanged:: 7.2
+        When this object is deactivated or invalidated without having
+        been changed, its lookup caches are kept and reused if it is
+        loaded with the same state again.
+
+    .. versionchanged:: 7.2
+        Concurrent transactions making registrations that don't
+        overlap no longer raise a :exc:`~ZODB.POSException.ConflictError`.
+        The internal data structures are now composed of
+        `ConflictResolvingMapping`, `ConflictResolvingCounts` and
+        `ConflictResolvingList` objects, which merge such changes, and
+        conflicts of the registry itself are resolved if only its
+        ``_generation`` changed. Existing instances need to be rebuilt
+        as described above to benefit from this.
+
+    .. versionchanged:: 7.2
+        The most recent changes of the registrations are recorded in
+        the state of this object. When it is invalidated because
+        another connection (possibly in another process) changed it,
+        its lookup is kept and updated instead of starting over. The
+        pure-Python lookup of ``zope.interface`` only forgets what it
+        cached for the changed interfaces and names. With the C
+        optimizations (the default on CPython), only the table of
+        registered interfaces is updated incrementally; the cached
+        lookup results are cleared as a whole.
     """
 
     # The persistent types we use, replacing the basic types inherited
-    # from ``BaseAdapterRegistry``.
+    # from ``BaseAdapterRegistry``. The lists of mappings by number of
+    # required specifications can't merge appended items: their
+    # position matters.
     _sequenceType = PersistentList
-    _leafSequenceType = PersistentList
-    _mappingType = PersistentMapping
-    _providedType = PersistentMapping
+    _leafSequenceType = ConflictResolvingList
+    _mappingType = ConflictResolvingMapping
+    _providedType = ConflictResolvingCounts
+
+    # The most recent changes of registrations, as a tuple of
+    # ``(token, provided, name)`` tuples, oldest first. A token
+    # identifies one change; see ``__setstate__``. At most
+    # ``_changesLimit`` changes are kept; 0 turns recording off.
+    _changes = ()
+    _changesLimit = 100
 
     # The methods needed to manipulate the leaves of the subscriber
     # tree. When we're manipulating unmigrated data, it's safe to
@@ -93,7 +320,129 @@ class PersistentAdapterRegistry(VerifyingAdapterRegistry, Persistent):
             # the changed() mechanism will still result in mutating this
             # object via ``_generation``.
             self._p_changed = True
+            # Our caches no longer match the state we were loaded with.
+            self.__dict__.pop('_v_loadedGeneration', None)
         super().changed(originally_changed)
+        _invalidateCaches(self, originally_changed)
+        if originally_changed is self:
+            changing = self.__dict__.get('_v_changing')
+            if changing is None or not self._changesLimit:
+                # Don't know what changed, so everything did.
+                if self._changes:
+                    self._changes = ()
+            else:
+                changes = self._changes + ((os.urandom(8),) + changing,)
+                self._changes = changes[-self._changesLimit:]
+
+    # Caches of lookups in registries based on us, like the tables of
+    # the utility cache, subscribe to our changes like the
+    # sub-registries of an ``AdapterRegistry`` do. (Registries based on
+    # us verify our generation instead.)
+
+    def _addSubregistry(self, r):
+        subregistries = self.__dict__.get('_v_subregistries')
+        if subregistries is None:
+            subregistries = self._v_subregistries = (
+                weakref.WeakKeyDictionary())
+        subregistries[r] = 1
+
+    def _removeSubregistry(self, r):
+        subregistries = self.__dict__.get('_v_subregistries')
+        if subregistries is not None:
+            subregistries.pop(r, None)
+
+    # Record what is being changed for ``changed``.
+
+    def register(self, required, provided, name, value):
+        self._v_changing = provided, name
+        try:
+            super().register(required, provided, name, value)
+        finally:
+            self.__dict__.pop('_v_changing', None)
+
+    def unregister(self, required, provided, name, value=None):
+        self._v_changing = provided, name
+        try:
+            super().unregister(required, provided, name, value)
+        finally:
+            self.__dict__.pop('_v_changing', None)
+
+    def subscribe(self, required, provided, value):
+        self._v_changing = provided, ''
+        try:
+            super().subscribe(required, provided, value)
+        finally:
+            self.__dict__.pop('_v_changing', None)
+
+    def unsubscribe(self, required, provided, value=None):
+        self._v_changing = provided, ''
+        try:
+            super().unsubscribe(required, provided, value)
+        finally:
+            self.__dict__.pop('_v_changing', None)
+
+    # When the object cache turns us into a ghost (or we are
+    # invalidated), all our attributes, including the lookup with its
+    # caches, are discarded and a cold lookup would be created when we
+    # are loaded again. If nothing changed in between, keep the lookup
+    # on the ghost and reuse it in ``__setstate__`` instead.
+    #
+    # The lookup is only reused by this object, which belongs to one
+    # connection: the cached components are objects of that connection
+    # and can't be shared with others.
+
+    #
+    # The subscriptions of caches (see `_addSubregistry`) are lost as
+    # well, and we may be loaded with another state, so these caches
+    # are told to forget what they know.
+
+    def _p_deactivate(self):
+        lookup = self._lookupToKeep()
+        if self._p_changed is False:
+            _invalidateCaches(self, self)
+        super()._p_deactivate()
+        _keepLookup(self, lookup)
+
+    def _p_invalidate(self):
+        lookup = self._lookupToKeep()
+        _invalidateCaches(self, self)
+        super()._p_invalidate()
+        _keepLookup(self, lookup)
+
+    def _lookupToKeep(self):
+        if self._p_changed is False:
+            generation = self.__dict__.get('_v_loadedGeneration')
+            if generation is not None:
+                changes = self._changes
+                last = changes[-1][0] if changes else None
+                return generation, self.__bases__, last, self._v_lookup
+        return None
+
+    def _p_resolveConflict(self, oldState, savedState, newState):
+        # Making registrations changes our ``_generation``, and the
+        # data structures, which resolve conflicts themselves. Anything
+        # else changing, like the data structures being replaced, can't
+        # be merged.
+        for name in set(oldState).union(savedState, newState):
+            if name not in ('_generation', '_changes') and not (
+                    _same(savedState.get(name), oldState.get(name))
+                    and _same(newState.get(name), oldState.get(name))):
+                raise _conflict()
+        resolved = dict(savedState)
+        resolved['_generation'] = (savedState['_generation']
+                                   + newState['_generation']
+                                   - oldState['_generation'])
+        changes = oldState.get('_changes', ())
+        new = newState.get('_changes', ())
+        if changes:
+            new = _changesAfter(new, changes[-1][0])
+            if new is None:
+                raise _conflict()
+            new = newState['_changes'][len(newState['_changes']) - len(new):]
+        if new:
+            changes = savedState.get('_changes', ()) + tuple(new)
+            resolved['_changes'] = changes[-self._changesLimit:]
+        return resolved
 
     def __getstate__(self):
         state = super().__getstate__().copy()
@@ -103,11 +452,208 @@ class PersistentAdapterRegistry(VerifyingAdapterRegistry, Persistent):
         return state
 
     def __setstate__(self, state):
+        kept = self.__dict__.pop('_v_keptLookup', None)
         bases = state.pop('__bases__', ())
+        generation = state.get('_generation')
+        changes = state.get('_changes', ())
         super().__setstate__(state)
-        self._createLookup()
-        self.__bases__ = bases
-        self._v_lookup.changed(self)
+        if kept is not None and kept[1] == bases:
+            if kept[2] is None:
+                # We don't know what was changed since, if anything.
+                changed = [] if (kept[0] == generation
+                                 and not changes) else None
+            else:
+                changed = _changesAfter(changes, kept[2])
+        else:
+            changed = None
+        if changed is not None:
+            # Loaded the state the kept lookup was caching, apart from
+            # the registrations that *changed*.
+            self._v_lookup = lookup = kept[3]
+            for name in self._delegated:
+                self.__dict__[name] = getattr(lookup, name)
+            # Set the bases like ``_setBases`` does, but without
+            # clearing the caches. Bases that changed since are noticed
+            # by the lookup when it verifies their generations. Bump the
+            # generation like ``changed`` would, so registries based on
+            # us see the same one as before.
+            self.__dict__['__bases__'] = bases
+            self.ro = ro.ro(self)
+            self._generation += 1
+            if changed:
+                _forgetChanges(self, lookup, changed)
+        else:
+            self._createLookup()
+            self.__bases__ = bases
+            self._v_lookup.changed(self)
+            if changes:
+                # Setting the bases didn't change the registrations.
+                self._changes = changes
+        self._v_loadedGeneration = generation
+
+
+def _invalidateCaches(registry, originally_changed):
+    # Not a method, like ``_keepLookup``.
+    subregistries = registry.__dict__.get('_v_subregistries')
+    if subregistries:
+        for sub in list(subregistries.keys()):
+            sub.changed(originally_changed)
+
+
+def _keepLookup(registry, lookup):
+    # Not a method: looking up attributes other than ``__dict__`` and
+    # ``_p_*`` would load the ghost again.
+    if lookup is not None and registry._p_changed is None:
+        registry.__dict__['_v_keptLookup'] = lookup
+
+
+def _entries(registry):
+    for args in registry.allRegistrations():
+        yield False, args
+    for args in registry.allSubscriptions():
+        yield True, args
+
+
+class IncrementalRebuild(Persistent):
+    """
+    Rebuilds a `PersistentAdapterRegistry` in many small transactions.
+
+    :meth:`~PersistentAdapterRegistry.rebuild` replaces all the internal
+    data structures of a registry in one transaction, which can be too
+    big for a registry with lots of data still kept in :class:`dict`
+    and :class:`tuple` objects. This copies the registrations of
+    *registry* into new data structures, a limited number per
+    transaction, and only replaces the data structures of *registry*
+    with the new ones in the last transaction. The registry can be used
+    as usual until then.
+
+    The new mappings are :class:`BTrees.OOBTree.OOBTree` objects, as
+    used by `BTreePersistentAdapterRegistry`, if the ``BTrees`` package
+    is installed. A BTree is stored in buckets of bounded size, so each
+    transaction writes about as much as the registrations it copies,
+    however many registrations a mapping ends up with. Without
+    ``BTrees``, the mappings of the class of *registry* are used, and
+    each transaction rewrites the mappings it adds to as a whole.
+
+    Store this object in the database before calling `run`. The
+    progress is committed with it, so a rebuild that was interrupted
+    continues where it stopped when `run` is called again, possibly in
+    another process. If the registry is changed in the meantime, the
+    rebuild starts over.
+
+    .. versionadded:: 7.2
+    """
+
+    #: The number of registrations and subscriptions copied so far.
+    position = 0
+
+    #: Whether the registry has been rebuilt.
+    finished = False
+
+    _v_entries = None
+    _v_position = None
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._restart()
+
+    def _restart(self):
+        registry = self.registry
+        registry._p_activate()
+        # Changes of the registry are noticed by its serial; its
+        # ``_generation`` is also bumped when it's loaded.
+        self._serial = registry._p_serial
+        if OOBTree is None:  # pragma: no cover
+            rebuilt = type(registry)()
+        else:
+            rebuilt = BTreePersistentAdapterRegistry()
+        # Nothing is looked up in the copy, so there's no need to
+        # record the changes made to it.
+        rebuilt._changesLimit = 0
+        self._rebuilt = rebuilt
+        self.position = 0
+
+    def step(self, count):
+        """
+        Copy up to *count* registrations and subscriptions.
+
+        When there are no more to copy, the data structures of the
+        registry are replaced and `finished` is set. Returns the number
+        copied.
+        """
+        if self.finished:
+            return 0
+        registry = self.registry
+        registry._p_activate()
+        if registry._p_serial != self._serial:
+            logger.info('%r was changed, restarting its rebuild', registry)
+            self._restart()
+        entries = self._v_entries
+        if entries is None or self._v_position != self.position:
+            # Resuming: skip what was copied in earlier transactions.
+            entries = _entries(registry)
+            for _ in range(self.position):
+                next(entries)
+        rebuilt = self._rebuilt
+        copied = 0
+        for subscription, args in entries:
+            if subscription:
+                rebuilt.subscribe(*args)
+            else:
+                rebuilt.register(*args)
+            copied += 1
+            if copied == count:
+                break
+        else:
+            self._finish()
+        self.position += copied
+        self._v_entries = entries
+        self._v_position = self.position
+        return copied
+
+    def _finish(self):
+        registry = self.registry
+        rebuilt = self._rebuilt
+        registry._adapters = rebuilt._adapters
+        registry._subscribers = rebuilt._subscribers
+        registry._provided = rebuilt._provided
+        # Like ``rebuild``, start over with a new lookup.
+        registry._createLookup()
+        registry.changed(registry)
+        self._rebuilt = None
+        self.finished = True
+
+    def run(self, count=1000, transaction_manager=None):
+        """
+        Rebuild the registry, committing after every *count*
+        registrations and subscriptions.
+
+        Transactions failing with a transient error, such as a
+        conflict, are retried. Progress and throughput are logged.
+
+        :keyword transaction_manager: The transaction manager to
+            commit with. The default is the one of the connection this
+            object is stored in.
+        """
+        jar = self._p_jar
+        if jar is None:
+            raise ValueError(
+                "The rebuild must be stored in the database first")
+        if transaction_manager is None:
+            transaction_manager = jar.transaction_manager
+        start = time.perf_counter()
+        total = 0
+        while not self.finished:
+            for attempt in transaction_manager.attempts():
+                with attempt:
+                    copied = self.step(count)
+            total += copied
+            elapsed = time.perf_counter() - start
+            logger.info(
+                'Copied %d registrations of %r (%.0f per second)',
+                self.position, self.registry,
+                total / elapsed if elapsed else 0)
+        logger.info('Rebuilt %r', self.registry)
 
 
 class PersistentComponents(Components):
@@ -122,7 +668,53 @@ class PersistentComponents(Components):
         self.utilities = PersistentAdapterRegistry()
 
     def _init_registrations(self):
-        self._utility_registrations = PersistentMapping()
-        self._adapter_registrations = PersistentMapping()
-        self._subscription_registrations = PersistentList()
-        self._handler_registrations = PersistentList()
+        self._utility_registrations = ConflictResolvingMapping()
+        self._adapter_registrations = ConflictResolvingMapping()
+        self._subscription_registrations = ConflictResolvingList()
+        self._handler_registrations = ConflictResolvingList()
+
+
+class BTreePersistentAdapterRegistry(PersistentAdapterRegistry):
+    """
+    A `PersistentAdapterRegistry` keeping its mappings in
+    :class:`BTrees.OOBTree.OOBTree` objects.
+
+    A :class:`~persistent.mapping.PersistentMapping` is stored as a
+    single record, so the mapping of names to utilities providing an
+    interface is loaded and written as a whole, however many utilities
+    there are. A BTree is split into buckets that are loaded and
+    written on their own, and concurrent changes to different buckets
+    are resolved by ZODB instead of causing conflict errors.
+
+    The counts of registrations providing each interface are kept in a
+    `ConflictResolvingCounts` object, as transactions registering
+    components providing the same interface change the same count.
+
+    This requires the ``BTrees`` package.
+
+    .. versionadded:: 7.2
+    """
+
+    _mappingType = OOBTree
+
+
+class BTreePersistentComponents(PersistentComponents):
+    """
+    A `PersistentComponents` using `BTreePersistentAdapterRegistry` and
+    keeping its utility and adapter registrations in
+    :class:`BTrees.OOBTree.OOBTree` objects.
+
+    Use this for component registries with very many (named)
+    utilities or adapters. This requires the ``BTrees`` package.
+
+    .. versionadded:: 7.2
+    """
+
+    def _init_registries(self):
+        self.adapters = BTreePersistentAdapterRegistry()
+        self.utilities = BTreePersistentAdapterRegistry()
+
+    def _init_registrations(self):
+        super()._init_registrations()
+        self._utility_registrations = OOBTree()
+        self._adapter_registrations = OOBTree()
@@ -0,0 +1,236 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Snapshots of a configured global component registry.
+
+Configuring a large application (parsing ZCML, running directive
+handlers, resolving action conflicts and dispatching registration
+events) can take a noticeable amount of time. Once configuration is
+complete, `saveSnapshot` writes the registrations of the global site
+manager to a file; a later process can restore them with `loadSnapshot`
+instead of configuring again.
+
+Every registered component, factory and handler must be picklable,
+and so must the ``info`` recorded for a registration. Snapshots are
+pickles; only load snapshots that you created yourself.
+"""
+import os
+import pickle
+import sys
+
+from zope.component.globalregistry import FrozenRegistryError
+from zope.component.globalregistry import getGlobalSiteManager
+
+
+__all__ = [
+    'SNAPSHOT_VERSION',
+    'saveSnapshot',
+    'loadSnapshot',
+]
+
+#: The version of the snapshot format. Snapshots written with a
+#: different version are ignored by `loadSnapshot`.
+SNAPSHOT_VERSION = 1
+
+_REGISTRATIONS = (
+    '_utility_registrations',
+    '_adapter_registrations',
+    '_subscription_registrations',
+    '_handler_registrations',
+)
+
+_REGISTRIES = ('adapters', 'utilities')
+
+_REGISTRY_DATA = ('_adapters', '_subscribers', '_provided')
+
+
+def _registeredObjects(registry):
+    for component, _info, factory in registry._utility_registrations.values():
+        yield component
+        yield factory
+    for factory, _info in registry._adapter_registrations.values():
+        yield factory
+    for _required, _provided, _name, factory, _info in (
+            registry._subscription_registrations):
+        yield factory
+    for _required, _name, handler, _info in registry._handler_registrations:
+        yield handler
+
+
+def _registrationInfos(registry):
+    for _component, info, _factory in (
+            registry._utility_registrations.values()):
+        yield info
+    for _factory, info in registry._adapter_registrations.values():
+        yield info
+    for _required, _provided, _name, _factory, info in (
+            registry._subscription_registrations):
+        yield info
+    for _required, _name, _handler, info in registry._handler_registrations:
+        yield info
+
+
+def _sourceFiles(registry):
+    """Return the files that the registrations of *registry* came from.
+
+    These are the configuration files recorded in the registration
+    infos (as done by the ZCML directives) and the modules defining
+    the registered objects.
+    """
+    files = set()
+    for info in _registrationInfos(registry):
+        filename = getattr(info, 'file', None)
+        if isinstance(filename, str):
+            files.add(filename)
+    for obj in _registeredObjects(registry):
+        if obj is None:
+            continue
+        module_name = getattr(obj, '__module__', None)
+        if not isinstance(module_name, str):
+            module_name = type(obj).__module__
+        module = sys.modules.get(module_name)
+        filename = getattr(module, '__file__', None)
+        if filename:
+            files.add(filename)
+    return files
+
+
+def _mtime(filename):
+    try:
+        return os.stat(filename).st_mtime
+    except OSError:
+        return None
+
+
+def saveSnapshot(filename, sources=(), registry=None, context=None):
+    """Write the registrations of *registry* to *filename*.
+
+    *registry* defaults to the global site manager. It must be
+    picklable by reference, which is true for all
+    `~zope.component.globalregistry.BaseGlobalComponents` instances
+    that are module globals.
+
+    The modification times of the configuration files and modules the
+    registrations came from, as well as of any additional files given
+    in *sources*, are recorded so that `loadSnapshot` can tell when the
+    snapshot is out of date.
+
+    Configuration files are only known from the registrations made by
+    their directives. Pass the configuration context the registry was
+    configured with (the `zope.configuration.config.ConfigurationMachine`
+    used by, e.g., ``zope.configuration.xmlconfig.file``) as *context*
+    to record all the files it read as well, including files that only
+    include others; otherwise, list such files in *sources*, or adding
+    an ``<include>`` to them goes unnoticed.
+
+    The file is replaced atomically.
+
+    .. versionadded:: 7.2
+    """
+    if registry is None:
+        registry = getGlobalSiteManager()
+    files = _sourceFiles(registry)
+    files.update(sources)
+    files.update(getattr(context, '_seen_files', ()))
+    # The header is a pickle of its own, so that `loadSnapshot` can
+    # check whether the snapshot is up to date before unpickling the
+    # registrations, which may refer to classes that no longer exist.
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'registry': registry,
+        'sources': {name: _mtime(name) for name in sorted(files)},
+    }
+    snapshot = {
+        'registrations': {
+            name: getattr(registry, name) for name in _REGISTRATIONS
+        },
+        'registries': {
+            name: {
+                attr: getattr(getattr(registry, name), attr)
+                for attr in _REGISTRY_DATA
+            }
+            for name in _REGISTRIES
+        },
+    }
+    tmp = f'{filename}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def loadSnapshot(filename, registry=None):
+    """Restore the registrations saved by `saveSnapshot`.
+
+    All registrations of *registry* (the global site manager by
+    default) are replaced by those from the snapshot, without
+    dispatching any registration events. A frozen registry cannot be
+    restored into.
+
+    Returns a true value if the snapshot was loaded. If the file does
+    not exist, was written for a different registry or with a
+    different `SNAPSHOT_VERSION`, any of its source files changed
+    since it was written, or it cannot be unpickled, nothing is loaded
+    and a false value is returned; the caller should then configure the
+    registry as usual (and probably save a new snapshot).
+
+    The lookup objects of the adapter registries are kept (and their
+    caches cleared), so adapter hooks bound to them stay valid.
+
+    .. versionadded:: 7.2
+    """
+    if registry is None:
+        registry = getGlobalSiteManager()
+    if getattr(registry, '_frozen', False):
+        raise FrozenRegistryError(
+            "Cannot change the frozen registry %r" % (registry,))
+    try:
+        with open(filename, 'rb') as f:
+            snapshot = _load(f, registry)
+    except FileNotFoundError:
+        return False
+    if snapshot is None:
+        return False
+
+    for name, value in snapshot['registrations'].items():
+        setattr(registry, name, value)
+    registry._v_utility_registrations_cache = None
+    for name, data in snapshot['registries'].items():
+        adapter_registry = getattr(registry, name)
+        for attr, value in data.items():
+            setattr(adapter_registry, attr, value)
+        adapter_registry._v_lookup.init_extendors()
+        adapter_registry.changed(adapter_registry)
+    return True
+
+
+def _load(f, registry):
+    # Return the registrations in the snapshot file *f*, or None if the
+    # snapshot can't be used for *registry*. Unpickling may fail with
+    # just about any exception, e.g. when a class has been renamed.
+    try:
+        header = pickle.load(f)
+        if (not isinstance(header, dict)
+                or header.get('version') != SNAPSHOT_VERSION
+                or header.get('registry') is not registry):
+            return None
+        for name, mtime in header['sources'].items():
+            if _mtime(name) != mtime:
+                return None
+        return pickle.load(f)
+    except Exception:
+        return None
@@ -180,6 +180,83 @@ class Test_queryAdapterInContext(unittest.TestCase):
         self.assertRaises(TypeError,
                           self._callFUT, Foo(), IFoo, context=None)
 
+    def test___conform___inherited_via_class(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class Base:
+            __conform__ = fails_if_called(self)
+
+        class Foo(Base):
+            pass
+        self.assertEqual(self._callFUT(Foo, IFoo, context=None), None)
+
+    def test___conform___overridden_via_class(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class Base:
+            __conform__ = staticmethod(fails_if_called(self))
+
+        class Foo(Base):
+            __conform__ = fails_if_called(self)
+        self.assertEqual(self._callFUT(Foo, IFoo, context=None), None)
+
+    def test___conform___method_descriptor_via_class(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class Foo(dict):
+            __conform__ = dict.get
+        self.assertEqual(self._callFUT(Foo, IFoo, context=None), None)
+        self.assertEqual(self._callFUT(Foo({IFoo: 42}), IFoo, context=None),
+                         42)
+
+    def test___conform___staticmethod_via_class(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+        _adapted = object()
+
+        class Foo:
+            @staticmethod
+            def __conform__(iface):
+                return _adapted
+        self.assertIs(self._callFUT(Foo, IFoo, context=None), _adapted)
+
+    def test___conform___classmethod_via_class(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class Foo:
+            @classmethod
+            def __conform__(cls, iface):
+                return (cls, iface)
+        self.assertEqual(self._callFUT(Foo, IFoo, context=None), (Foo, IFoo))
+
+    def test___conform___via_metaclass(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class Meta(type):
+            def __conform__(cls, iface):
+                return (cls, iface)
+
+        class Foo(metaclass=Meta):
+            pass
+        self.assertEqual(self._callFUT(Foo, IFoo, context=None), (Foo, IFoo))
+
     def test_w_object_implementing(self):
         from zope.interface import Interface
         from zope.interface import implementer
@@ -410,6 +487,129 @@ class Test_queryAdapter(unittest.TestCase):
         self.assertIs(adapted.context, bar)
 
 
+class Test_queryAdapterMany(unittest.TestCase):
+
+    from zope.component.testing import setUp
+    from zope.component.testing import tearDown
+
+    def _callFUT(self, *args, **kw):
+        from zope.component import queryAdapterMany
+        return queryAdapterMany(*args, **kw)
+
+    def _registerAdapter(self, name=''):
+        from zope.interface import Interface
+        from zope.interface import implementer
+
+        from zope.component import getGlobalSiteManager
+
+        class IFoo(Interface):
+            pass
+
+        class IBar(Interface):
+            pass
+
+        @implementer(IFoo)
+        class Global:
+            def __init__(self, context):
+                self.context = context
+
+        calls = []
+
+        def _factory(context):
+            calls.append(context)
+            if context.adapt:
+                return Global(context)
+
+        @implementer(IFoo)
+        class Context:
+            def __init__(self, adapt=True):
+                self.adapt = adapt
+
+        getGlobalSiteManager().registerAdapter(_factory, (IFoo,), IBar, name)
+        return IBar, Context, calls
+
+    def test_empty(self):
+        from zope.interface import Interface
+        self.assertEqual(self._callFUT([], Interface), [])
+
+    def test_nonesuch(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+        self.assertEqual(
+            self._callFUT([object(), object()], IFoo, '', '<default>'),
+            ['<default>', '<default>'])
+
+    def test_hits(self):
+        IBar, Context, calls = self._registerAdapter()
+        objects = [Context(), Context(), Context()]
+        adapters = self._callFUT(iter(objects), IBar)
+        self.assertEqual([a.context for a in adapters], objects)
+        self.assertEqual(calls, objects)
+
+    def test_named(self):
+        IBar, Context, _ = self._registerAdapter('baz')
+        obj = Context()
+        self.assertEqual(self._callFUT([obj], IBar), [None])
+        self.assertEqual([a.context for a in self._callFUT([obj], IBar,
+                                                           'baz')],
+                         [obj])
+
+    def test_factory_returns_None(self):
+        IBar, Context, _ = self._registerAdapter()
+        obj = Context()
+        adapters = self._callFUT([obj, Context(False)], IBar,
+                                 default='<default>')
+        self.assertIs(adapters[0].context, obj)
+        self.assertEqual(adapters[1], '<default>')
+
+    def test_mixed_specs_looks_up_once_per_spec(self):
+        from zope.component import getGlobalSiteManager
+        IBar, Context, _ = self._registerAdapter()
+        lookups = []
+        adapters = getGlobalSiteManager().adapters
+        _lookup = adapters.lookup
+
+        def _counting_lookup(required, provided, name=''):
+            lookups.append(required)
+            return _lookup(required, provided, name)
+        adapters.lookup = _counting_lookup
+        try:
+            result = self._callFUT(
+                [Context(), object(), Context(), object()], IBar)
+        finally:
+            adapters.lookup = _lookup
+        self.assertEqual([r is None for r in result],
+                         [False, True, False, True])
+        self.assertEqual(len(lookups), 2)
+
+    def test_w_super(self):
+        IBar, Context, _ = self._registerAdapter()
+
+        class Derived(Context):
+            pass
+        obj = Derived()
+        adapters = self._callFUT([super(Derived, obj)], IBar)
+        self.assertIs(adapters[0].context, obj)
+
+    def test_w_conforming_context(self):
+        from zope.interface import Interface
+
+        from zope.component.tests.examples import ConformsToIComponentLookup
+
+        class IFoo(Interface):
+            pass
+        _adapted = object()
+
+        class SM:
+            def queryAdapter(self, object, interface, name, default):
+                return _adapted
+        context = ConformsToIComponentLookup(SM())
+        self.assertEqual(self._callFUT([object()], IFoo, context=context),
+                         [_adapted])
+
+
 class Test_getMultiAdapter(unittest.TestCase):
 
     from zope.component.testing import setUp
@@ -844,6 +1044,36 @@ class Test_subscribers(unittest.TestCase):
         subscribers = self._callFUT((object,), IFoo, context=Context())
         self.assertEqual(subscribers, [])
 
+    def test_handlers(self):
+        from zope.interface import Interface
+
+        from zope.component import getGlobalSiteManager
+
+        _called = []
+
+        def _handler(*objects):
+            _called.append(objects)
+        gsm = getGlobalSiteManager()
+        gsm.registerHandler(_handler, (Interface,), event=False)
+        context = object()
+        self.assertEqual(self._callFUT((context,), None), ())
+        self.assertEqual(_called, [(context,)])
+
+    def test_handlers_w_other_sitemanager(self):
+        from zope.interface.registry import Components
+
+        from zope.component.tests.examples import ConformsToIComponentLookup
+
+        _called = []
+
+        class SM(Components):
+            def subscribers(self, objects, provided):
+                _called.append((objects, provided))
+                return ()
+        context = ConformsToIComponentLookup(SM())
+        self.assertEqual(self._callFUT((self,), None, context=context), ())
+        self.assertEqual(_called, [((self,), None)])
+
 
 class Test_handle(unittest.TestCase):
 
@@ -888,6 +1118,45 @@ class Test_handle(unittest.TestCase):
         self.assertIn('_bar', _called)
         self.assertIn('_baz', _called)
 
+    def test_hit_w_several_objects(self):
+        from zope.interface import Interface
+
+        from zope.component import getGlobalSiteManager
+
+        _called = []
+
+        def _handler(*objects):
+            _called.append(objects)
+        gsm = getGlobalSiteManager()
+        gsm.registerHandler(_handler, (Interface, Interface))
+        gsm.registerHandler(_handler, (Interface, Interface, Interface))
+        self._callFUT(1, 2)
+        self._callFUT(1, 2, 3)
+        self.assertEqual(_called, [(1, 2), (1, 2, 3)])
+
+    def test_w_other_sitemanager(self):
+        from zope.interface.registry import Components
+
+        from zope.component.hooks import setHooks
+        from zope.component.hooks import setSite
+
+        _called = []
+
+        class SM(Components):
+            def subscribers(self, objects, provided):
+                _called.append((objects, provided))
+                return ()
+
+        class Site:
+            def getSiteManager(self):
+                return sm
+        sm = SM()
+        setHooks()
+        setSite(Site())
+        self.addCleanup(setSite)
+        self._callFUT(self)
+        self.assertEqual(_called, [((self,), None)])
+
 
 class Test_getUtility(unittest.TestCase):
 
@@ -1044,6 +1313,428 @@ class Test_queryUtility(unittest.TestCase):
         self.assertIs(self._callFUT(IFoo, context=context), obj2)
 
 
+class Test_utility_cache(unittest.TestCase):
+
+    from zope.component.testing import tearDown
+
+    def setUp(self):
+        from zope.component._api import enableUtilityCache
+        from zope.component.testing import setUp
+        setUp()
+        enableUtilityCache()
+
+    def _callFUT(self, *args, **kw):
+        from zope.component._api import queryUtility
+        return queryUtility(*args, **kw)
+
+    def _getStatistics(self):
+        from zope.component._api import getUtilityCacheStatistics
+        return getUtilityCacheStatistics()
+
+    def test_disabled(self):
+        from zope.component._api import disableUtilityCache
+        disableUtilityCache()
+        self.assertIsNone(self._getStatistics())
+
+    def test_enable_twice_keeps_cache(self):
+        from zope.component import _api
+        cache = _api._utility_cache
+        _api.enableUtilityCache()
+        self.assertIs(_api._utility_cache, cache)
+
+    def test_hit_and_miss(self):
+        from zope.interface import Interface
+
+        from zope.component import getGlobalSiteManager
+
+        class IFoo(Interface):
+            pass
+        obj = object()
+        getGlobalSiteManager().registerUtility(obj, IFoo, name='bar')
+        self.assertIs(self._callFUT(IFoo, name='bar'), obj)
+        self.assertIs(self._callFUT(IFoo, name='bar'), obj)
+        self.assertEqual(self._getStatistics(),
+                         {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_nonesuch_cached_w_default(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+        obj = object()
+        self.assertIsNone(self._callFUT(IFoo))
+        self.assertIs(self._callFUT(IFoo, default=obj), obj)
+        self.assertEqual(self._getStatistics()['hits'], 1)
+
+    def test_invalidated_by_registration(self):
+        from zope.interface import Interface
+
+        from zope.component import getGlobalSiteManager
+
+        class IFoo(Interface):
+            pass
+        obj = object()
+        self.assertIsNone(self._callFUT(IFoo))
+        getGlobalSiteManager().registerUtility(obj, IFoo)
+        self.assertIs(self._callFUT(IFoo), obj)
+        getGlobalSiteManager().unregisterUtility(obj, IFoo)
+        self.assertIsNone(self._callFUT(IFoo))
+        self.assertEqual(self._getStatistics()['hits'], 0)
+
+    def test_invalidated_by_base_registration(self):
+        from zope.interface import Interface
+        from zope.interface.registry import Components
+
+        from zope.component import getGlobalSiteManager
+        from zope.component.tests.examples import ConformsToIComponentLookup
+
+        class IFoo(Interface):
+            pass
+        obj = object()
+        gsm = getGlobalSiteManager()
+        sm = Components('local', (gsm,))
+        context = ConformsToIComponentLookup(sm)
+        self.assertIsNone(self._callFUT(IFoo, context=context))
+        gsm.registerUtility(obj, IFoo)
+        self.assertIs(self._callFUT(IFoo, context=context), obj)
+
+    def test_invalidated_by_abort(self):
+        # The generation of a persistent registry is rolled back when the
+        # transaction is aborted and may be reached again.
+        try:
+            import transaction
+            from ZODB import DB
+            from ZODB.MappingStorage import MappingStorage
+
+            from zope.component.persistentregistry import PersistentComponents
+        except ModuleNotFoundError:  # pragma: no cover
+            self.skipTest("ZODB not installed")
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        from zope.component.tests.examples import ConformsToIComponentLookup
+        db = DB(MappingStorage())
+        self.addCleanup(db.close)
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        conn.root()['sm'] = PersistentComponents()
+        tm.commit()
+        conn.cacheMinimize()
+        sm = conn.root()['sm']
+        context = ConformsToIComponentLookup(sm)
+        obj = object()
+        sm.utilities.register((), I1, 'n', obj)
+        generation = sm.utilities._generation
+        self.assertIs(self._callFUT(I1, 'n', context=context), obj)
+        tm.abort()
+        sm.utilities.register((), I2, '', object())
+        self.assertEqual(sm.utilities._generation, generation)
+        self.assertIsNone(self._callFUT(I1, 'n', context=context))
+
+    def test_invalidated_by_abort_before_reload(self):
+        try:
+            import transaction
+            from ZODB import DB
+            from ZODB.MappingStorage import MappingStorage
+
+            from zope.component.persistentregistry import PersistentComponents
+        except ModuleNotFoundError:  # pragma: no cover
+            self.skipTest("ZODB not installed")
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import ConformsToIComponentLookup
+        db = DB(MappingStorage())
+        self.addCleanup(db.close)
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        conn.root()['sm'] = PersistentComponents()
+        tm.commit()
+        sm = conn.root()['sm']
+        context = ConformsToIComponentLookup(sm)
+        obj = object()
+        sm.utilities.register((), I1, '', obj)
+        self.assertIs(self._callFUT(I1, context=context), obj)
+        self.assertIs(self._callFUT(I1, context=context), obj)
+        self.assertEqual(self._getStatistics()['hits'], 1)
+        tm.abort()
+        self.assertIsNone(self._callFUT(I1, context=context))
+
+    def test_invalidated_after_ghostified(self):
+        # The subscriptions of the table are lost when a persistent
+        # registry becomes a ghost.
+        try:
+            import transaction
+            from ZODB import DB
+            from ZODB.MappingStorage import MappingStorage
+
+            from zope.component.persistentregistry import PersistentComponents
+        except ModuleNotFoundError:  # pragma: no cover
+            self.skipTest("ZODB not installed")
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import ConformsToIComponentLookup
+        db = DB(MappingStorage())
+        self.addCleanup(db.close)
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        conn.root()['sm'] = PersistentComponents()
+        tm.commit()
+        sm = conn.root()['sm']
+        context = ConformsToIComponentLookup(sm)
+        self.assertIsNone(self._callFUT(I1, context=context))
+        self.assertIsNone(self._callFUT(I1, context=context))
+        self.assertEqual(self._getStatistics()['hits'], 1)
+        conn.cacheMinimize()
+        self.assertIsNone(sm.utilities._p_changed)
+        obj = object()
+        sm.utilities.register((), I1, '', obj)
+        self.assertIs(self._callFUT(I1, context=context), obj)
+
+    def test_maxsize(self):
+        from zope.interface import Interface
+
+        from zope.component import _api
+
+        class IFoo(Interface):
+            pass
+        _api._utility_cache.maxsize = 3
+        for name in 'abcd':
+            self._callFUT(IFoo, name)
+        self.assertEqual(len(_api._utility_cache._getState().current[1]), 1)
+        self._callFUT(IFoo, 'd')
+        self._callFUT(IFoo, 'a')
+        self.assertEqual(self._getStatistics()['hits'], 1)
+
+    def test_per_site_manager(self):
+        from zope.interface import Interface
+        from zope.interface.registry import Components
+
+        from zope.component.tests.examples import ConformsToIComponentLookup
+
+        class IFoo(Interface):
+            pass
+        obj1 = object()
+        obj2 = object()
+        sm1 = Components('one')
+        sm1.registerUtility(obj1, IFoo)
+        sm2 = Components('two')
+        sm2.registerUtility(obj2, IFoo)
+        for _ in range(2):
+            self.assertIs(
+                self._callFUT(IFoo, context=ConformsToIComponentLookup(sm1)),
+                obj1)
+            self.assertIs(
+                self._callFUT(IFoo, context=ConformsToIComponentLookup(sm2)),
+                obj2)
+        self.assertEqual(self._getStatistics()['hits'], 2)
+
+    def test_w_non_components_site_manager(self):
+        from zope.interface import Interface
+
+        from zope.component.tests.examples import ConformsToIComponentLookup
+
+        class IFoo(Interface):
+            pass
+        obj = object()
+
+        class SM:
+            def queryUtility(self, interface, name, default):
+                return obj
+        context = ConformsToIComponentLookup(SM())
+        self.assertIs(self._callFUT(IFoo, context=context), obj)
+        self.assertEqual(self._getStatistics(),
+                         {'hits': 0, 'misses': 0, 'hit_rate': 0.0})
+
+    def test_setSite_forgets_current_registry(self):
+        from zope.interface import Interface
+        from zope.interface.registry import Components
+
+        from zope.component import _api
+        from zope.component.hooks import setSite
+
+        class IFoo(Interface):
+            pass
+
+        class Site:
+            def getSiteManager(self):
+                return Components('local')
+        self._callFUT(IFoo)
+        self.assertIsNotNone(_api._utility_cache._getState().current)
+        setSite(Site())
+        self.assertIsNone(_api._utility_cache._getState().current)
+        self._callFUT(IFoo)
+        setSite()
+        self.assertIsNone(_api._utility_cache._getState().current)
+
+    def test_clear(self):
+        from zope.interface import Interface
+
+        from zope.component import _api
+
+        class IFoo(Interface):
+            pass
+        self._callFUT(IFoo)
+        _api._utility_cache.clear()
+        self.assertEqual(self._getStatistics()['misses'], 0)
+        self.assertIsNone(_api._utility_cache._getState().current)
+        self.assertEqual(len(_api._utility_cache._tables), 0)
+
+    def _inThread(self, func, *args):
+        import threading
+        thread = threading.Thread(target=func, args=args)
+        thread.start()
+        thread.join()
+
+    def test_current_registry_is_per_thread(self):
+        from zope.interface import Interface
+
+        from zope.component import _api
+
+        class IFoo(Interface):
+            pass
+        self._callFUT(IFoo)
+        current = _api._utility_cache._getState().current
+        seen = []
+
+        def lookup():
+            seen.append(_api._utility_cache._getState().current)
+            self._callFUT(IFoo)
+            _api._utility_cache.siteChanged()
+        self._inThread(lookup)
+        self.assertEqual(seen, [None])
+        self.assertIs(_api._utility_cache._getState().current, current)
+
+    def test_statistics_include_ended_threads(self):
+        import gc
+
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        def lookup():
+            self._callFUT(IFoo)
+            self._callFUT(IFoo)
+        self._inThread(lookup)
+        gc.collect()
+        self._callFUT(IFoo)
+        self.assertEqual(self._getStatistics(),
+                         {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+    def test_threads_with_own_sites(self):
+        import threading
+
+        from zope.interface import Interface
+        from zope.interface.registry import Components
+
+        from zope.component.hooks import setHooks
+        from zope.component.hooks import setSite
+
+        class IFoo(Interface):
+            pass
+
+        class Site:
+            def __init__(self, sm):
+                self._sm = sm
+
+            def getSiteManager(self):
+                return self._sm
+
+        setHooks()
+        utilities = [object() for _ in range(4)]
+        sites = []
+        for i, utility in enumerate(utilities):
+            sm = Components('site%d' % i)
+            sm.registerUtility(utility, IFoo)
+            sites.append(Site(sm))
+        barrier = threading.Barrier(len(sites))
+        found = {}
+
+        def lookup(i):
+            setSite(sites[i])
+            barrier.wait()
+            found[i] = {id(self._callFUT(IFoo)) for _ in range(100)}
+        threads = [threading.Thread(target=lookup, args=(i,))
+                   for i in range(len(sites))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(found,
+                         {i: {id(utility)}
+                          for i, utility in enumerate(utilities)})
+        self.assertEqual(self._getStatistics()['misses'], 4)
+
+    def _makeSites(self, depth):
+        from zope.interface.registry import Components
+
+        from zope.component import getGlobalSiteManager
+        from zope.component.tests.examples import ConformsToIComponentLookup
+        sms = [getGlobalSiteManager()]
+        for i in range(depth):
+            sms.append(Components('level%d' % i, (sms[-1],)))
+        return sms, [ConformsToIComponentLookup(sm) for sm in sms]
+
+    def test_queryNextUtility(self):
+        from zope.interface import Interface
+
+        from zope.component._api import getNextUtility
+        from zope.component._api import queryNextUtility
+
+        class IFoo(Interface):
+            pass
+        obj1 = object()
+        obj2 = object()
+        sms, contexts = self._makeSites(4)
+        sms[1].registerUtility(obj1, IFoo)
+        sms[3].registerUtility(obj2, IFoo)
+        self.assertIs(queryNextUtility(contexts[4], IFoo), obj2)
+        self.assertIs(getNextUtility(contexts[4], IFoo), obj2)
+        self.assertIs(queryNextUtility(contexts[3], IFoo), obj1)
+        self.assertIs(queryNextUtility(contexts[3], IFoo), obj1)
+        self.assertIsNone(queryNextUtility(contexts[1], IFoo))
+        self.assertIs(queryNextUtility(contexts[1], IFoo, default=self), self)
+        self.assertEqual(self._getStatistics(),
+                         {'hits': 3, 'misses': 3, 'hit_rate': 0.5})
+
+    def test_queryNextUtility_invalidated_by_base_registration(self):
+        from zope.interface import Interface
+
+        from zope.component._api import queryNextUtility
+
+        class IFoo(Interface):
+            pass
+        obj1 = object()
+        obj2 = object()
+        sms, contexts = self._makeSites(4)
+        sms[0].registerUtility(obj1, IFoo)
+        self.assertIs(queryNextUtility(contexts[4], IFoo), obj1)
+        sms[2].registerUtility(obj2, IFoo)
+        self.assertIs(queryNextUtility(contexts[4], IFoo), obj2)
+        sms[2].unregisterUtility(obj2, IFoo)
+        self.assertIs(queryNextUtility(contexts[4], IFoo), obj1)
+        # Registrations in the site itself don't matter.
+        sms[4].registerUtility(obj2, IFoo)
+        self.assertIs(queryNextUtility(contexts[4], IFoo), obj1)
+
+    def test_queryNextUtility_w_non_components_site_manager(self):
+        from zope.interface import Interface
+
+        from zope.component._api import queryNextUtility
+        from zope.component.tests.examples import ConformsToIComponentLookup
+
+        class IFoo(Interface):
+            pass
+        obj = object()
+
+        class Base:
+            def queryUtility(self, interface, name, default):
+                return obj
+
+        class SM:
+            __bases__ = (Base(),)
+        context = ConformsToIComponentLookup(SM())
+        self.assertIs(queryNextUtility(context, IFoo), obj)
+        self.assertEqual(self._getStatistics()['misses'], 0)
+
+
 class Test_getUtilitiesFor(unittest.TestCase):
 
     from zope.component.testing import setUp
@@ -1356,6 +2047,116 @@ class Test_getFactoriesFor(unittest.TestCase):
         self.assertEqual(list(self._callFUT(IBar, context=Context())),
                          [('test', _factory)])
 
+    def _makeRegistry(self):
+        from zope.interface import Interface
+        from zope.interface.registry import Components
+
+        from zope.component.tests.examples import ConformsToIComponentLookup
+
+        class IBase(Interface):
+            pass
+
+        class IFoo(IBase):
+            pass
+
+        class IBar(Interface):
+            pass
+        sm = Components('test')
+        return sm, ConformsToIComponentLookup(sm), IBase, IFoo, IBar
+
+    def test_w_registry_uses_index(self):
+        from zope.interface import implementer
+
+        from zope.component import _api
+        from zope.component.factory import Factory
+        from zope.component.interfaces import IFactory
+        sm, context, IBase, IFoo, IBar = self._makeRegistry()
+
+        @implementer(IFoo)
+        class Foo:
+            pass
+        foo = Factory(Foo)
+        both = Factory(object, interfaces=(IFoo, IBar))
+        bar = Factory(object, interfaces=[IBar])
+        sm.registerUtility(foo, IFactory, 'foo')
+        sm.registerUtility(both, IFactory, 'both')
+        sm.registerUtility(bar, IFactory, 'bar')
+        self.assertEqual(sorted(self._callFUT(IBase, context=context)),
+                         [('both', both), ('foo', foo)])
+        self.assertEqual(sorted(self._callFUT(IBar, context=context)),
+                         [('bar', bar), ('both', both)])
+        index = _api._factory_indexes[sm.utilities]
+        # The order is that of getUtilitiesFor.
+        self.assertEqual(list(self._callFUT(IFoo, context=context)),
+                         [pair for pair in sm.getUtilitiesFor(IFactory)
+                          if pair[0] != 'bar'])
+        self.assertIs(_api._factory_indexes[sm.utilities], index)
+
+    def test_w_registry_registration_changes(self):
+        from zope.interface import implementer
+
+        from zope.component.factory import Factory
+        from zope.component.interfaces import IFactory
+        sm, context, IBase, IFoo, IBar = self._makeRegistry()
+
+        @implementer(IFoo)
+        class Foo:
+            pass
+        foo = Factory(Foo)
+        self.assertEqual(list(self._callFUT(IFoo, context=context)), [])
+        sm.registerUtility(foo, IFactory, 'foo')
+        self.assertEqual(list(self._callFUT(IFoo, context=context)),
+                         [('foo', foo)])
+        sm.unregisterUtility(foo, IFactory, 'foo')
+        self.assertEqual(list(self._callFUT(IFoo, context=context)), [])
+
+    def test_w_registry_lookup_replaced(self):
+        # A persistent registry is reloaded with a new lookup, possibly
+        # with a generation it had before.
+        from zope.component.factory import Factory
+        from zope.component.interfaces import IFactory
+        sm, context, IBase, IFoo, IBar = self._makeRegistry()
+        generation = sm.utilities._generation
+        bar = Factory(object, interfaces=(IBar,))
+        sm.utilities.register((), IFactory, 'bar', bar)
+        self.assertEqual(list(self._callFUT(IBar, context=context)),
+                         [('bar', bar)])
+        sm.utilities.unregister((), IFactory, 'bar')
+        sm.utilities._generation = generation + 1
+        sm.utilities._createLookup()
+        self.assertEqual(list(self._callFUT(IBar, context=context)), [])
+
+    def test_w_registry_base_changes(self):
+        from zope.interface.registry import Components
+
+        from zope.component.factory import Factory
+        from zope.component.interfaces import IFactory
+        from zope.component.tests.examples import ConformsToIComponentLookup
+        base, _, IBase, IFoo, IBar = self._makeRegistry()
+        sm = Components('sub', (base,))
+        context = ConformsToIComponentLookup(sm)
+        self.assertEqual(list(self._callFUT(IBar, context=context)), [])
+        bar = Factory(object, interfaces=(IBar,))
+        base.registerUtility(bar, IFactory, 'bar')
+        self.assertEqual(list(self._callFUT(IBar, context=context)),
+                         [('bar', bar)])
+
+    def test_w_registry_declaration_changes(self):
+        from zope.interface import classImplements
+
+        from zope.component.factory import Factory
+        from zope.component.interfaces import IFactory
+        sm, context, IBase, IFoo, IBar = self._makeRegistry()
+
+        class Foo:
+            pass
+        foo = Factory(Foo)
+        sm.registerUtility(foo, IFactory, 'foo')
+        self.assertEqual(list(self._callFUT(IBar, context=context)), [])
+        classImplements(Foo, IBar)
+        self.assertEqual(list(self._callFUT(IBar, context=context)),
+                         [('foo', foo)])
+
 
 IMyUtility = None
 
@@ -62,3 +62,513 @@ class Test_objectEventNotify(unittest.TestCase):
         event = _ObjectEvent(context)
         objectEventNotify(event)
         self.assertEqual(_adapted, [(context, event)])
+
+
+class Test_batchedEvents(unittest.TestCase):
+
+    from zope.component.testing import setUp
+    from zope.component.testing import tearDown
+
+    def _callFUT(self):
+        from zope.component.event import batchedEvents
+        return batchedEvents()
+
+    def _makeEvents(self):
+        from zope.interface import Interface
+        from zope.interface import implementer
+        from zope.interface.interfaces import ObjectEvent
+
+        class IFoo(Interface):
+            pass
+
+        class IBar(Interface):
+            pass
+
+        @implementer(IFoo)
+        class Foo:
+            pass
+
+        @implementer(IBar)
+        class Bar:
+            pass
+        return IFoo, IBar, [ObjectEvent(ob)
+                            for ob in (Foo(), Bar(), Foo(), Bar())]
+
+    def _register(self, handler, required):
+        from zope.component.globalregistry import getGlobalSiteManager
+        getGlobalSiteManager().registerHandler(handler, required, event=False)
+
+    def test_queues_events(self):
+        from zope.event import notify
+        from zope.interface import Interface
+        _called = []
+
+        def _handler(event):
+            _called.append(event)
+        self._register(_handler, (Interface,))
+        with self._callFUT():
+            notify(1)
+            notify(2)
+            self.assertEqual(_called, [])
+        self.assertEqual(_called, [1, 2])
+        notify(3)
+        self.assertEqual(_called, [1, 2, 3])
+
+    def test_groups_object_events(self):
+        from zope.event import notify
+        from zope.interface import Interface
+        from zope.interface.interfaces import IObjectEvent
+
+        from zope.component.event import objectEventNotify
+        IFoo, IBar, events = self._makeEvents()
+        _called = []
+
+        def _first(ob, event):
+            _called.append(('first', event))
+
+        def _second(ob, event):
+            _called.append(('second', event))
+        self._register(objectEventNotify, (IObjectEvent,))
+        self._register(_first, (Interface, IObjectEvent))
+        self._register(_second, (Interface, IObjectEvent))
+        with self._callFUT():
+            for event in events:
+                notify(event)
+        foo1, bar1, foo2, bar2 = events
+        self.assertEqual(_called, [
+            ('first', foo1), ('first', foo2),
+            ('second', foo1), ('second', foo2),
+            ('first', bar1), ('first', bar2),
+            ('second', bar1), ('second', bar2),
+        ])
+
+    def test_batched_handler(self):
+        from zope.event import notify
+        from zope.interface.interfaces import IObjectEvent
+
+        from zope.component.event import batched
+        from zope.component.event import objectEventNotify
+        IFoo, IBar, events = self._makeEvents()
+        _called = []
+
+        @batched
+        def _reindex(batch):
+            _called.append(batch)
+        self._register(objectEventNotify, (IObjectEvent,))
+        self._register(_reindex, (IFoo, IObjectEvent))
+        with self._callFUT():
+            for event in events:
+                notify(event)
+        foo1, bar1, foo2, bar2 = events
+        self.assertEqual(_called, [[(foo1.object, foo1),
+                                    (foo2.object, foo2)]])
+        del _called[:]
+        notify(foo1)
+        self.assertEqual(_called, [[(foo1.object, foo1)]])
+        self.assertEqual(_reindex.__name__, '_reindex')
+
+    def test_nested(self):
+        from zope.event import notify
+        from zope.interface import Interface
+        _called = []
+
+        def _handler(event):
+            _called.append(event)
+        self._register(_handler, (Interface,))
+        with self._callFUT():
+            with self._callFUT():
+                notify(1)
+            self.assertEqual(_called, [])
+        self.assertEqual(_called, [1])
+
+    def test_exception_discards_events(self):
+        from zope.event import notify
+        from zope.interface import Interface
+        _called = []
+
+        def _handler(event):
+            _called.append(event)
+        self._register(_handler, (Interface,))
+        with self.assertRaises(ValueError):
+            with self._callFUT():
+                notify(1)
+                raise ValueError
+        self.assertEqual(_called, [])
+        notify(2)
+        self.assertEqual(_called, [2])
+
+    def test_events_notified_by_handlers(self):
+        from zope.event import notify
+        from zope.interface import Interface
+        _called = []
+
+        def _handler(event):
+            _called.append(event)
+            if event < 2:
+                notify(event + 1)
+        self._register(_handler, (Interface,))
+        with self._callFUT():
+            notify(0)
+        self.assertEqual(_called, [0, 1, 2])
+
+    def test_events_notified_in_sites(self):
+        from zope.event import notify
+        from zope.interface import Interface
+        from zope.interface.registry import Components
+
+        from zope.component.hooks import getSite
+        from zope.component.hooks import resetHooks
+        from zope.component.hooks import setHooks
+        from zope.component.hooks import site
+
+        class Site:
+            def __init__(self, sm):
+                self._sm = sm
+
+            def getSiteManager(self):
+                return self._sm
+        _called = []
+
+        def _global(event):
+            _called.append(('global', event, getSite()))
+
+        def _local(event):
+            _called.append(('local', event, getSite()))
+        self._register(_global, (Interface,))
+        local = Site(Components('local'))
+        local.getSiteManager().registerHandler(
+            _local, (Interface,), event=False)
+        setHooks()
+        self.addCleanup(resetHooks)
+        with self._callFUT():
+            notify(1)
+            with site(local):
+                notify(2)
+            notify(3)
+        self.assertEqual(_called, [('global', 1, None),
+                                   ('global', 3, None),
+                                   ('local', 2, local)])
+
+    def test_w_sitemanager_wo_adapters(self):
+        from zope.event import notify
+
+        from zope.component import _api
+        _called = []
+
+        class SM:
+            def subscribers(self, objects, provided):
+                _called.append(objects)
+                return ()
+        sm = SM()
+        _api.getSiteManager.sethook(lambda context=None: sm)
+        self.addCleanup(_api.getSiteManager.reset)
+        with self._callFUT():
+            notify(1)
+            notify(2)
+        self.assertEqual(_called, [(1,), (2,)])
+
+
+class Test_anotify(unittest.TestCase):
+
+    from zope.component.testing import setUp
+    from zope.component.testing import tearDown
+
+    def _callFUT(self, event, **kw):
+        import asyncio
+
+        from zope.component.event import anotify
+        return asyncio.run(anotify(event, **kw))
+
+    def _register(self, handler, required):
+        from zope.component.globalregistry import getGlobalSiteManager
+        getGlobalSiteManager().registerHandler(handler, required, event=False)
+
+    def test_wo_async_handlers(self):
+        from zope.interface import Interface
+        _called = []
+
+        def _handler(event):
+            _called.append(event)
+            return 'ignored'
+        self._register(_handler, (Interface,))
+        self._callFUT(1)
+        self.assertEqual(_called, [1])
+
+    def test_concurrent(self):
+        import asyncio
+
+        from zope.interface import Interface
+        _called = []
+        started = []
+
+        async def _wait(event):
+            started.append('wait')
+            # Only returns once the other handler has started.
+            while len(started) < 2:
+                await asyncio.sleep(0)
+            _called.append(('wait', event))
+
+        async def _other(event):
+            started.append('other')
+            _called.append(('other', event))
+
+        def _sync(event):
+            _called.append(('sync', event))
+        self._register(_wait, (Interface,))
+        self._register(_sync, (Interface,))
+        self._register(_other, (Interface,))
+        self._callFUT(1)
+        self.assertEqual(_called,
+                         [('sync', 1), ('other', 1), ('wait', 1)])
+
+    def test_concurrency(self):
+        import asyncio
+
+        from zope.interface import Interface
+        running = []
+        most = []
+
+        async def _handler(event):
+            running.append(event)
+            most.append(len(running))
+            await asyncio.sleep(0)
+            running.remove(event)
+        for _ in range(5):
+            self._register(_handler, (Interface,))
+        self._callFUT(1, concurrency=2)
+        self.assertEqual(max(most), 2)
+        self.assertEqual(len(most), 5)
+
+    def test_object_event(self):
+        from zope.interface import Interface
+        from zope.interface.interfaces import IObjectEvent
+        from zope.interface.interfaces import ObjectEvent
+
+        from zope.component.event import objectEventNotify
+        _called = []
+
+        async def _handler(ob, event):
+            _called.append((ob, event))
+        self._register(objectEventNotify, (IObjectEvent,))
+        self._register(_handler, (Interface, IObjectEvent))
+        event = ObjectEvent(object())
+        self._callFUT(event)
+        self.assertEqual(_called, [(event.object, event)])
+
+    def test_raises_after_all_handlers(self):
+        from zope.interface import Interface
+        _called = []
+
+        async def _fails(event):
+            raise ValueError(event)
+
+        async def _handler(event):
+            _called.append(event)
+        self._register(_fails, (Interface,))
+        self._register(_handler, (Interface,))
+        with self.assertRaises(ValueError):
+            self._callFUT(1)
+        self.assertEqual(_called, [1])
+
+    def test_notify_wo_running_loop(self):
+        from zope.event import notify
+        from zope.interface import Interface
+        _called = []
+
+        async def _handler(event):
+            _called.append(event)
+        self._register(_handler, (Interface,))
+        notify(1)
+        self.assertEqual(_called, [1])
+
+    def test_notify_w_running_loop(self):
+        import asyncio
+
+        from zope.event import notify
+        from zope.interface import Interface
+
+        from zope.component import event as _event
+        _called = []
+
+        async def _handler(event):
+            _called.append(event)
+        self._register(_handler, (Interface,))
+
+        async def _main():
+            notify(1)
+            self.assertEqual(_called, [])
+            self.assertEqual(len(_event._tasks), 1)
+            await asyncio.gather(*_event._tasks)
+        asyncio.run(_main())
+        self.assertEqual(_called, [1])
+        self.assertEqual(_event._tasks, set())
+
+    def test_batched(self):
+        import asyncio
+
+        from zope.event import notify
+        from zope.interface import Interface
+
+        from zope.component import event as _event
+        from zope.component.event import anotify
+        from zope.component.event import batchedEvents
+        _called = []
+
+        async def _handler(event):
+            _called.append(event)
+        self._register(_handler, (Interface,))
+
+        async def _main():
+            # The events are delivered when the batch ends, the
+            # coroutines become tasks then.
+            with batchedEvents():
+                notify(1)
+                await anotify(2)
+            self.assertEqual(_called, [])
+            await asyncio.gather(*_event._tasks)
+            self.assertEqual(_called, [1, 2])
+        asyncio.run(_main())
+
+
+class TestDeferredHandler(unittest.TestCase):
+
+    from zope.component.testing import setUp
+    from zope.component.testing import tearDown
+
+    def _getTargetClass(self):
+        from zope.component.event import DeferredHandler
+        return DeferredHandler
+
+    def _makeOne(self, handler):
+        return self._getTargetClass()(handler)
+
+    def _flush(self):
+        from zope.component.event import flushDeferredHandlers
+        return flushDeferredHandlers(timeout=10)
+
+    def test_runs_in_executor_w_site(self):
+        import threading
+
+        from zope.component.hooks import getSite
+        from zope.component.hooks import setSite
+        _called = []
+
+        def _handler(*objects):
+            _called.append((objects, getSite(), threading.current_thread()))
+
+        class Site:
+            def getSiteManager(self):
+                from zope.component import getGlobalSiteManager
+                return getGlobalSiteManager()
+        site = Site()
+        setSite(site)
+        self.addCleanup(setSite)
+        self._makeOne(_handler)(1, 2)
+        self.assertEqual(self._flush(), [])
+        [(objects, handler_site, thread)] = _called
+        self.assertEqual(objects, (1, 2))
+        self.assertIs(handler_site, site)
+        self.assertIsNot(thread, threading.current_thread())
+
+    def test_errors(self):
+        from zope.testing.loggingsupport import InstalledHandler
+
+        def _handler(event):
+            raise ValueError(event)
+        log = InstalledHandler('zope.component.event')
+        self.addCleanup(log.uninstall)
+        self._makeOne(_handler)(1)
+        [error] = self._flush()
+        self.assertIsInstance(error, ValueError)
+        self.assertEqual(self._flush(), [])
+        [record] = log.records
+        self.assertEqual(record.getMessage(),
+                         'Error in deferred event handler')
+        self.assertIs(record.exc_info[1], error)
+
+    def test_flush_waits_for_handlers_deferred_by_handlers(self):
+        _called = []
+
+        def _second(event):
+            _called.append(event)
+
+        def _first(event):
+            self._makeOne(_second)(event + 1)
+            _called.append(event)
+        self._makeOne(_first)(1)
+        self.assertEqual(self._flush(), [])
+        self.assertEqual(sorted(_called), [1, 2])
+
+    def test_flush_timeout(self):
+        import threading
+
+        from zope.component.event import flushDeferredHandlers
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self._makeOne(lambda event: release.wait())(1)
+        self.assertRaises(TimeoutError, flushDeferredHandlers, timeout=0)
+        release.set()
+        self.assertEqual(self._flush(), [])
+
+    def test_setDeferredExecutor(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from zope.component.event import setDeferredExecutor
+        _called = []
+        executor = ThreadPoolExecutor(1, thread_name_prefix='test')
+        self.addCleanup(executor.shutdown)
+        setDeferredExecutor(executor)
+        self._makeOne(_called.append)(1)
+        self.assertEqual(self._flush(), [])
+        self.assertEqual(_called, [1])
+        setDeferredExecutor()
+        self._makeOne(_called.append)(2)
+        self.assertEqual(self._flush(), [])
+        self.assertEqual(_called, [1, 2])
+
+    def test_setDeferredExecutor_replaces_default(self):
+        from zope.component import event
+        self._makeOne(lambda event: None)(1)
+        executor = event._executor
+        event.setDeferredExecutor()
+        self.assertIsNone(event._executor)
+        self.assertEqual(self._flush(), [])
+        executor.shutdown()
+
+    def test_equality(self):
+        def _handler(event):
+            raise AssertionError('Not called')
+
+        def _other(event):
+            raise AssertionError('Not called')
+        deferred = self._makeOne(_handler)
+        self.assertEqual(deferred, _handler)
+        self.assertEqual(_handler, deferred)
+        self.assertEqual(deferred, self._makeOne(_handler))
+        self.assertNotEqual(deferred, _other)
+        self.assertEqual(hash(deferred), hash(_handler))
+        self.assertEqual(repr(deferred),
+                         '<DeferredHandler %r>' % (_handler,))
+
+    def test_adapts(self):
+        from zope.interface import Interface
+
+        from zope.component._declaration import adaptedBy
+        from zope.component._declaration import adapter
+
+        @adapter(Interface)
+        def _handler(event):
+            raise AssertionError('Not called')
+        self.assertEqual(adaptedBy(self._makeOne(_handler)), (Interface,))
+        self.assertIsNone(adaptedBy(self._makeOne(lambda event: None)))
+
+    def test_notify(self):
+        from zope.event import notify
+        from zope.interface import Interface
+
+        from zope.component import provideHandler
+        _called = []
+        provideHandler(_called.append, (Interface,), deferred=True)
+        notify(1)
+        self.assertEqual(self._flush(), [])
+        self.assertEqual(_called, [1])
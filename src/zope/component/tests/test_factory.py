@@ -111,3 +111,54 @@ class FactoryTests(unittest.TestCase):
         factory = self._makeOne(_callable)
         spec = factory.getInterfaces()
         self.assertEqual(list(spec), [IBaz])
+
+    def test_getInterfaces_explicit_cached(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class IBar(Interface):
+            pass
+        factory = self._makeOne(interfaces=(IFoo,))
+        spec = factory.getInterfaces()
+        self.assertIs(factory.getInterfaces(), spec)
+        # Replacing the interfaces is noticed.
+        factory._interfaces = (IBar,)
+        self.assertEqual(list(factory.getInterfaces()), [IBar])
+
+    def test_providesInterface(self):
+        from zope.interface import Interface
+        from zope.interface import implementer
+
+        class IBase(Interface):
+            pass
+
+        class IFoo(IBase):
+            pass
+
+        class IBar(Interface):
+            pass
+
+        @implementer(IBar)
+        class Bar:
+            pass
+        factory = self._makeOne(interfaces=(IFoo,))
+        self.assertTrue(factory.providesInterface(IFoo))
+        self.assertTrue(factory.providesInterface(IBase))
+        self.assertFalse(factory.providesInterface(IBar))
+        factory = self._makeOne(Bar)
+        self.assertTrue(factory.providesInterface(IBar))
+        self.assertFalse(factory.providesInterface(IFoo))
+
+    def test_pickle_omits_cached_spec(self):
+        import pickle
+
+        from zope.component.tests.examples import I1
+        factory = self._makeOne(dict, interfaces=(I1,))
+        factory.getInterfaces()
+        self.assertNotIn('_spec', factory.__getstate__())
+        copy = pickle.loads(pickle.dumps(factory))
+        self.assertEqual(list(copy.getInterfaces()), [I1])
+        self.assertEqual(copy.__dict__.keys(), {
+            '_callable', 'title', 'description', '_interfaces', '_spec'})
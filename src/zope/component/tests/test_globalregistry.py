@@ -282,6 +282,27 @@ class Test_provideHandler(unittest.TestCase):
         self.assertEqual(hr.name, '')
         self.assertIs(hr.factory, _handler)
 
+    def test_deferred(self):
+        from zope.interface import Interface
+
+        from zope.component._declaration import adapter
+        from zope.component.event import DeferredHandler
+        from zope.component.globalregistry import getGlobalSiteManager
+
+        class IFoo(Interface):
+            pass
+        _handler = adapter(IFoo)(fails_if_called(self))
+        self._callFUT(_handler, deferred=True)
+        gsm = getGlobalSiteManager()
+        regs = list(gsm.registeredHandlers())
+        self.assertEqual(len(regs), 1)
+        hr = regs[0]
+        self.assertEqual(list(hr.required), [IFoo])
+        self.assertIsInstance(hr.factory, DeferredHandler)
+        self.assertIs(hr.factory.handler, _handler)
+        self.assertTrue(gsm.unregisterHandler(_handler))
+        self.assertEqual(list(gsm.registeredHandlers()), [])
+
 
 class TestBaseGlobalComponents(unittest.TestCase):
 
@@ -310,3 +331,514 @@ class TestBaseGlobalComponents(unittest.TestCase):
         from zope.interface.verify import verifyClass
         for iface in self._getTargetInterfaces():
             verifyClass(iface, self._getTargetClass())
+
+    def test_freeze_rejects_registrations(self):
+        from zope.interface import Interface
+
+        from zope.component.globalregistry import FrozenRegistryError
+
+        class IFoo(Interface):
+            pass
+
+        def _handler(context):
+            raise AssertionError("Never called")
+        gsm = self._makeOne()
+        gsm.registerUtility(object(), IFoo)
+        gsm.freeze()
+        self.assertRaises(FrozenRegistryError,
+                          gsm.registerUtility, object(), IFoo, 'other')
+        self.assertRaises(FrozenRegistryError,
+                          gsm.unregisterUtility, provided=IFoo)
+        self.assertRaises(FrozenRegistryError,
+                          gsm.registerAdapter, _handler, (IFoo,), IFoo)
+        self.assertRaises(FrozenRegistryError,
+                          gsm.unregisterAdapter, _handler, (IFoo,), IFoo)
+        self.assertRaises(FrozenRegistryError,
+                          gsm.registerSubscriptionAdapter, _handler,
+                          (IFoo,), IFoo)
+        self.assertRaises(FrozenRegistryError,
+                          gsm.unregisterSubscriptionAdapter, _handler,
+                          (IFoo,), IFoo)
+        self.assertRaises(FrozenRegistryError,
+                          gsm.registerHandler, _handler, (IFoo,))
+        self.assertRaises(FrozenRegistryError,
+                          gsm.unregisterHandler, _handler, (IFoo,))
+        self.assertRaises(FrozenRegistryError,
+                          gsm.adapters.register, (IFoo,), IFoo, '', _handler)
+        self.assertRaises(FrozenRegistryError,
+                          gsm.utilities.unregister, (), IFoo, '')
+        self.assertRaises(FrozenRegistryError,
+                          gsm.adapters.subscribe, (IFoo,), None, _handler)
+        self.assertRaises(FrozenRegistryError,
+                          gsm.adapters.unsubscribe, (IFoo,), None, _handler)
+        self.assertEqual(len(list(gsm.registeredUtilities())), 1)
+
+    def test_freeze_queryUtility(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class IBar(IFoo):
+            pass
+
+        class IBaz(Interface):
+            pass
+        foo = object()
+        bar = object()
+        gsm = self._makeOne()
+        gsm.registerUtility(foo, IFoo)
+        gsm.registerUtility(bar, IBar, 'bar')
+        gsm.freeze()
+        self.assertIs(gsm.queryUtility(IFoo), foo)
+        self.assertIs(gsm.queryUtility(IBar, 'bar'), bar)
+        self.assertIs(gsm.queryUtility(IFoo, 'bar'), bar)
+        self.assertIs(gsm.queryUtility(Interface, 'bar'), bar)
+        self.assertIsNone(gsm.queryUtility(IBar))
+        self.assertEqual(gsm.queryUtility(IBaz, default=42), 42)
+        self.assertIs(gsm.getUtility(IFoo), foo)
+
+    def test_freeze_w_frozen_bases(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+        foo = object()
+        parent = self._getTargetClass()('parent')
+        parent.registerUtility(foo, IFoo, 'x')
+        parent.freeze()
+        gsm = self._getTargetClass()('child', (parent,))
+        gsm.freeze()
+        self.assertIn('queryUtility', gsm.__dict__)
+        self.assertIs(gsm.queryUtility(IFoo, 'x'), foo)
+        self.assertIs(gsm.getUtility(IFoo, 'x'), foo)
+
+    def test_freeze_w_mutable_bases(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+        foo = object()
+        bar = object()
+        parent = self._getTargetClass()('parent')
+        parent.registerUtility(foo, IFoo, 'x')
+        gsm = self._getTargetClass()('child', (parent,))
+        gsm.freeze()
+        self.assertNotIn('queryUtility', gsm.__dict__)
+        self.assertIs(gsm.queryUtility(IFoo, 'x'), foo)
+        parent.registerUtility(bar, IFoo, 'x')
+        parent.registerUtility(foo, IFoo, 'y')
+        self.assertIs(gsm.queryUtility(IFoo, 'x'), bar)
+        self.assertIs(gsm.queryUtility(IFoo, 'y'), foo)
+
+    def test_freeze_rejects_bases(self):
+        from zope.interface import Interface
+
+        from zope.component.globalregistry import FrozenRegistryError
+
+        class IFoo(Interface):
+            pass
+        parent = self._getTargetClass()('parent')
+        parent.registerUtility(object(), IFoo)
+        parent.freeze()
+        gsm = self._getTargetClass()('child')
+        gsm.freeze()
+        with self.assertRaises(FrozenRegistryError):
+            gsm.__bases__ = (parent,)
+        with self.assertRaises(FrozenRegistryError):
+            gsm.utilities.__bases__ = (parent.utilities,)
+        with self.assertRaises(FrozenRegistryError):
+            gsm.adapters.__bases__ = (parent.adapters,)
+        self.assertEqual(gsm.__bases__, ())
+        self.assertEqual(gsm.utilities.__bases__, ())
+        self.assertEqual(gsm.adapters.__bases__, ())
+        self.assertIsNone(gsm.queryUtility(IFoo))
+        self.assertIsNone(gsm.utilities.lookup((), IFoo))
+
+    def test_freeze_twice(self):
+        gsm = self._makeOne()
+        gsm.freeze()
+        queryUtility = gsm.queryUtility
+        gsm.freeze()
+        self.assertIs(gsm.queryUtility, queryUtility)
+
+    def test_reinit_thaws(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+        foo = object()
+        gsm = self._makeOne()
+        gsm.freeze()
+        gsm.__init__('base')
+        self.assertNotIn('queryUtility', gsm.__dict__)
+        gsm.registerUtility(foo, IFoo)
+        self.assertIs(gsm.queryUtility(IFoo), foo)
+
+    def _makeInterfaces(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class IBar(IFoo):
+            pass
+        return IFoo, IBar
+
+    def test_concurrent_registrations(self):
+        from zope.interface import implementer
+        IFoo, IBar = self._makeInterfaces()
+
+        @implementer(IBar)
+        class Bar:
+            pass
+        handled = []
+        foo = object()
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+        gsm.registerUtility(foo, IBar, 'foo')
+        gsm.registerAdapter(lambda context: (context,), (IFoo,), IFoo)
+        gsm.registerSubscriptionAdapter(lambda context: 'sub', (IBar,), IFoo)
+        gsm.registerHandler(handled.append, (IFoo,))
+        bar = Bar()
+        self.assertIs(gsm.getUtility(IFoo, 'foo'), foo)
+        self.assertEqual(gsm.getAdapter(bar, IFoo), (bar,))
+        self.assertEqual(gsm.subscribers((bar,), IFoo), ['sub'])
+        gsm.handle(bar)
+        self.assertEqual(handled, [bar])
+        self.assertEqual(len(list(gsm.registeredUtilities())), 1)
+
+        gsm.unregisterUtility(foo, IBar, 'foo')
+        gsm.unregisterHandler(handled.append, (IFoo,))
+        self.assertIsNone(gsm.queryUtility(IFoo, 'foo'))
+        gsm.handle(bar)
+        self.assertEqual(handled, [bar])
+        self.assertEqual(list(gsm.registeredUtilities()), [])
+
+    def test_concurrent_published_state_not_changed(self):
+        IFoo, IBar = self._makeInterfaces()
+        gsm = self._makeOne()
+        gsm.registerUtility(object(), IFoo)
+        gsm.enableConcurrentRegistration()
+        adapters = gsm.utilities._adapters
+        registrations = gsm._utility_registrations
+        self.assertEqual(len(adapters[0][IFoo]), 1)
+        generation = gsm.utilities._generation
+        gsm.registerUtility(object(), IBar, 'bar')
+        self.assertIsNot(gsm.utilities._adapters, adapters)
+        self.assertEqual(len(adapters[0]), 1)
+        self.assertEqual(len(adapters[0][IFoo]), 1)
+        self.assertEqual(len(registrations), 1)
+        self.assertEqual(gsm.utilities._generation, generation + 2)
+        # Nothing changed, nothing published:
+        adapters = gsm.utilities._adapters
+        gsm.utilities.unregister((), IBar, 'nonesuch')
+        self.assertIs(gsm.utilities._adapters, adapters)
+        self.assertEqual(gsm.utilities._generation, generation + 2)
+
+    def test_concurrent_existing_lookups_see_changes(self):
+        from zope.interface import implementer
+        IFoo, IBar = self._makeInterfaces()
+
+        @implementer(IBar)
+        class Bar:
+            pass
+        bar = Bar()
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+        # The site hooks keep on to the adapter hook.
+        adapter_hook = gsm.adapters.adapter_hook
+        self.assertIsNone(adapter_hook(IFoo, bar))
+        gsm.registerAdapter(lambda context: 42, (IBar,), IFoo)
+        self.assertEqual(adapter_hook(IFoo, bar), 42)
+        gsm.unregisterAdapter(required=(IBar,), provided=IFoo)
+        self.assertIsNone(adapter_hook(IFoo, bar))
+
+    def test_concurrent_subregistries_see_changes(self):
+        from zope.interface.registry import Components
+        IFoo, IBar = self._makeInterfaces()
+        foo = object()
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+        local = Components('local', (gsm,))
+        self.assertIsNone(local.queryUtility(IFoo))
+        gsm.registerUtility(foo, IBar)
+        self.assertIs(local.queryUtility(IFoo), foo)
+        self.assertEqual(list(local.getAllUtilitiesRegisteredFor(IFoo)),
+                         [foo])
+
+    def test_concurrent_registration_published_once(self):
+        IFoo, IBar = self._makeInterfaces()
+        foo = object()
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+        utilities = gsm.utilities
+        published = []
+        _publish = utilities._publish
+
+        def _record(staged):
+            _publish(staged)
+            published.append((utilities.lookup((), IFoo),
+                              utilities.subscriptions((), IFoo)))
+        utilities._publish = _record
+        gsm.registerUtility(foo, IFoo)
+        self.assertEqual(published, [(foo, [foo])])
+        gsm.unregisterUtility(foo, IFoo)
+        self.assertEqual(published, [(foo, [foo]), (None, [])])
+        self.assertIsNone(utilities._staged)
+        self.assertIsNone(gsm.adapters._staged)
+
+    def test_concurrent_handler_registration_published_with_change(self):
+        from zope.interface.interfaces import IRegistered
+
+        from zope.component import getGlobalSiteManager
+        IFoo, IBar = self._makeInterfaces()
+        foo = object()
+        bar = object()
+        gsm = getGlobalSiteManager()
+        gsm.enableConcurrentRegistration()
+        seen = []
+
+        def _registered(event):
+            if getattr(event.object, 'component', None) is foo:
+                gsm.registerUtility(bar, IBar)
+                seen.append(gsm.queryUtility(IFoo))
+        gsm.registerHandler(_registered, (IRegistered,))
+        published = []
+        _publish = gsm.utilities._publish
+
+        def _record(staged):
+            _publish(staged)
+            published.append(staged)
+        gsm.utilities._publish = _record
+        gsm.registerUtility(foo, IFoo)
+        self.assertEqual(seen, [None])
+        self.assertEqual(len(published), 1)
+        self.assertIs(gsm.getUtility(IFoo), foo)
+        self.assertIs(gsm.getUtility(IBar), bar)
+
+    def test_concurrent_failed_registration_published(self):
+        # Like without concurrent mode, what was changed before an
+        # error stays changed.
+        IFoo, IBar = self._makeInterfaces()
+        foo = object()
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+
+        def _subscribe(*args):
+            raise ValueError()
+        gsm.utilities.subscribe = _subscribe
+        self.assertRaises(ValueError, gsm.registerUtility, foo, IFoo)
+        self.assertIs(gsm.utilities.lookup((), IFoo), foo)
+        self.assertIsNone(gsm.utilities._staged)
+
+    def test_concurrent_subscribing_waits_for_writers(self):
+        import threading
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+
+        class _Subscriber:
+            def changed(self, originally_changed):
+                raise AssertionError("not called")  # pragma: no cover
+        subscriber = _Subscriber()
+        thread = threading.Thread(target=gsm.utilities._addSubregistry,
+                                  args=(subscriber,))
+        with gsm._lock:
+            thread.start()
+            thread.join(0.05)
+            self.assertNotIn(subscriber, gsm.utilities._v_subregistries)
+        thread.join()
+        self.assertIn(subscriber, gsm.utilities._v_subregistries)
+        thread = threading.Thread(target=gsm.utilities._removeSubregistry,
+                                  args=(subscriber,))
+        with gsm._lock:
+            thread.start()
+            thread.join(0.05)
+            self.assertIn(subscriber, gsm.utilities._v_subregistries)
+        thread.join()
+        self.assertNotIn(subscriber, gsm.utilities._v_subregistries)
+
+    def test_concurrent_reentrant_registration(self):
+        from zope.interface.interfaces import IRegistered
+
+        from zope.component import getGlobalSiteManager
+        IFoo, IBar = self._makeInterfaces()
+        foo = object()
+        bar = object()
+        gsm = getGlobalSiteManager()
+        gsm.enableConcurrentRegistration()
+
+        def _registered(event):
+            if getattr(event.object, 'component', None) is foo:
+                gsm.registerUtility(bar, IBar)
+        gsm.registerHandler(_registered, (IRegistered,))
+        gsm.registerUtility(foo, IFoo)
+        self.assertIs(gsm.getUtility(IBar), bar)
+
+    def test_concurrent_threads(self):
+        import threading
+        IFoo, IBar = self._makeInterfaces()
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+        for n in range(2):
+            for i in range(20):
+                gsm.registerUtility(object(), IBar, 'd%d-%d' % (n, i))
+                gsm.registerUtility(object(), IFoo, 'c%d-%d' % (n, i))
+        errors = []
+        done = threading.Event()
+
+        def _read():
+            # Each utility is registered or unregistered once, so the
+            # invariants below hold although the two lookups of a pair
+            # happen at different times.
+            try:
+                while not done.is_set():
+                    for n in range(2):
+                        for i in range(20):
+                            # Of each pair of utilities registered, the
+                            # second one is registered first, so it
+                            # must be found if the first one is.
+                            first = gsm.queryUtility(IFoo, 'a%d-%d' % (n, i))
+                            second = gsm.queryUtility(IBar, 'b%d-%d' % (n, i))
+                            if first is not None and second is None:
+                                errors.append(i)  # pragma: no cover
+                            # Of each pair of utilities unregistered,
+                            # the first one is unregistered first, so
+                            # it can't be found if the second one isn't.
+                            second = gsm.queryUtility(IBar, 'd%d-%d' % (n, i))
+                            first = gsm.queryUtility(IFoo, 'c%d-%d' % (n, i))
+                            if first is not None and second is None:
+                                errors.append(i)  # pragma: no cover
+            except BaseException as e:  # pragma: no cover
+                errors.append(e)
+
+        def _write(n):
+            for i in range(20):
+                gsm.registerUtility(object(), IBar, 'b%d-%d' % (n, i))
+                gsm.registerUtility(object(), IFoo, 'a%d-%d' % (n, i))
+                gsm.unregisterUtility(provided=IFoo, name='c%d-%d' % (n, i))
+                gsm.unregisterUtility(provided=IBar, name='d%d-%d' % (n, i))
+        readers = [threading.Thread(target=_read) for _ in range(4)]
+        writers = [threading.Thread(target=_write, args=(n,))
+                   for n in range(2)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(list(gsm.registeredUtilities())), 80)
+        self.assertEqual(
+            {name[0] for name, _ in gsm.getUtilitiesFor(IFoo)}
+            | {name[0] for name, _ in gsm.getUtilitiesFor(IBar)},
+            {'a', 'b'})
+
+    def test_concurrent_frozen(self):
+        from zope.component.globalregistry import FrozenRegistryError
+        IFoo, IBar = self._makeInterfaces()
+        foo = object()
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+        gsm.registerUtility(foo, IFoo)
+        gsm.freeze()
+        self.assertIs(gsm.queryUtility(IFoo), foo)
+        self.assertRaises(FrozenRegistryError,
+                          gsm.registerUtility, object(), IBar)
+
+    def test_concurrent_twice_and_reinit(self):
+        gsm = self._makeOne()
+        gsm.enableConcurrentRegistration()
+        lock = gsm._lock
+        self.assertIs(gsm.utilities._lock, lock)
+        self.assertIs(gsm.adapters._lock, lock)
+        gsm.enableConcurrentRegistration()
+        self.assertIs(gsm._lock, lock)
+        gsm.__init__('base')
+        self.assertIsNone(gsm._lock)
+        self.assertIsNone(gsm.utilities._lock)
+
+
+class Test_warmLookupCaches(unittest.TestCase):
+
+    def _callFUT(self, registry):
+        from zope.component.globalregistry import warmLookupCaches
+        return warmLookupCaches(registry)
+
+    def _makeRegistry(self):
+        from zope.component.globalregistry import BaseGlobalComponents
+        return BaseGlobalComponents('test')
+
+    def test_utilities_and_adapters(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class IBar(IFoo):
+            pass
+
+        def _factory(context):
+            raise AssertionError("Never called")
+        gsm = self._makeRegistry()
+        util = object()
+        gsm.registerUtility(util, IBar, 'bar')
+        gsm.registerAdapter(_factory, (IFoo,), IBar)
+        gsm.registerSubscriptionAdapter(_factory, (IFoo,), IBar)
+        gsm.registerHandler(_factory, (IFoo,))
+        self._callFUT(gsm.utilities)
+        self._callFUT(gsm.adapters)
+
+        for registry in gsm.utilities, gsm.adapters:
+            lookup = registry._v_lookup
+            for name in ('_uncached_lookup', '_uncached_lookupAll',
+                         '_uncached_subscriptions'):
+                setattr(lookup, name, fails_if_called(self))
+        self.assertIs(gsm.queryUtility(IFoo, 'bar'), util)
+        self.assertEqual(list(gsm.getUtilitiesFor(IBar)), [('bar', util)])
+        self.assertEqual(gsm.adapters.lookup((IFoo,), IFoo), _factory)
+        self.assertEqual(gsm.adapters.subscriptions((IFoo,), IFoo),
+                         [_factory])
+        self.assertEqual(gsm.adapters.subscriptions((IFoo,), None),
+                         [_factory])
+
+
+class Test_prepareForFork(unittest.TestCase):
+
+    from zope.component.testing import setUp
+    from zope.component.testing import tearDown
+
+    def _callFUT(self, *args, **kw):
+        from zope.component.globalregistry import prepareForFork
+        return prepareForFork(*args, **kw)
+
+    def _unfreeze_gc(self):
+        import gc
+        if hasattr(gc, 'unfreeze'):  # pragma: no branch
+            gc.unfreeze()
+
+    def test_defaults(self):
+        import gc
+
+        from zope.interface import Interface
+
+        from zope.component.globalregistry import base
+
+        class IFoo(Interface):
+            pass
+        util = object()
+        base.registerUtility(util, IFoo)
+        self.addCleanup(self._unfreeze_gc)
+        self._callFUT()
+        self.assertTrue(base._frozen)
+        self.assertIs(base.queryUtility(IFoo), util)
+        if hasattr(gc, 'get_freeze_count'):  # pragma: no branch
+            self.assertGreater(gc.get_freeze_count(), 0)
+
+    def test_wo_freeze(self):
+        from zope.component.globalregistry import BaseGlobalComponents
+        gsm = BaseGlobalComponents('test')
+        self.addCleanup(self._unfreeze_gc)
+        self._callFUT(gsm, freeze=False)
+        self.assertFalse(gsm._frozen)
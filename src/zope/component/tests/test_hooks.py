@@ -77,6 +77,80 @@ class SiteInfoTests(unittest.TestCase):
         self.assertNotIn('adapter_hook', si.__dict__)
 
 
+class ContextSiteInfoTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from zope.component.hooks import ContextSiteInfo
+        return ContextSiteInfo
+
+    def _makeOne(self):
+        return self._getTargetClass()()
+
+    def test_initial(self):
+        from zope.component.globalregistry import getGlobalSiteManager
+        gsm = getGlobalSiteManager()
+        si = self._makeOne()
+        self.assertEqual(si.site, None)
+        self.assertIs(si.sm, gsm)
+
+    def test_site_and_sm(self):
+        _site = object()
+        _sm = object()
+        si = self._makeOne()
+        si.site = _site
+        si.sm = _sm
+        self.assertIs(si.site, _site)
+        self.assertIs(si.sm, _sm)
+
+    def test_adapter_hook(self):
+        _hook = object()
+
+        class _Registry:
+            adapter_hook = _hook
+
+        class _SiteManager:
+            adapters = _Registry()
+        si = self._makeOne()
+        si.sm = _SiteManager()
+        self.assertIsNone(si._state.get()[2])
+        self.assertIs(si.adapter_hook, _hook)
+        self.assertIs(si._state.get()[2], _hook)
+        del si.adapter_hook
+        self.assertIsNone(si._state.get()[2])
+        self.assertRaises(AttributeError, delattr, si, 'adapter_hook')
+        _other = object()
+        si.adapter_hook = _other
+        self.assertIs(si.adapter_hook, _other)
+
+    def test_isolated_between_contexts(self):
+        import contextvars
+        _site = object()
+        si = self._makeOne()
+
+        def _in_context():
+            si.site = _site
+            return si.site
+
+        self.assertIs(contextvars.copy_context().run(_in_context), _site)
+        self.assertIsNone(si.site)
+
+    def test_isolated_between_tasks(self):
+        import asyncio
+        si = self._makeOne()
+        seen = []
+
+        async def _task(site):
+            si.site = site
+            await asyncio.sleep(0)
+            seen.append((site, si.site))
+
+        async def _main():
+            await asyncio.gather(_task('one'), _task('two'))
+
+        asyncio.run(_main())
+        self.assertEqual(sorted(seen), [('one', 'one'), ('two', 'two')])
+
+
 class Test_setSite(unittest.TestCase):
 
     def _callFUT(self, site):
@@ -115,6 +189,110 @@ class Test_setSite(unittest.TestCase):
         self.assertIs(siteinfo.site, _site)
         self.assertNotIn('adapter_hook', siteinfo.__dict__)
 
+    def test_w_current_site(self):
+        from zope.component import hooks
+        _SM2 = object()
+        _HOOK = object()
+
+        class _Site:
+            def getSiteManager(self):
+                return _SM2
+        _site = _Site()
+        siteinfo = _DummySiteInfo()
+        siteinfo.sm = _SM2
+        siteinfo.site = _site
+        siteinfo.adapter_hook = _HOOK
+        with _Monkey(hooks, siteinfo=siteinfo):
+            self._callFUT(_site)
+        self.assertIs(siteinfo.adapter_hook, _HOOK)
+
+    def test_w_current_site_new_sm(self):
+        from zope.component import hooks
+        _SM2 = object()
+        _HOOK = object()
+
+        class _Site:
+            def getSiteManager(self):
+                return _SM2
+        _site = _Site()
+        siteinfo = _DummySiteInfo()
+        siteinfo.site = _site
+        siteinfo.adapter_hook = _HOOK
+        with _Monkey(hooks, siteinfo=siteinfo):
+            self._callFUT(_site)
+        self.assertIs(siteinfo.sm, _SM2)
+        self.assertNotIn('adapter_hook', siteinfo.__dict__)
+
+    def test_w_current_site_replaced_lookup(self):
+        from zope.component import hooks
+        _SM2 = _LookupSM()
+
+        class _Site:
+            def getSiteManager(self):
+                return _SM2
+        _site = _Site()
+        siteinfo = _DummySiteInfo()
+        siteinfo.sm = _SM2
+        siteinfo.site = _site
+        siteinfo.adapter_hook = _SM2.adapters._v_lookup.adapter_hook
+        _SM2.adapters._v_lookup = _Lookup()
+        with _Monkey(hooks, siteinfo=siteinfo):
+            self._callFUT(_site)
+        self.assertIs(siteinfo.sm, _SM2)
+        self.assertNotIn('adapter_hook', siteinfo.__dict__)
+
+    def test_w_current_site_after_abort(self):
+        try:
+            import transaction
+            from ZODB import DB
+            from ZODB.MappingStorage import MappingStorage
+
+            from zope.component.persistentregistry import PersistentComponents
+        except ModuleNotFoundError:  # pragma: no cover
+            self.skipTest("ZODB not installed")
+        from zope.interface import Interface
+        from zope.interface import implementer
+
+        from zope.component import queryAdapter
+        from zope.component.hooks import resetHooks
+        from zope.component.hooks import setHooks
+        from zope.component.hooks import setSite
+
+        class IFoo(Interface):
+            pass
+
+        @implementer(IFoo)
+        class Foo:
+            pass
+
+        class IBar(Interface):
+            pass
+
+        class _Site:
+            def __init__(self, sm):
+                self.sm = sm
+
+            def getSiteManager(self):
+                return self.sm
+        db = DB(MappingStorage())
+        self.addCleanup(db.close)
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        conn.root()['sm'] = PersistentComponents()
+        tm.commit()
+        conn.cacheMinimize()
+        _site = _Site(conn.root()['sm'])
+        setHooks()
+        self.addCleanup(resetHooks)
+        self.addCleanup(setSite)
+        setSite(_site)
+        _site.sm.registerAdapter(lambda context: 'bar', (IFoo,), IBar)
+        self.assertEqual(queryAdapter(Foo(), IBar), 'bar')
+        tm.abort()
+        # A retried request sets the same site again.
+        setSite(_site)
+        self.assertIsNone(queryAdapter(Foo(), IBar))
+
 
 class Test_getSite(unittest.TestCase):
 
@@ -163,8 +341,58 @@ class Test_site(unittest.TestCase):
                 self.assertIs(siteinfo.site, _site)
                 self.assertIs(siteinfo.sm, _SM2)
             self.assertIsNone(siteinfo.site)
+            self.assertIs(siteinfo.sm, _SM)
+            hooks.setSite()
+            with self._callFUT(_site):
+                pass
+            self.assertIsNone(siteinfo.site)
             self.assertIs(siteinfo.sm, gsm)
 
+    def test_restores_adapter_hook(self):
+        from zope.component import hooks
+        _SM2 = object()
+        _HOOK = object()
+
+        class _Site:
+            def getSiteManager(self):
+                return _SM2
+        _site = _Site()
+        siteinfo = _DummySiteInfo()
+        siteinfo.adapter_hook = _HOOK
+        with _Monkey(hooks, siteinfo=siteinfo):
+            with self._callFUT(_site):
+                self.assertNotIn('adapter_hook', siteinfo.__dict__)
+        self.assertIs(siteinfo.sm, _SM)
+        self.assertIs(siteinfo.adapter_hook, _HOOK)
+
+    def test_drops_adapter_hook_of_replaced_lookup(self):
+        from zope.component import hooks
+        _SM2 = object()
+        _SM3 = _LookupSM()
+
+        class _Site:
+            def getSiteManager(self):
+                return _SM2
+        _site = _Site()
+        siteinfo = _DummySiteInfo()
+        siteinfo.sm = _SM3
+        siteinfo.adapter_hook = _SM3.adapters._v_lookup.adapter_hook
+        with _Monkey(hooks, siteinfo=siteinfo):
+            with self._callFUT(_site):
+                _SM3.adapters._v_lookup = _Lookup()
+        self.assertIs(siteinfo.sm, _SM3)
+        self.assertNotIn('adapter_hook', siteinfo.__dict__)
+
+    def test_same_site(self):
+        from zope.component import hooks
+        _HOOK = object()
+        siteinfo = _DummySiteInfo()
+        siteinfo.adapter_hook = _HOOK
+        with _Monkey(hooks, siteinfo=siteinfo):
+            with self._callFUT(None):
+                pass
+        self.assertIs(siteinfo.adapter_hook, _HOOK)
+
 
 class Test_getSiteManager(unittest.TestCase):
 
@@ -289,6 +517,78 @@ class Test_setHooks(unittest.TestCase):
         self.assertEqual(getSiteManager._hooked, hooks.getSiteManager)
 
 
+class Test_setHooks_use_contextvars(unittest.TestCase):
+
+    def tearDown(self):
+        from zope.component.hooks import resetHooks
+        from zope.component.hooks import setSite
+        setSite()
+        resetHooks()
+
+    def test_switches_storage_and_keeps_site(self):
+        from zope.component import hooks
+        _SM2 = object()
+
+        class _Site:
+            def getSiteManager(self):
+                return _SM2
+        _site = _Site()
+        hooks.setSite(_site)
+        hooks.setHooks(use_contextvars=True)
+        self.assertIs(hooks.siteinfo, hooks._context_siteinfo)
+        self.assertIs(hooks.getSite(), _site)
+        self.assertIs(hooks.getSiteManager(), _SM2)
+        hooks.setHooks(use_contextvars=True)
+        self.assertIs(hooks.siteinfo, hooks._context_siteinfo)
+        hooks.setHooks(use_contextvars=False)
+        self.assertIs(hooks.siteinfo, hooks._thread_siteinfo)
+        self.assertIs(hooks.getSite(), _site)
+
+    def test_default_keeps_storage(self):
+        from zope.component import hooks
+        hooks.setHooks(use_contextvars=True)
+        hooks.setHooks()
+        self.assertIs(hooks.siteinfo, hooks._context_siteinfo)
+        hooks.setHooks(use_contextvars=False)
+        hooks.setHooks()
+        self.assertIs(hooks.siteinfo, hooks._thread_siteinfo)
+
+    def test_resetHooks_restores_thread_storage(self):
+        from zope.component import hooks
+        hooks.setHooks(use_contextvars=True)
+        hooks.resetHooks()
+        self.assertIs(hooks.siteinfo, hooks._thread_siteinfo)
+
+    def test_site_per_task(self):
+        import asyncio
+
+        from zope.interface.registry import Components
+
+        from zope.component import getSiteManager
+        from zope.component import hooks
+
+        class _Site:
+            def __init__(self):
+                self.registry = Components('components')
+
+            def getSiteManager(self):
+                return self.registry
+        hooks.setHooks(use_contextvars=True)
+        seen = []
+
+        async def _task(site):
+            hooks.setSite(site)
+            await asyncio.sleep(0)
+            seen.append(getSiteManager() is site.registry)
+
+        async def _main():
+            await asyncio.gather(*[_task(_Site()) for _ in range(3)])
+
+        asyncio.run(_main())
+        self.assertEqual(seen, [True, True, True])
+        self.assertIsNone(hooks.getSite())
+
+
 class Test_resetHooks(unittest.TestCase):
 
     def _callFUT(self):
@@ -326,10 +626,38 @@ class Test_resetHooks(unittest.TestCase):
 _SM = object()
 
 
+class _Lookup:
+
+    def adapter_hook(self, interface, object, name='', default=None):
+        raise NotImplementedError
+
+
+class _Adapters:
+
+    def __init__(self):
+        self._v_lookup = _Lookup()
+
+
+class _LookupSM:
+
+    def __init__(self):
+        self.adapters = _Adapters()
+
+
 class _DummySiteInfo:
     sm = _SM
     site = None
 
+    def _getState(self):
+        return self.site, self.sm, self.__dict__.get('adapter_hook')
+
+    def _setState(self, state):
+        self.site, self.sm, adapter_hook = state
+        if adapter_hook is None:
+            self.__dict__.pop('adapter_hook', None)
+        else:
+            self.adapter_hook = adapter_hook
+
 
 class _Monkey:
     # context-manager for replacing module names in the scope of a test.
@@ -0,0 +1,333 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Tests for z.c.instrumentation
+"""
+import unittest
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    from zope.component.testing import tearDown
+
+    def setUp(self):
+        from zope.component.instrumentation import enableInstrumentation
+        from zope.component.testing import setUp
+        setUp()
+        enableInstrumentation()
+
+    def _report(self):
+        from zope.component.instrumentation import getInstrumentationReport
+        return {(entry['function'], entry['interface'], entry['name']): entry
+                for entry in getInstrumentationReport()}
+
+    def _makeInterfaces(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class IBar(Interface):
+            pass
+        return IFoo, IBar
+
+    def test_disabled_by_default(self):
+        from zope.component import _api
+        from zope.component.instrumentation import disableInstrumentation
+        from zope.component.instrumentation import getInstrumentationReport
+        from zope.component.testing import setUp
+        setUp()
+        self.assertIsNone(_api._recorder)
+        self.assertEqual(getInstrumentationReport(), [])
+        disableInstrumentation()
+        self.assertEqual(getInstrumentationReport(), [])
+
+    def test_utilities(self):
+        from zope.interface.interfaces import ComponentLookupError
+
+        from zope.component import getGlobalSiteManager
+        from zope.component import getUtility
+        from zope.component import queryUtility
+        from zope.component.instrumentation import enableInstrumentation
+        IFoo, _ = self._makeInterfaces()
+        util = object()
+        getGlobalSiteManager().registerUtility(util, IFoo, 'util')
+        # Registering dispatches an event; start over.
+        enableInstrumentation()
+        self.assertIs(getUtility(IFoo, 'util'), util)
+        self.assertIs(queryUtility(IFoo, 'util'), util)
+        self.assertIsNone(queryUtility(IFoo))
+        self.assertRaises(ComponentLookupError, getUtility, IFoo)
+
+        report = self._report()
+        self.assertEqual(len(report), 4)
+        entry = report[('queryUtility', IFoo, 'util')]
+        self.assertEqual((entry['calls'], entry['misses']), (2, 0))
+        self.assertGreaterEqual(entry['total_time'], 0.0)
+        self.assertEqual(entry['mean_time'], entry['total_time'] / 2)
+        entry = report[('getUtility', IFoo, 'util')]
+        self.assertEqual((entry['calls'], entry['misses']), (1, 0))
+        entry = report[('getUtility', IFoo, '')]
+        self.assertEqual((entry['calls'], entry['misses']), (1, 1))
+        entry = report[('queryUtility', IFoo, '')]
+        self.assertEqual((entry['calls'], entry['misses']), (2, 2))
+        self.assertEqual(entry['miss_rate'], 1.0)
+
+    def test_adapters(self):
+        from zope.interface import implementer
+
+        from zope.component import getGlobalSiteManager
+        from zope.component import queryAdapter
+        from zope.component import queryMultiAdapter
+        IFoo, IBar = self._makeInterfaces()
+
+        @implementer(IFoo)
+        class Foo:
+            pass
+
+        def _adapt(*objects):
+            return objects
+        gsm = getGlobalSiteManager()
+        gsm.registerAdapter(_adapt, (IFoo,), IBar)
+        gsm.registerAdapter(_adapt, (IFoo, IFoo), IBar, 'multi')
+        foo = Foo()
+        self.assertEqual(queryAdapter(foo, IBar), (foo,))
+        self.assertIsNone(queryAdapter(foo, IBar, 'nonesuch'))
+        self.assertEqual(queryMultiAdapter((foo, foo), IBar, 'multi'),
+                         (foo, foo))
+
+        report = self._report()
+        self.assertEqual(report[('queryAdapter', IBar, '')]['misses'], 0)
+        self.assertEqual(report[('queryAdapter', IBar, 'nonesuch')]['misses'],
+                         1)
+        self.assertEqual(
+            report[('queryMultiAdapter', IBar, 'multi')]['calls'], 1)
+
+    def test_subscribers_and_handle(self):
+        from zope.interface import implementer
+
+        from zope.component import getGlobalSiteManager
+        from zope.component import handle
+        from zope.component import subscribers
+        IFoo, IBar = self._makeInterfaces()
+
+        @implementer(IFoo)
+        class Foo:
+            pass
+        handled = []
+        gsm = getGlobalSiteManager()
+        gsm.registerSubscriptionAdapter(lambda o: 'sub', (IFoo,), IBar)
+        gsm.registerHandler(handled.append, (IFoo,))
+        foo = Foo()
+        self.assertEqual(subscribers((foo,), IBar), ['sub'])
+        self.assertEqual(subscribers((object(),), IBar), [])
+        handle(foo)
+        subscribers((foo,), None)
+        self.assertEqual(handled, [foo, foo])
+
+        report = self._report()
+        entry = report[('subscribers', IBar, '')]
+        self.assertEqual((entry['calls'], entry['misses']), (2, 1))
+        entry = report[('handle', None, '')]
+        self.assertEqual((entry['calls'], entry['misses']), (1, 0))
+        # Including the registration events notified above.
+        entry = report[('subscribers', None, '')]
+        self.assertEqual((entry['calls'], entry['misses']), (3, 0))
+
+    def test_error_not_a_miss(self):
+        from zope.interface import implementer
+
+        from zope.component import getGlobalSiteManager
+        from zope.component import queryAdapter
+        IFoo, IBar = self._makeInterfaces()
+
+        @implementer(IFoo)
+        class Foo:
+            pass
+
+        def _broken(context):
+            raise ValueError()
+        getGlobalSiteManager().registerAdapter(_broken, (IFoo,), IBar)
+        self.assertRaises(ValueError, queryAdapter, Foo(), IBar)
+        entry = self._report()[('queryAdapter', IBar, '')]
+        self.assertEqual((entry['calls'], entry['misses']), (1, 0))
+        # Later calls are recorded, too
+        self.assertRaises(ValueError, queryAdapter, Foo(), IBar)
+        self.assertEqual(self._report()[('queryAdapter', IBar, '')]['calls'],
+                         2)
+
+    def test_disable_keeps_report(self):
+        from zope.component import _api
+        from zope.component import queryUtility
+        from zope.component.instrumentation import disableInstrumentation
+        from zope.component.instrumentation import enableInstrumentation
+        IFoo, _ = self._makeInterfaces()
+        queryUtility(IFoo)
+        disableInstrumentation()
+        self.assertIsNone(_api._recorder)
+        queryUtility(IFoo)
+        self.assertEqual(self._report()[('queryUtility', IFoo, '')]['calls'],
+                         1)
+        enableInstrumentation()
+        self.assertEqual(self._report(), {})
+
+
+class HandlerProfilingTests(unittest.TestCase):
+
+    from zope.component.testing import tearDown
+
+    def setUp(self):
+        from zope.component.instrumentation import enableHandlerProfiling
+        from zope.component.testing import setUp
+        setUp()
+        enableHandlerProfiling()
+
+    def _report(self):
+        from zope.component.instrumentation import getHandlerProfileReport
+        return {entry['handler'].rsplit('.', 1)[-1]: entry
+                for entry in getHandlerProfileReport()}
+
+    def test_disabled_by_default(self):
+        from zope.component import _api
+        from zope.component.instrumentation import disableHandlerProfiling
+        from zope.component.instrumentation import getHandlerProfileReport
+        from zope.component.instrumentation import getHandlerProfileStacks
+        from zope.component.testing import setUp
+        setUp()
+        self.assertIsNone(_api._profiler)
+        self.assertEqual(getHandlerProfileReport(), [])
+        self.assertEqual(getHandlerProfileStacks(), '')
+        disableHandlerProfiling()
+        self.assertEqual(getHandlerProfileReport(), [])
+
+    def test_handlers(self):
+        from zope.event import notify
+        from zope.interface import Interface
+        from zope.interface.interfaces import IObjectEvent
+        from zope.interface.interfaces import ObjectEvent
+
+        from zope.component import getGlobalSiteManager
+        from zope.component.event import objectEventNotify
+        from zope.component.instrumentation import disableHandlerProfiling
+        from zope.component.instrumentation import getHandlerProfileStacks
+
+        def handler(ob, event):
+            pass
+
+        def fails(ob, event):
+            raise ValueError
+
+        gsm = getGlobalSiteManager()
+        gsm.registerHandler(objectEventNotify, (IObjectEvent,),
+                            event=False)
+        gsm.registerHandler(handler, (Interface, IObjectEvent),
+                            info='handlers.zcml', event=False)
+        event = ObjectEvent(object())
+        notify(event)
+        notify(event)
+        gsm.registerHandler(fails, (Interface, IObjectEvent), event=False)
+        self.assertRaises(ValueError, notify, event)
+        # Notifies an `IUnregistered` object event, too.
+        gsm.unregisterHandler(fails, (Interface, IObjectEvent))
+        notify(event)
+        disableHandlerProfiling()
+        notify(event)
+
+        report = self._report()
+        self.assertEqual(sorted(report), ['fails', 'handler',
+                                          'objectEventNotify'])
+        self.assertEqual(report['handler']['info'], 'handlers.zcml')
+        self.assertEqual(report['handler']['calls'], 5)
+        self.assertEqual(report['handler']['errors'], 0)
+        self.assertEqual(report['fails']['calls'], 1)
+        self.assertEqual(report['fails']['errors'], 1)
+        self.assertEqual(report['fails']['info'], '')
+        notify_entry = report['objectEventNotify']
+        self.assertEqual(notify_entry['calls'], 5)
+        self.assertEqual(notify_entry['errors'], 1)
+        self.assertGreaterEqual(notify_entry['total_time'],
+                                report['handler']['total_time'])
+        self.assertLessEqual(notify_entry['own_time'],
+                             notify_entry['total_time'])
+
+        stacks = getHandlerProfileStacks().splitlines()
+        self.assertEqual(len(stacks), 3)
+        frames = [line.rsplit(' ', 1)[0].split(';') for line in stacks]
+        self.assertEqual(
+            [[frame.split(' ')[0].rsplit('.', 1)[-1] for frame in path]
+             for path in frames],
+            [['objectEventNotify'],
+             ['objectEventNotify', 'fails'],
+             ['objectEventNotify', 'handler']])
+        self.assertTrue(frames[2][1].endswith(' (handlers.zcml)'))
+        for line in stacks:
+            self.assertGreaterEqual(int(line.rsplit(' ', 1)[1]), 0)
+
+    def test_registration_info_from_bases(self):
+        from zope.configuration.xmlconfig import ParserInfo
+        from zope.interface import Interface
+        from zope.interface.registry import Components
+
+        from zope.component import getGlobalSiteManager
+        from zope.component import handle
+        from zope.component.event import DeferredHandler
+        from zope.component.hooks import setHooks
+        from zope.component.hooks import setSite
+
+        def handler(ob):
+            pass
+        info = ParserInfo('/app/configure.zcml', 12, 4)
+        getGlobalSiteManager().registerHandler(
+            DeferredHandler(handler), (Interface,), info=info, event=False)
+        sm = Components('local', (getGlobalSiteManager(),))
+
+        class Site:
+            def getSiteManager(self):
+                return sm
+        setHooks()
+        setSite(Site())
+        self.addCleanup(setSite)
+        handle(1)
+        handle(2)
+        [entry] = self._report().values()
+        self.assertTrue(entry['handler'].endswith('.handler (deferred)'))
+        self.assertEqual(entry['info'], '/app/configure.zcml:12')
+        self.assertEqual(entry['calls'], 2)
+
+    def test_async_handler(self):
+        from zope.interface import Interface
+
+        from zope.component import getGlobalSiteManager
+        from zope.component import handle
+        _called = []
+
+        async def handler(ob):
+            _called.append(ob)
+        getGlobalSiteManager().registerHandler(handler, (Interface,),
+                                               event=False)
+        handle(1)
+        self.assertEqual(_called, [1])
+        self.assertEqual(self._report()['handler']['calls'], 1)
+
+    def test_describe(self):
+        from zope.component.instrumentation import _describeHandler
+
+        class Handler:
+            def __call__(self, ob):
+                pass
+        handler = Handler()
+        self.assertEqual(_describeHandler(handler), repr(handler))
+        self.assertEqual(
+            _describeHandler(Handler.__call__),
+            __name__ + '.HandlerProfilingTests.test_describe.'
+            '<locals>.Handler.__call__')
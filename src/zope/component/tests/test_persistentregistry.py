@@ -106,6 +106,57 @@ class PersistentAdapterRegistryTests(unittest.TestCase):
         # base class gets called
         self.assertEqual(registry._generation, 2)
 
+    def _makeSubscriber(self):
+
+        class _Subscriber:
+            def __init__(self):
+                self._changed = []
+
+            def changed(self, originally_changed):
+                self._changed.append(originally_changed)
+
+        return _Subscriber()
+
+    def test_changed_notifies_subregistries(self):
+        registry, jar, OID = self._makeOneWithJar()
+        subscriber = self._makeSubscriber()
+        registry._addSubregistry(subscriber)
+        other = object()
+        registry.changed(other)
+        self.assertEqual(subscriber._changed, [other])
+        registry._removeSubregistry(subscriber)
+        registry._removeSubregistry(subscriber)
+        registry.changed(other)
+        self.assertEqual(subscriber._changed, [other])
+
+    def test__p_deactivate_notifies_subregistries(self):
+        registry, db, tm = self._makeOneInDatabase()
+        subscriber = self._makeSubscriber()
+        registry._addSubregistry(subscriber)
+        registry._p_deactivate()
+        self.assertEqual(registry._p_changed, None)
+        self.assertEqual(subscriber._changed, [registry])
+
+    def test__p_deactivate_changed_keeps_subregistries(self):
+        from zope.component.tests.examples import I2
+        registry, db, tm = self._makeOneInDatabase()
+        registry.register((), I2, '', 'other')
+        subscriber = self._makeSubscriber()
+        registry._addSubregistry(subscriber)
+        registry._p_deactivate()
+        self.assertEqual(registry._p_changed, True)
+        self.assertEqual(subscriber._changed, [])
+
+    def test__p_invalidate_notifies_subregistries(self):
+        registry, db, tm = self._makeOneInDatabase()
+        subscriber = self._makeSubscriber()
+        registry._addSubregistry(subscriber)
+        registry._p_invalidate()
+        self.assertEqual(registry._p_changed, None)
+        # ``_p_invalidate`` may deactivate us as well.
+        self.assertIn(registry, subscriber._changed)
+        self.assertEqual(set(subscriber._changed), {registry})
+
     def test___getstate___simple(self):
         from zope.component import globalSiteManager
         bases = (globalSiteManager.adapters, globalSiteManager.utilities)
@@ -142,6 +193,234 @@ class PersistentAdapterRegistryTests(unittest.TestCase):
         self.assertEqual(registry.__bases__, bases)
         self.assertEqual(registry.ro, [registry] + list(bases))
 
+    def _makeOneInDatabase(self):
+        import transaction
+        from ZODB import DB
+        from ZODB.MappingStorage import MappingStorage
+
+        from zope.component.tests.examples import I1
+        db = DB(MappingStorage())
+        self.addCleanup(db.close)
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        registry = conn.root()['registry'] = self._makeOne()
+        registry.register((), I1, '', 'one')
+        tm.commit()
+        registry._p_deactivate()
+        self.assertEqual(registry.lookup((), I1, ''), 'one')
+        return registry, db, tm
+
+    def test___setstate___reuses_kept__v_lookup(self):
+        from zope.component.tests.examples import I1
+        registry, db, tm = self._makeOneInDatabase()
+        lookup = registry._v_lookup
+        generation = registry._generation
+        registry._p_deactivate()
+        self.assertEqual(registry._p_changed, None)
+        self.assertEqual(registry.lookup((), I1, ''), 'one')
+        self.assertIs(registry._v_lookup, lookup)
+        self.assertEqual(registry.__dict__['lookup'], lookup.lookup)
+        self.assertEqual(registry._generation, generation)
+        self.assertEqual(registry.ro, [registry])
+
+    def _changeElsewhere(self):
+        import transaction
+
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        registry, db, tm = self._makeOneInDatabase()
+        registry.register((), I2, '', 'other')
+        tm.commit()
+        registry._p_deactivate()
+        self.assertEqual(registry.lookup((), I2, ''), 'other')
+        self.assertEqual(registry.lookup((), I1, ''), 'one')
+        tm2 = transaction.TransactionManager()
+        conn2 = db.open(transaction_manager=tm2)
+        conn2.root()['registry'].register((), I1, '', 'two')
+        tm2.commit()
+        return registry, tm
+
+    def test___setstate___changed_elsewhere_updates__v_lookup(self):
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        registry, tm = self._changeElsewhere()
+        lookup = registry._v_lookup
+        tm.begin()  # invalidates our registry
+        self.assertEqual(registry.lookup((), I1, ''), 'two')
+        self.assertIs(registry._v_lookup, lookup)
+        self.assertEqual(registry.lookup((), I2, ''), 'other')
+
+    def test___setstate___changed_elsewhere_python_lookup(self):
+        # The lookup caches of the C optimizations can only be cleared
+        # as a whole; those of the Python implementation only forget
+        # the changed registrations.
+        from zope.interface.adapter import AdapterLookupBase
+        from zope.interface.adapter import VerifyingBaseFallback
+
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+
+        class _PythonLookup(AdapterLookupBase, VerifyingBaseFallback):
+            pass
+        klass = self._getTargetClass()
+        klass.LookupClass = _PythonLookup
+        self.addCleanup(delattr, klass, 'LookupClass')
+        registry, tm = self._changeElsewhere()
+        lookup = registry._v_lookup
+        self.assertIsInstance(lookup, _PythonLookup)
+        tm.begin()  # invalidates our registry
+        self.assertEqual(lookup._cache[I2], {(): 'other'})
+        self.assertEqual(lookup._cache[I1], {(): 'one'})
+        self.assertEqual(registry.lookup((), I1, ''), 'two')
+        self.assertIs(registry._v_lookup, lookup)
+        # Only what was cached for I1 was forgotten.
+        self.assertEqual(lookup._cache[I2], {(): 'other'})
+        self.assertEqual(registry.lookup((), I2, ''), 'other')
+
+    def test___setstate___subscribed_elsewhere_updates__v_lookup(self):
+        import transaction
+
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        registry, db, tm = self._makeOneInDatabase()
+        lookup = registry._v_lookup
+        self.assertEqual(registry.subscriptions((), I2), [])
+        tm2 = transaction.TransactionManager()
+        conn2 = db.open(transaction_manager=tm2)
+        conn2.root()['registry'].subscribe((), I2, 'sub')
+        tm2.commit()
+        tm.begin()
+        self.assertEqual(registry.subscriptions((), I2), ['sub'])
+        self.assertIs(registry._v_lookup, lookup)
+        self.assertIn(I2, lookup._extendors[I2])
+        conn2.root()['registry'].unsubscribe((), I2, 'sub')
+        conn2.root()['registry'].unregister((), I1, '')
+        tm2.commit()
+        tm.begin()
+        self.assertEqual(registry.subscriptions((), I2), [])
+        self.assertEqual(registry.lookup((), I1, ''), None)
+        self.assertIs(registry._v_lookup, lookup)
+        self.assertNotIn(I2, lookup._extendors.get(I2, ()))
+        self.assertNotIn(I1, lookup._extendors.get(I1, ()))
+
+    def test___setstate___bases_changed_elsewhere_rebuilds__v_lookup(self):
+        import transaction
+
+        from zope.component import globalSiteManager
+        from zope.component.tests.examples import I1
+        registry, db, tm = self._makeOneInDatabase()
+        lookup = registry._v_lookup
+        tm2 = transaction.TransactionManager()
+        conn2 = db.open(transaction_manager=tm2)
+        conn2.root()['registry'].__bases__ = (globalSiteManager.adapters,)
+        tm2.commit()
+        tm.begin()
+        self.assertEqual(registry.lookup((), I1, ''), 'one')
+        self.assertIsNot(registry._v_lookup, lookup)
+        self.assertEqual(registry._changes, ())
+
+    def test___setstate___changes_unknown_rebuilds__v_lookup(self):
+        import transaction
+
+        from zope.component.tests.examples import I1
+        registry, db, tm = self._makeOneInDatabase()
+        lookup = registry._v_lookup
+        tm2 = transaction.TransactionManager()
+        conn2 = db.open(transaction_manager=tm2)
+        other = conn2.root()['registry']
+        for i in range(other._changesLimit):
+            other.register((), I1, str(i), i)
+        tm2.commit()
+        tm.begin()
+        self.assertEqual(registry.lookup((), I1, ''), 'one')
+        self.assertIsNot(registry._v_lookup, lookup)
+        self.assertEqual(len(registry._changes), registry._changesLimit)
+
+    def test_changes_recorded(self):
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        registry = self._makeOne()
+        self.assertEqual(registry._changes, ())
+        registry.register((), I1, 'name', 'one')
+        registry.subscribe((), I2, 'sub')
+        registry.unsubscribe((), I2, 'sub')
+        registry.unregister((), I1, 'name', 'one')
+        self.assertEqual([change[1:] for change in registry._changes],
+                         [(I1, 'name'), (I2, ''), (I2, ''), (I1, 'name')])
+        self.assertEqual(len({change[0] for change in registry._changes}),
+                         4)
+        registry._changesLimit = 3
+        registry.register((), I2, '', 'two')
+        self.assertEqual([change[1:] for change in registry._changes],
+                         [(I2, ''), (I1, 'name'), (I2, '')])
+        registry.__bases__ = ()
+        self.assertEqual(registry._changes, ())
+
+    def test___setstate___changed_and_aborted_rebuilds__v_lookup(self):
+        from zope.component.tests.examples import I1
+        registry, db, tm = self._makeOneInDatabase()
+        registry.register((), I1, '', 'two')
+        lookup = registry._v_lookup
+        self.assertEqual(registry.lookup((), I1, ''), 'two')
+        tm.abort()
+        self.assertEqual(registry.lookup((), I1, ''), 'one')
+        self.assertIsNot(registry._v_lookup, lookup)
+
+    def test__p_resolveConflict_generation_changed(self):
+        registry = self._makeOne()
+        old = {'_generation': 3, '_adapters': [1], '__bases__': ()}
+        saved = dict(old, _generation=5)
+        new = dict(old, _generation=4)
+        self.assertEqual(registry._p_resolveConflict(old, saved, new),
+                         dict(old, _generation=6))
+
+    def test__p_resolveConflict_changes_merged(self):
+        registry = self._makeOne()
+        old = {'_generation': 3, '_changes': ((b'a', None, ''),)}
+        saved = {'_generation': 4,
+                 '_changes': ((b'a', None, ''), (b'b', None, 'b'))}
+        new = {'_generation': 4,
+               '_changes': ((b'a', None, ''), (b'c', None, 'c'))}
+        self.assertEqual(registry._p_resolveConflict(old, saved, new),
+                         {'_generation': 5,
+                          '_changes': ((b'a', None, ''),
+                                       (b'b', None, 'b'),
+                                       (b'c', None, 'c'))})
+        registry._changesLimit = 2
+        self.assertEqual(registry._p_resolveConflict(old, saved, new),
+                         {'_generation': 5,
+                          '_changes': ((b'b', None, 'b'),
+                                       (b'c', None, 'c'))})
+        old = {'_generation': 3}
+        self.assertEqual(registry._p_resolveConflict(old, saved, new),
+                         {'_generation': 5,
+                          '_changes': ((b'a', None, ''),
+                                       (b'c', None, 'c'))})
+
+    def test__p_resolveConflict_changes_unknown(self):
+        from ZODB.POSException import ConflictError
+        registry = self._makeOne()
+        old = {'_generation': 3, '_changes': ((b'a', None, ''),)}
+        saved = {'_generation': 4,
+                 '_changes': ((b'a', None, ''), (b'b', None, 'b'))}
+        new = {'_generation': 4, '_changes': ()}
+        self.assertRaises(ConflictError,
+                          registry._p_resolveConflict, old, saved, new)
+
+    def test__p_resolveConflict_other_changed(self):
+        from ZODB.POSException import ConflictError
+        registry = self._makeOne()
+        old = {'_generation': 3, '_adapters': [1], '__bases__': ()}
+        saved = dict(old, _generation=5)
+        new = dict(old, _generation=4, _adapters=[2])
+        self.assertRaises(ConflictError,
+                          registry._p_resolveConflict, old, saved, new)
+        self.assertRaises(ConflictError,
+                          registry._p_resolveConflict, old, new, saved)
+        new = dict(old, _generation=4, _provided={})
+        self.assertRaises(ConflictError,
+                          registry._p_resolveConflict, old, saved, new)
+
     def test__addValueToLeaf_existing_is_tuple_converts(self):
         from persistent.list import PersistentList
         registry = self._makeOne()
@@ -200,9 +479,8 @@ class PersistentComponentsTests(unittest.TestCase):
         return self._getTargetClass()(*args, **kw)
 
     def test_ctor_initializes_registries_and_registrations(self):
-        from persistent.list import PersistentList
-        from persistent.mapping import PersistentMapping
-
+        from zope.component.persistentregistry import ConflictResolvingList
+        from zope.component.persistentregistry import ConflictResolvingMapping
         from zope.component.persistentregistry import PersistentAdapterRegistry
         registry = self._makeOne()
         self.assertIsInstance(
@@ -215,19 +493,19 @@ class PersistentComponentsTests(unittest.TestCase):
         )
         self.assertIsInstance(
             registry._adapter_registrations,
-            PersistentMapping
+            ConflictResolvingMapping
         )
         self.assertIsInstance(
             registry._utility_registrations,
-            PersistentMapping
+            ConflictResolvingMapping
         )
         self.assertIsInstance(
             registry._subscription_registrations,
-            PersistentList
+            ConflictResolvingList
         )
         self.assertIsInstance(
             registry._handler_registrations,
-            PersistentList
+            ConflictResolvingList
         )
 
 
@@ -256,3 +534,485 @@ class PersistentAdapterRegistryCustomTypesTest(
     def _getBaseAdapterRegistry(self):
         from zope.component.persistentregistry import PersistentAdapterRegistry
         return PersistentAdapterRegistry
+
+
+def skipIfNoBTrees(testfunc):
+    try:
+        import BTrees  # noqa: F401 imported but unused
+    except ModuleNotFoundError:  # pragma: no cover
+        return unittest.skip("BTrees not installed")(testfunc)
+    return testfunc
+
+
+@skipIfNoPersistent
+@skipIfNoBTrees
+class BTreePersistentComponentsTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from zope.component.persistentregistry import BTreePersistentComponents
+        return BTreePersistentComponents
+
+    def _makeOne(self, *args, **kw):
+        return self._getTargetClass()(*args, **kw)
+
+    def _makeInterfaces(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class IBar(Interface):
+            pass
+        return IFoo, IBar
+
+    def test_ctor_initializes_registries_and_registrations(self):
+        from BTrees.OOBTree import OOBTree
+        from persistent.list import PersistentList
+
+        from zope.component.persistentregistry import \
+            BTreePersistentAdapterRegistry
+        registry = self._makeOne()
+        self.assertIsInstance(registry.adapters,
+                              BTreePersistentAdapterRegistry)
+        self.assertIsInstance(registry.utilities,
+                              BTreePersistentAdapterRegistry)
+        self.assertIsInstance(registry._adapter_registrations, OOBTree)
+        self.assertIsInstance(registry._utility_registrations, OOBTree)
+        self.assertIsInstance(registry._subscription_registrations,
+                              PersistentList)
+        self.assertIsInstance(registry._handler_registrations,
+                              PersistentList)
+
+    def test_registrations(self):
+        from BTrees.OOBTree import OOBTree
+        from zope.interface import implementer
+
+        from zope.component.persistentregistry import ConflictResolvingCounts
+        IFoo, IBar = self._makeInterfaces()
+
+        @implementer(IFoo)
+        class Foo:
+            pass
+
+        class Bar:
+            def __init__(self, context):
+                self.context = context
+        registry = self._makeOne()
+        utilities = {'n%d' % i: object() for i in range(100)}
+        for name, utility in utilities.items():
+            registry.registerUtility(utility, IFoo, name)
+        registry.registerAdapter(Bar, (IFoo,), IBar, 'bar')
+        registry.registerAdapter(Bar, (Foo,), IBar)
+        registry.registerHandler(lambda ob: None, (IFoo,))
+        for name, utility in utilities.items():
+            self.assertIs(registry.getUtility(IFoo, name), utility)
+        self.assertEqual(len(list(registry.registeredUtilities())), 100)
+        foo = Foo()
+        self.assertIsInstance(registry.getAdapter(foo, IBar, 'bar'), Bar)
+        self.assertIsInstance(registry.getAdapter(foo, IBar), Bar)
+        names = registry.utilities._adapters[0][IFoo]
+        self.assertIsInstance(names, OOBTree)
+        self.assertEqual(len(names), 100)
+
+        self.assertTrue(registry.unregisterUtility(provided=IFoo, name='n1'))
+        self.assertIsNone(registry.queryUtility(IFoo, 'n1'))
+        self.assertEqual(len(names), 99)
+        self.assertEqual(
+            sorted(name for name, _ in registry.getUtilitiesFor(IFoo))[:2],
+            ['n0', 'n10'])
+        self.assertTrue(registry.unregisterAdapter(Bar, (Foo,), IBar))
+        self.assertIsNone(registry.queryAdapter(foo, IBar))
+        self.assertIsNotNone(registry.getAdapter(foo, IBar, 'bar'))
+        self.assertIsInstance(registry.adapters._provided,
+                              ConflictResolvingCounts)
+        self.assertEqual(dict(registry.adapters._provided), {IBar: 1})
+
+    def test_in_database(self):
+        import transaction
+        from ZODB import DB
+        from ZODB.MappingStorage import MappingStorage
+
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        db = DB(MappingStorage())
+        self.addCleanup(db.close)
+        tm = transaction.TransactionManager()
+        conn = db.open(transaction_manager=tm)
+        registry = conn.root()['registry'] = self._makeOne('local')
+        for i in range(1000):
+            registry.registerUtility('u%d' % i, I1, 'n%d' % i)
+        tm.commit()
+        size = db.getSize()
+        registry.registerUtility('new', I1, 'new')
+        registry.registerUtility('other', I2, 'new')
+        tm.commit()
+        # Only the touched buckets are written, not the whole mappings.
+        self.assertLess(db.getSize() - size, (size / 2))
+        conn.close()
+
+        conn = db.open(transaction_manager=tm)
+        registry = conn.root()['registry']
+        self.assertEqual(registry.getUtility(I1, 'n999'), 'u999')
+        self.assertEqual(registry.getUtility(I1, 'new'), 'new')
+        self.assertEqual(registry.getUtility(I2, 'new'), 'other')
+        conn.close()
+
+
+@skipIfNoPersistent
+@skipIfNoBTrees
+class IncrementalRebuildTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from zope.component.persistentregistry import IncrementalRebuild
+        return IncrementalRebuild
+
+    def _makeOne(self, *args, **kw):
+        return self._getTargetClass()(*args, **kw)
+
+    def _openDatabase(self):
+        import transaction
+        from ZODB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage())
+        self.addCleanup(db.close)
+        tm = transaction.TransactionManager()
+        return db, tm, db.open(transaction_manager=tm)
+
+    def _makeLegacyRegistry(self, conn, tm):
+        # A registry with the plain data structures of old versions.
+        from zope.interface.adapter import VerifyingAdapterRegistry
+
+        from zope.component.persistentregistry import PersistentAdapterRegistry
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        plain = VerifyingAdapterRegistry()
+        for i in range(10):
+            plain.register((), I1, 'n%d' % i, i)
+            plain.register((I1,), I2, 'n%d' % i, i)
+            plain.subscribe((I1,), I2, i)
+        registry = conn.root()['registry'] = PersistentAdapterRegistry()
+        registry._adapters = plain._adapters
+        registry._subscribers = plain._subscribers
+        registry._provided = plain._provided
+        registry._createLookup()
+        registry.changed(registry)
+        tm.commit()
+        return registry
+
+    def _makeRebuild(self, conn, tm, registry):
+        rebuild = conn.root()['rebuild'] = self._makeOne(registry)
+        tm.commit()
+        return rebuild
+
+    def _registrations(self, registry):
+        return (sorted(registry.allRegistrations(), key=repr),
+                sorted(registry.allSubscriptions(), key=repr))
+
+    def test_run(self):
+        from BTrees.OOBTree import OOBTree
+        from persistent.list import PersistentList
+        from persistent.mapping import PersistentMapping
+
+        from zope.component.tests.examples import I1
+        db, tm, conn = self._openDatabase()
+        registry = self._makeLegacyRegistry(conn, tm)
+        expected = self._registrations(registry)
+        rebuild = self._makeRebuild(conn, tm, registry)
+        rebuild.run(count=7)
+        self.assertTrue(rebuild.finished)
+        self.assertEqual(rebuild.position, 30)
+        self.assertIsNone(rebuild._rebuilt)
+        self.assertIsInstance(registry._adapters, PersistentList)
+        self.assertIsInstance(registry._adapters[0], OOBTree)
+        self.assertIsInstance(registry._subscribers[1], OOBTree)
+        self.assertIsInstance(registry._provided, PersistentMapping)
+        self.assertEqual(registry._changes, ())
+        self.assertEqual(self._registrations(registry), expected)
+        self.assertEqual(registry.lookup((), I1, 'n3'), 3)
+        self.assertEqual(rebuild.step(7), 0)
+
+        conn2 = db.open()
+        registry2 = conn2.root()['registry']
+        self.assertIsInstance(registry2._adapters[0], OOBTree)
+        self.assertEqual(self._registrations(registry2), expected)
+        conn2.close()
+
+    def test_step_writes_are_bounded(self):
+        # Each transaction writes about as much as it copies, no
+        # matter how many registrations end up in the same mapping.
+        from zope.interface.adapter import VerifyingAdapterRegistry
+
+        from zope.component.persistentregistry import PersistentAdapterRegistry
+        from zope.component.tests.examples import I1
+        db, tm, conn = self._openDatabase()
+        plain = VerifyingAdapterRegistry()
+        for i in range(3000):
+            plain.register((), I1, 'n%05d' % i, i)
+        registry = conn.root()['registry'] = PersistentAdapterRegistry()
+        registry._adapters = plain._adapters
+        registry._provided = plain._provided
+        registry._createLookup()
+        rebuild = self._makeRebuild(conn, tm, registry)
+        start = db.lastTransaction()
+        while not rebuild.finished:
+            rebuild.step(300)
+            tm.commit()
+        sizes = [sum(len(record.data) for record in txn)
+                 for txn in db.storage.iterator(start)][1:-1]
+        self.assertEqual(len(sizes), 10)
+        self.assertLess(max(sizes), 2 * min(sizes))
+
+    def test_run_not_stored(self):
+        from zope.component.persistentregistry import PersistentAdapterRegistry
+        rebuild = self._makeOne(PersistentAdapterRegistry())
+        self.assertRaises(ValueError, rebuild.run)
+
+    def test_step_resumes_in_other_connection(self):
+        import transaction
+        db, tm, conn = self._openDatabase()
+        registry = self._makeLegacyRegistry(conn, tm)
+        expected = self._registrations(registry)
+        rebuild = self._makeRebuild(conn, tm, registry)
+        self.assertEqual(rebuild.step(12), 12)
+        tm.commit()
+        self.assertEqual(rebuild.step(12), 12)
+        tm.abort()  # lost, done again below
+        self.assertEqual(rebuild.position, 12)
+
+        tm2 = transaction.TransactionManager()
+        conn2 = db.open(transaction_manager=tm2)
+        rebuild2 = conn2.root()['rebuild']
+        self.assertEqual(rebuild2.step(12), 12)
+        self.assertEqual(rebuild2.position, 24)
+        self.assertEqual(rebuild2.step(12), 6)
+        self.assertTrue(rebuild2.finished)
+        tm2.commit()
+        conn2.close()
+
+        tm.begin()
+        self.assertTrue(rebuild.finished)
+        self.assertEqual(self._registrations(registry), expected)
+
+    def test_step_restarts_if_registry_changed(self):
+        from zope.component.tests.examples import I2
+        db, tm, conn = self._openDatabase()
+        registry = self._makeLegacyRegistry(conn, tm)
+        rebuild = self._makeRebuild(conn, tm, registry)
+        self.assertEqual(rebuild.step(12), 12)
+        tm.commit()
+        registry.register((), I2, '', 'new')
+        tm.commit()
+        expected = self._registrations(registry)
+        self.assertEqual(rebuild.step(50), 31)
+        self.assertEqual(rebuild.position, 31)
+        self.assertTrue(rebuild.finished)
+        tm.commit()
+        self.assertEqual(self._registrations(registry), expected)
+        self.assertEqual(registry.lookup((), I2, ''), 'new')
+
+
+class _ConflictResolvingTestsBase:
+
+    def _getTargetClass(self):
+        raise NotImplementedError
+
+    def _resolve(self, old, saved, new):
+        inst = self._getTargetClass()()
+        return inst._p_resolveConflict(
+            {'data': old}, {'data': saved}, {'data': new})['data']
+
+    def _assertConflict(self, old, saved, new):
+        from ZODB.POSException import ConflictError
+        self.assertRaises(ConflictError, self._resolve, old, saved, new)
+        self.assertRaises(ConflictError, self._resolve, old, new, saved)
+
+    def test_other_state(self):
+        from ZODB.POSException import ConflictError
+        inst = self._getTargetClass()()
+        state = inst.__getstate__()
+        self.assertRaises(ConflictError, inst._p_resolveConflict,
+                          state, state, dict(state, other=1))
+
+
+@skipIfNoPersistent
+class ConflictResolvingMappingTests(_ConflictResolvingTestsBase,
+                                    unittest.TestCase):
+
+    def _getTargetClass(self):
+        from zope.component.persistentregistry import ConflictResolvingMapping
+        return ConflictResolvingMapping
+
+    def test_different_keys(self):
+        self.assertEqual(
+            self._resolve({'a': 1, 'b': 2, 'c': 3},
+                          {'a': 1, 'b': 4, 'd': 5},
+                          {'b': 2, 'c': 3, 'e': 6}),
+            {'b': 4, 'd': 5, 'e': 6})
+
+    def test_same_change(self):
+        self.assertEqual(
+            self._resolve({'a': 1}, {'a': 2, 'b': 3}, {'a': 2}),
+            {'a': 2, 'b': 3})
+        self.assertEqual(
+            self._resolve({'a': 1, 'b': 2}, {'b': 2}, {'b': 2, 'c': 3}),
+            {'b': 2, 'c': 3})
+
+    def test_same_key(self):
+        self._assertConflict({'a': 1}, {'a': 2}, {'a': 3})
+        self._assertConflict({}, {'a': 2}, {'a': 3})
+        self._assertConflict({'a': 1}, {'a': 2}, {})
+
+    def test_persistent_references(self):
+        from ZODB.ConflictResolution import PersistentReference
+        old = {'a': PersistentReference((b'1', None))}
+        saved = {'a': PersistentReference((b'1', None)),
+                 'b': PersistentReference((b'2', None))}
+        new = {'a': PersistentReference((b'1', None)),
+               'c': PersistentReference((b'3', None))}
+        self.assertEqual(sorted(self._resolve(old, saved, new)),
+                         ['a', 'b', 'c'])
+        self._assertConflict(old,
+                             {'a': PersistentReference((b'4', None))},
+                             {'a': PersistentReference((b'5', None))})
+
+    def test_emptied(self):
+        self._assertConflict({'a': 1}, {}, {'a': 1, 'b': 2})
+        self.assertEqual(self._resolve({'a': 1}, {}, {}), {})
+
+
+@skipIfNoPersistent
+class ConflictResolvingCountsTests(_ConflictResolvingTestsBase,
+                                   unittest.TestCase):
+
+    def _getTargetClass(self):
+        from zope.component.persistentregistry import ConflictResolvingCounts
+        return ConflictResolvingCounts
+
+    def test_changes_are_added(self):
+        self.assertEqual(
+            self._resolve({'a': 1, 'b': 2, 'c': 1},
+                          {'a': 2, 'b': 1, 'c': 1},
+                          {'a': 2, 'b': 3, 'd': 1}),
+            {'a': 3, 'b': 2, 'd': 1})
+
+    def test_negative(self):
+        self._assertConflict({'a': 1, 'b': 1}, {'b': 1}, {'b': 1})
+
+
+@skipIfNoPersistent
+class ConflictResolvingListTests(_ConflictResolvingTestsBase,
+                                 unittest.TestCase):
+
+    def _getTargetClass(self):
+        from zope.component.persistentregistry import ConflictResolvingList
+        return ConflictResolvingList
+
+    def test_appended(self):
+        self.assertEqual(self._resolve([1, 2], [1, 2, 3], [1, 2, 4, 5]),
+                         [1, 2, 3, 4, 5])
+
+    def test_removed(self):
+        self.assertEqual(self._resolve([1, 2, 3, 4], [1, 3, 4], [1, 2, 3]),
+                         [1, 3])
+        self.assertEqual(self._resolve([1, 2, 3], [1, 3], [1, 3]), [1, 3])
+
+    def test_removed_and_appended(self):
+        self.assertEqual(self._resolve([1, 2, 3], [1, 3], [1, 2, 3, 4]),
+                         [1, 3, 4])
+
+    def test_removed_and_appended_in_one_transaction(self):
+        self._assertConflict([1, 2, 3], [1, 3, 4], [1, 2, 3, 5])
+        self._assertConflict([1, 2], [2, 1], [1, 2, 3])
+
+    def test_emptied(self):
+        self._assertConflict([1], [], [1, 2])
+        self.assertEqual(self._resolve([1, 2], [], [2]), [])
+
+
+@skipIfNoPersistent
+class ConcurrentRegistrationTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from zope.component.persistentregistry import PersistentComponents
+        return PersistentComponents
+
+    def _makeOne(self, *args, **kw):
+        return self._getTargetClass()(*args, **kw)
+
+    def _openConnections(self):
+        import transaction
+        from ZODB import DB
+        from ZODB.DemoStorage import DemoStorage
+
+        from zope.component.tests.examples import I1
+        db = DB(DemoStorage())
+        self.addCleanup(db.close)
+        tm1 = transaction.TransactionManager()
+        conn1 = db.open(transaction_manager=tm1)
+        registry = conn1.root()['registry'] = self._makeOne()
+        registry.registerUtility('a', I1, 'a', event=False)
+        registry.registerHandler(repr, (I1,), event=False)
+        registry.registerHandler(len, (I1,), event=False)
+        tm1.commit()
+        tm2 = transaction.TransactionManager()
+        conn2 = db.open(transaction_manager=tm2)
+        return (db,
+                (tm1, conn1.root()['registry']),
+                (tm2, conn2.root()['registry']))
+
+    def test_different_names(self):
+        from zope.component.tests.examples import I1
+        db, (tm1, registry1), (tm2, registry2) = self._openConnections()
+        registry1.registerUtility('b', I1, 'b', event=False)
+        registry1.registerHandler(hash, (I1,), event=False)
+        registry2.registerUtility('c', I1, 'c', event=False)
+        registry2.unregisterHandler(len, (I1,))
+        tm1.commit()
+        tm2.commit()
+
+        conn = db.open()
+        registry = conn.root()['registry']
+        self.assertEqual(sorted(registry.getUtilitiesFor(I1)),
+                         [('a', 'a'), ('b', 'b'), ('c', 'c')])
+        self.assertEqual(sorted(registry.getAllUtilitiesRegisteredFor(I1)),
+                         ['a', 'b', 'c'])
+        self.assertEqual(registry.utilities._provided, {I1: 6})
+        self.assertEqual(
+            [r.handler for r in registry.registeredHandlers()],
+            [repr, hash])
+        self.assertEqual(registry.adapters.subscriptions((I1,), None),
+                         [repr, hash])
+        conn.close()
+
+    def test_same_name(self):
+        from ZODB.POSException import ConflictError
+
+        from zope.component.tests.examples import I1
+        db, (tm1, registry1), (tm2, registry2) = self._openConnections()
+        registry1.registerUtility('b', I1, 'b', event=False)
+        registry2.registerUtility('c', I1, 'b', event=False)
+        tm1.commit()
+        self.assertRaises(ConflictError, tm2.commit)
+        tm2.abort()
+
+    def test_emptied(self):
+        from ZODB.POSException import ConflictError
+
+        from zope.component.tests.examples import I2
+        db, (tm1, registry1), (tm2, registry2) = self._openConnections()
+        registry1.registerHandler(hash, (I2,), event=False)
+        tm1.commit()
+        tm2.begin()
+        registry1.registerHandler(repr, (I2,), event=False)
+        registry2.unregisterHandler(hash, (I2,))
+        tm1.commit()
+        self.assertRaises(ConflictError, tm2.commit)
+        tm2.abort()
+
+
+@skipIfNoBTrees
+class BTreeConcurrentRegistrationTests(ConcurrentRegistrationTests):
+
+    def _getTargetClass(self):
+        from zope.component.persistentregistry import BTreePersistentComponents
+        return BTreePersistentComponents
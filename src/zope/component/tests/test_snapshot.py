@@ -0,0 +1,247 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Tests for z.c.snapshot
+"""
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+
+class _Info:
+    # Mimics zope.configuration.config.ParserInfo
+    def __init__(self, file):
+        self.file = file
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        from zope.component.testing import setUp
+        setUp()
+        self._dir = tempfile.mkdtemp()
+        self._filename = os.path.join(self._dir, 'registry.snapshot')
+
+    def tearDown(self):
+        from zope.component.testing import tearDown
+        shutil.rmtree(self._dir)
+        tearDown()
+
+    def _save(self, *args, **kw):
+        from zope.component.snapshot import saveSnapshot
+        return saveSnapshot(self._filename, *args, **kw)
+
+    def _load(self, *args, **kw):
+        from zope.component.snapshot import loadSnapshot
+        return loadSnapshot(self._filename, *args, **kw)
+
+    def _configure(self, info=''):
+        from zope.component.globalregistry import getGlobalSiteManager
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        from zope.component.tests.examples import U1
+        from zope.component.tests.examples import Comp
+        from zope.component.tests.examples import handle1
+        gsm = getGlobalSiteManager()
+        gsm.registerUtility(U1('util'), I1, 'util', info=info)
+        gsm.registerAdapter(Comp, (I1,), I2, info=info)
+        gsm.registerSubscriptionAdapter(Comp, (I1,), I2, info=info)
+        gsm.registerHandler(handle1, (I1,), info=info)
+        return gsm
+
+    def _reset(self):
+        from zope.component.testing import setUp
+        setUp()
+
+    def test_round_trip(self):
+        from zope.component import getAdapter
+        from zope.component import getUtility
+        from zope.component import subscribers
+        from zope.component.tests.examples import I1
+        from zope.component.tests.examples import I2
+        from zope.component.tests.examples import Comp
+        from zope.component.tests.examples import handle1
+        from zope.component.tests.examples import ob
+        gsm = self._configure()
+        self._save()
+        self._reset()
+        self.assertEqual(len(list(gsm.registeredUtilities())), 0)
+
+        self.assertTrue(self._load())
+        self.assertEqual(repr(getUtility(I1, 'util')), 'U1(util)')
+        self.assertIsInstance(getAdapter(ob, I2), Comp)
+        self.assertEqual([type(s) for s in subscribers((ob,), I2)], [Comp])
+        self.assertEqual([r.handler for r in gsm.registeredHandlers()],
+                         [handle1])
+        self.assertEqual(len(list(gsm.registeredUtilities())), 1)
+        # The restored registry is fully functional
+        gsm.unregisterUtility(provided=I1, name='util')
+        self.assertIsNone(gsm.queryUtility(I1, 'util'))
+
+    def test_load_keeps_adapter_hooks(self):
+        from zope.component.hooks import resetHooks
+        from zope.component.hooks import setHooks
+        from zope.component.tests.examples import I2
+        from zope.component.tests.examples import Comp
+        from zope.component.tests.examples import ob
+        gsm = self._configure()
+        self._save()
+        self._reset()
+        setHooks()
+        self.addCleanup(resetHooks)
+        # The current adapter hook is bound to the lookup of the
+        # adapter registry.
+        self.assertIsNone(I2(ob, None))
+        self.assertTrue(self._load())
+        self.assertIsInstance(I2(ob), Comp)
+        self.assertIsInstance(gsm.queryAdapter(ob, I2), Comp)
+
+    def test_load_missing(self):
+        self.assertFalse(self._load())
+
+    def test_load_other_version(self):
+        from zope.component import snapshot
+        self._configure()
+        self._save()
+        self._reset()
+        orig = snapshot.SNAPSHOT_VERSION
+        snapshot.SNAPSHOT_VERSION = orig + 1
+        try:
+            self.assertFalse(self._load())
+        finally:
+            snapshot.SNAPSHOT_VERSION = orig
+
+    def test_load_other_registry(self):
+        from zope.component import globalregistry
+        self._save()
+        other = globalregistry.BaseGlobalComponents('other')
+        self.assertFalse(self._load(other))
+
+    def test_load_frozen(self):
+        from zope.component.globalregistry import FrozenRegistryError
+        from zope.component.globalregistry import getGlobalSiteManager
+        self._save()
+        getGlobalSiteManager().freeze()
+        self.assertRaises(FrozenRegistryError, self._load)
+
+    def test_sources_from_infos_and_modules(self):
+        import zope.component.tests.examples
+        zcml = os.path.join(self._dir, 'configure.zcml')
+        with open(zcml, 'w') as f:
+            f.write('<configure />')
+        extra = os.path.join(self._dir, 'extra.txt')
+        self._configure(_Info(zcml))
+        self._save(sources=[extra])
+        with open(self._filename, 'rb') as f:
+            sources = pickle.load(f)['sources']
+        self.assertIn(zcml, sources)
+        self.assertIn(zope.component.tests.examples.__file__, sources)
+        self.assertIn(extra, sources)
+        self.assertIsNone(sources[extra])
+
+    def test_sources_from_configuration_context(self):
+        from zope.configuration import xmlconfig
+
+        import zope.component
+        from zope.component.globalregistry import getGlobalSiteManager
+        from zope.component.tests.examples import I1
+        site = os.path.join(self._dir, 'site.zcml')
+        with open(site, 'w') as f:
+            f.write('<configure xmlns="http://namespaces.zope.org/zope">'
+                    '<include package="zope.component" file="meta.zcml" />'
+                    '<include file="utilities.zcml" />'
+                    '</configure>')
+        utilities = os.path.join(self._dir, 'utilities.zcml')
+        with open(utilities, 'w') as f:
+            f.write('<configure xmlns="http://namespaces.zope.org/zope">'
+                    '<utility'
+                    ' component="zope.component.tests.examples.comp"'
+                    ' provides="zope.component.tests.examples.I1" />'
+                    '</configure>')
+        context = xmlconfig.file(site)
+        self.assertIsNotNone(getGlobalSiteManager().queryUtility(I1))
+        self._save(context=context)
+        with open(self._filename, 'rb') as f:
+            sources = pickle.load(f)['sources']
+        # site.zcml only includes other files; no registration tells
+        # that it was read.
+        self.assertIn(site, sources)
+        self.assertIn(utilities, sources)
+        self.assertIn(
+            os.path.join(os.path.dirname(zope.component.__file__),
+                         'meta.zcml'),
+            sources)
+        self._reset()
+        mtime = os.stat(site).st_mtime
+        os.utime(site, (mtime + 10, mtime + 10))
+        self.assertFalse(self._load())
+
+    def test_stale_source(self):
+        zcml = os.path.join(self._dir, 'configure.zcml')
+        with open(zcml, 'w') as f:
+            f.write('<configure />')
+        self._configure(_Info(zcml))
+        self._save()
+        self._reset()
+        mtime = os.stat(zcml).st_mtime
+        os.utime(zcml, (mtime + 10, mtime + 10))
+        self.assertFalse(self._load())
+
+    def test_stale_source_w_renamed_class(self):
+        from zope.component.globalregistry import getGlobalSiteManager
+        from zope.component.tests import examples
+        from zope.component.tests.examples import I1
+        source = os.path.join(self._dir, 'source.py')
+        with open(source, 'w') as f:
+            f.write('class Thing: pass\n')
+
+        class Thing:
+            pass
+        Thing.__module__ = examples.__name__
+        Thing.__qualname__ = 'Thing'
+        examples.Thing = Thing
+        try:
+            getGlobalSiteManager().registerUtility(Thing(), I1)
+            self._save(sources=[source])
+        finally:
+            del examples.Thing
+        self._reset()
+        mtime = os.stat(source).st_mtime
+        os.utime(source, (mtime + 10, mtime + 10))
+        self.assertFalse(self._load())
+        # Even if the snapshot looks up to date, it can't be unpickled.
+        os.utime(source, (mtime, mtime))
+        self.assertFalse(self._load())
+
+    def test_removed_source(self):
+        zcml = os.path.join(self._dir, 'configure.zcml')
+        with open(zcml, 'w') as f:
+            f.write('<configure />')
+        self._configure(_Info(zcml))
+        self._save()
+        self._reset()
+        os.remove(zcml)
+        self.assertFalse(self._load())
+
+    def test_save_unpicklable_leaves_no_file(self):
+        from zope.interface import Interface
+
+        from zope.component.globalregistry import getGlobalSiteManager
+
+        class ILocal(Interface):
+            pass
+        getGlobalSiteManager().registerUtility(object(), ILocal)
+        self.assertRaises((pickle.PicklingError, AttributeError), self._save)
+        self.assertEqual(os.listdir(self._dir), [])
@@ -487,6 +487,32 @@ class Test_subscriber(unittest.TestCase):
         self.assertEqual(action['discriminator'], None)
         self.assertEqual(action['args'], ('', Interface))
 
+    def test_no_factory_w_handler_deferred(self):
+        from zope.interface import Interface
+
+        from zope.component.event import DeferredHandler
+        _handler = fails_if_called(self)
+        _cfg_ctx = _makeConfigContext()
+        self._callFUT(_cfg_ctx, (Interface,), handler=_handler,
+                      deferred=True)
+        action = _cfg_ctx._actions[0][1]
+        self.assertEqual(action['args'][0], 'registerHandler')
+        self.assertIsInstance(action['args'][1], DeferredHandler)
+        self.assertIs(action['args'][1].handler, _handler)
+
+    def test_w_factory_deferred(self):
+        from zope.interface import Interface
+
+        class IFoo(Interface):
+            pass
+
+        class Foo:
+            pass
+        _cfg_ctx = _makeConfigContext()
+        self.assertRaises(TypeError,
+                          self._callFUT, _cfg_ctx, (Interface,), Foo,
+                          provides=IFoo, deferred=True)
+
     def test_w_factory_w_provides(self):
         from zope.interface import Interface
 
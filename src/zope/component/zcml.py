@@ -300,12 +300,25 @@ class ISubscriberDirective(Interface):
         default=False,
     )
 
+    deferred = Bool(
+        title=_("Deferred"),
+        description=_("""Run the handler in the background
+
+        The handler is called in a thread pool and the code notifying
+        the event doesn't wait for it, see
+        zope.component.event.DeferredHandler. This can only be used
+        with a handler.
+        """),
+        required=False,
+        default=False,
+    )
+
 
 _handler = handler
 
 
 def subscriber(_context, for_=None, factory=None, handler=None, provides=None,
-               permission=None, trusted=False, locate=False):
+               permission=None, trusted=False, locate=False, deferred=False):
     if factory is None:
         if handler is None:
             raise TypeError("No factory or handler provided")
@@ -315,6 +328,8 @@ def subscriber(_context, for_=None, factory=None, handler=None, provides=None,
     else:
         if handler is not None:
             raise TypeError("Cannot use handler with factory")
+        if deferred:
+            raise TypeError("Cannot defer a factory")
         if provides is None:
             p = list(implementedBy(factory))
             if len(p) == 1:
@@ -340,6 +355,9 @@ def subscriber(_context, for_=None, factory=None, handler=None, provides=None,
         factory = securityAdapterFactory(factory, permission, locate, trusted)
 
     if handler is not None:
+        if deferred:
+            from zope.component.event import DeferredHandler
+            handler = DeferredHandler(handler)
         _context.action(
             discriminator=None,
             callable=_handler,